@@ -29,9 +29,11 @@ from ppfem.fem.form import Functional, LinearForm, BilinearForm, FormCollection
 from ppfem.fem.function import FEFunction, FunctionEvaluator
 from ppfem.fem.function_space import FunctionSpace
 from ppfem.fem.partial_differential_equation import PDE
+from ppfem.fem.transfer import GridTransfer
+from ppfem.fem.quadrature_field import QuadratureField, evaluate_at_quadrature_points
 
 __all__ = ["Mesh", "Point", "Line", "Vertex", "Face", "Cell", "Mapping", "FunctionSpace", "Functional",
            "LinearForm", "BilinearForm", "FormCollection", "DefaultSystemAssembler", "FEFunction", "FunctionEvaluator",
-           "PDE"]
+           "PDE", "GridTransfer", "QuadratureField", "evaluate_at_quadrature_points"]
 
 __all__ += ppfem.user_elements.__all__ + ppfem.quadrature.__all__ + ppfem.user_equations.__all__
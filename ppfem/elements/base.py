@@ -42,6 +42,9 @@ class ReferenceElement(abc.ABC):
     def n_of_dofs(self):
         return self._n_dofs
 
+    def n_of_bases(self):
+        return self._n_bases
+
     def dimension(self):
         return self._dimension
 
@@ -71,6 +74,23 @@ class ReferenceElement(abc.ABC):
         return np.array([self.basis_function_gradient(i, point, jacobian_inv=jacobian_inv)
                          for i in range(self._n_bases)])
 
+    def tabulate_basis_function_values(self, points):
+        """
+        Evaluates all basis functions at all given points at once.
+        :param points: array of shape (n_points, space_dim()) or a list of Points
+        :return: array of shape (n_points, number of basis functions)
+        """
+        return np.array([np.ravel(self.basis_function_values(p)) for p in _as_point_list(points)])
+
+    def tabulate_basis_function_gradients(self, points):
+        """
+        Evaluates the gradients of all basis functions at all given points at once.
+        :param points: array of shape (n_points, space_dim()) or a list of Points
+        :return: array of shape (n_points, number of basis functions, space_dim())
+        """
+        return np.array([np.reshape(self.basis_function_gradients(p), (self._n_bases, self.space_dim()))
+                         for p in _as_point_list(points)])
+
     @abc.abstractmethod
     def function_value(self, dof_values, point):
         raise Exception("Abstract method called!")
@@ -98,3 +118,8 @@ class ReferenceElement(abc.ABC):
     def space_dim():
         raise Exception("Abstract method called!")
 
+
+def _as_point_list(points):
+    if isinstance(points, np.ndarray):
+        return points.reshape(points.shape[0], -1)
+    return points
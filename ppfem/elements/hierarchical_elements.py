@@ -0,0 +1,80 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from ppfem.geometry.point import Point
+from ppfem.elements.base import ReferenceElement
+from ppfem.elements.legendre_basis import IntegratedLegendreBasis
+import numpy as np
+
+
+class HierarchicalLine(ReferenceElement):
+    """
+    Line element with a hierarchical basis of integrated Legendre polynomials (see IntegratedLegendreBasis).
+    The basis of degree p is the basis of degree p-1 extended by one bubble function. With the same ordering as
+    LagrangeLine (the two vertex functions first), local matrices of degree p contain those of degree p-1 as their
+    leading block, so these blocks can be reused when the degree is raised.
+    Only the vertex dofs are nodal values; the remaining dofs are coefficients of the bubble functions.
+    The basis is scalar; vector-valued functions (dimension > 1) are not supported.
+    """
+
+    def __init__(self, degree, dimension=1):
+        if dimension != 1:
+            raise NotImplementedError("HierarchicalLine is only implemented for scalar functions (dimension 1).")
+        ReferenceElement.__init__(self, degree, dimension)
+
+    def _setup_basis(self):
+        self._n_bases = self._degree + 1
+        self._n_dofs = self._n_bases
+        self._n_internal_dofs = self._n_dofs - 2
+        self._basis_functions = [IntegratedLegendreBasis(i) for i in range(self._n_bases)]
+
+    def get_support_points(self):
+        """
+        Points for which the interpolation conditions are imposed; same as for LagrangeLine of the same degree.
+        """
+        n = self._degree + 1
+        return [Point(-1), Point(1)] + [Point(-1 + i * 2/(n-1), index=i) for i in range(1, n-1)]
+
+    def interpolate_function(self, function, mapping=None):
+        """
+        :param function: a callable f(p) where p is a coordinate array of size space_dim() and the result
+        is of dimension dimension()
+        :param mapping: a Mapping instance to compute the "physical" coordinates of a point in reference space
+        :return: the dof values whose expansion coincides with the function at the support points; since the bubble
+        functions vanish at the vertices, the vertex dofs are the function values there
+        """
+        if mapping is not None:
+            points = mapping.map_points(self.get_support_points())
+        else:
+            points = self.get_support_points()
+
+        values = np.array([function(p.coords()) for p in points]).reshape(self._n_bases, -1)
+        collocation_matrix = np.array([self.basis_function_values(p) for p in self.get_support_points()])
+        return np.linalg.solve(collocation_matrix, values)
+
+    def function_value(self, dof_values, point):
+        # first array axis corresponds to basis function!
+        return np.dot(self.basis_function_values(point).reshape(1, self._n_bases),
+                      np.reshape(dof_values, (self._n_bases, -1)))
+
+    def function_gradient(self, dof_values, point, jacobian_inv=None):
+        # first array axis corresponds to basis function!
+        return np.dot(self.basis_function_gradients(point, jacobian_inv=jacobian_inv).reshape(self._n_bases, -1).T,
+                      np.reshape(dof_values, (self._n_bases, -1)))
+
+    @staticmethod
+    def space_dim():
+        return 1
@@ -0,0 +1,49 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sympy as sy
+from sympy.utilities.autowrap import autowrap
+
+
+class IntegratedLegendreBasis(object):
+    """
+    Hierarchical 1d shape functions on [-1, 1]. The indices 0 and 1 denote the linear vertex functions
+    (1 - x)/2 and (1 + x)/2, index k >= 2 the bubble function
+
+        phi_k(x) = (P_k(x) - P_{k-2}(x)) / sqrt(2 (2k - 1)),
+
+    i.e. the integral of the normalized Legendre polynomial P_{k-1}, which vanishes at both vertices.
+    The derivatives of the bubble functions are L2-orthonormal.
+    """
+    def __init__(self, index):
+        x = sy.symbols('x')
+        if index == 0:
+            self._L = (1 - x) / 2
+        elif index == 1:
+            self._L = (1 + x) / 2
+        else:
+            self._L = sy.expand((sy.legendre(index, x) - sy.legendre(index - 2, x)) / sy.sqrt(2 * (2 * index - 1)))
+        self._value = autowrap(self._L, args=(x,))
+        self._grad = autowrap(sy.diff(self._L, x), args=(x,))
+
+    def symbolic(self):
+        return self._L
+
+    def value(self, point):
+        return self._value(point[0])
+
+    def gradient(self, point):
+        return self._grad(point[0])
@@ -15,6 +15,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import abc
+from ppfem.fem.geometry_cache import get_cell_geometry
+from ppfem.geometry.point import Point
+from ppfem.quadrature.quadrature import QuadratureFunctor
 
 
 class CellEvalDataBase(object):
@@ -29,20 +32,57 @@ class CellEvalDataBase(object):
     From a design perspective this functionaly could also be totally hidden from the assembler. This might change
     in the future.
     """
-    def __init__(self, local_fe_functions, local_non_fe_functions, mapping, quadrature, params):
+    def __init__(self, local_fe_functions, local_non_fe_functions, mapping, quadrature, params, geometry=None):
         self.local_fe_functions = local_fe_functions
         self.local_non_fe_functions = local_non_fe_functions
         self.mapping = mapping
         self.quadrature = quadrature
         self.params = params
+        # LocalCellGeometry (JxW, inverse Jacobians, quadrature points) if the mapping supports it, else None
+        self.geometry = geometry
+
+    def _geometry_index(self, ref_point):
+        if self.geometry is None:
+            return None
+        return self.geometry.quadrature_point_index(ref_point)
+
+    def jacobian_det(self, ref_point):
+        """The Jacobian determinant at a quadrature point, taken from the cell geometry if available."""
+        index = self._geometry_index(ref_point)
+        if index is None:
+            return self.mapping.jacobian_det(ref_point)
+        return self.geometry.jacobian_dets[index]
+
+    def inverse_jacobian(self, ref_point):
+        """The inverse Jacobian at a quadrature point, taken from the cell geometry if available."""
+        index = self._geometry_index(ref_point)
+        if index is None:
+            return self.mapping.inverse_jacobian(ref_point)
+        return self.geometry.inverse_jacobians[index]
+
+    def physical_point(self, ref_point):
+        """The quadrature point mapped to physical space, taken from the cell geometry if available."""
+        index = self._geometry_index(ref_point)
+        if index is None:
+            return self.mapping.map_point(ref_point)
+        return Point(*self.geometry.quadrature_points[index])
+
+    def integrate(self, functor):
+        """
+        :param functor: callable f(ref_point) evaluated at the quadrature points (in reference space)
+        :return: the integral of f over the cell, using the Jacobian determinants of the cell geometry if available
+        """
+        return self.quadrature(QuadratureFunctor(functor, self.mapping, self.geometry))
 
 
 class CellEvalDataLinearForm(CellEvalDataBase):
     """
     This class extends its parent to hold a localized function space (local_test_space).
     """
-    def __init__(self, local_test_space, local_fe_functions, local_non_fe_functions, mapping, quadrature, params):
-        CellEvalDataBase.__init__(self, local_fe_functions, local_non_fe_functions, mapping, quadrature, params)
+    def __init__(self, local_test_space, local_fe_functions, local_non_fe_functions, mapping, quadrature, params,
+                 geometry=None):
+        CellEvalDataBase.__init__(self, local_fe_functions, local_non_fe_functions, mapping, quadrature, params,
+                                  geometry=geometry)
         self.local_test_space = local_test_space
 
 
@@ -51,9 +91,9 @@ class CellEvalDataBilinearForm(CellEvalDataLinearForm):
     This class extends its parent to hold one more localized function space (local_trial_space).
     """
     def __init__(self, local_test_space, local_trial_space, local_fe_functions, local_non_fe_functions, mapping,
-                 quadrature, params):
+                 quadrature, params, geometry=None):
         CellEvalDataLinearForm.__init__(self, local_test_space, local_fe_functions, local_non_fe_functions, mapping,
-                                        quadrature, params)
+                                        quadrature, params, geometry=geometry)
         self.local_trial_space = local_trial_space
 
 
@@ -125,13 +165,11 @@ class Form(abc.ABC):
             self.fe_functions = {}
         else:
             self.fe_functions = fe_functions
-        self._localized_fe_functions = {}
 
         if non_fe_functions is None:
             self.non_fe_functions = {}
         else:
             self.non_fe_functions = non_fe_functions
-        self._localized_non_fe_functions = {}
 
         self.mapping = mapping
 
@@ -148,14 +186,21 @@ class Form(abc.ABC):
             self.set_mesh(mesh, subdomain)
 
     def _localize_fe_functions(self, mesh_entity):
-        for k in self.fe_functions.keys():
-            self._localized_fe_functions[k] = self.fe_functions[k].localize(mesh_entity)
-        return self._localized_fe_functions
+        # a new dict per call: localized functions of different entities (e.g. of interior faces) must not alias
+        return {k: f.localize(mesh_entity) for k, f in self.fe_functions.items()}
 
     def _localize_non_fe_functions(self, mesh_entity):
-        for k in self.non_fe_functions.keys():
-            self._localized_non_fe_functions[k] = self.non_fe_functions[k].localize(mesh_entity)
-        return self._localized_non_fe_functions
+        return {k: f.localize(mesh_entity) for k, f in self.non_fe_functions.items()}
+
+    def _localize_geometry(self, local_mapping, mesh_entity):
+        """
+        Looks up the precomputed cell geometry, which is shared by all forms using the same mesh, mapping and
+        quadrature rule. The mapping is the one the local mapping was created from, so that entities of different
+        degree get the geometry of their own mapping.
+        """
+        if self._mesh is None or not hasattr(local_mapping, "get_fe_mapping"):
+            return None
+        return get_cell_geometry(self._mesh, local_mapping.get_fe_mapping(), self.quadrature).localize(mesh_entity)
 
     def set_mesh(self, mesh, subdomain=None):
         self._mesh = mesh
@@ -223,7 +268,8 @@ class Functional(Form):
                                 self._localize_non_fe_functions(mesh_entity),
                                 local_mapping,
                                 self.quadrature,
-                                params)
+                                params,
+                                geometry=self._localize_geometry(local_mapping, mesh_entity))
 
     def get_interior_face_eval_data_functional(self, mesh_entities, params=None, mapping=None):
         # TODO: reason about "selecting" the exterior face
@@ -315,7 +361,8 @@ class LinearForm(Form):
                                       self._localize_non_fe_functions(mesh_entity),
                                       local_mapping,
                                       self.quadrature,
-                                      params)
+                                      params,
+                                      geometry=self._localize_geometry(local_mapping, mesh_entity))
 
     def get_interior_face_eval_data_linear_form(self, mesh_entities, params=None, mapping=None):
         # TODO: reason about "selecting" the exterior face
@@ -328,9 +375,9 @@ class LinearForm(Form):
         local_mappings = None
         if mapping is None:
             mapping = self.mapping
-            if mapping is not None:
-                local_mappings = [mapping.localize(mesh_entities[0]),
-                                  mapping.localize(mesh_entities[1])]
+        if mapping is not None:
+            local_mappings = [mapping.localize(mesh_entities[0]),
+                              mapping.localize(mesh_entities[1])]
         return InteriorFaceEvalDataLinearForm(
             [self.test_function_space.localize(mesh_entities[0]),
              self.test_function_space.localize(mesh_entities[1])],
@@ -353,8 +400,8 @@ class LinearForm(Form):
         local_mapping = None
         if mapping is None:
             mapping = self.mapping
-            if mapping is not None:
-                local_mapping = mapping.localize(mesh_entity)
+        if mapping is not None:
+            local_mapping = mapping.localize(mesh_entity)
         return ExteriorFaceEvalDataLinearForm(self.test_function_space.localize(mesh_entity),
                                               self._localize_fe_functions(mesh_entity),
                                               self._localize_non_fe_functions(mesh_entity),
@@ -411,15 +458,16 @@ class BilinearForm(Form):
         local_mapping = None
         if mapping is None:
             mapping = self.mapping
-            if mapping is not None:
-                local_mapping = mapping.localize(mesh_entity)
+        if mapping is not None:
+            local_mapping = mapping.localize(mesh_entity)
         return CellEvalDataBilinearForm(self.test_function_space.localize(mesh_entity),
                                         self.trial_function_space.localize(mesh_entity),
                                         self._localize_fe_functions(mesh_entity),
                                         self._localize_non_fe_functions(mesh_entity),
                                         local_mapping,
                                         self.quadrature,
-                                        params)
+                                        params,
+                                        geometry=self._localize_geometry(local_mapping, mesh_entity))
 
     def get_interior_face_eval_data_bilinear_form(self, mesh_entities, params=None, mapping=None):
         # TODO: reason about "selecting" the exterior face
@@ -432,9 +480,9 @@ class BilinearForm(Form):
         local_mappings = None
         if mapping is None:
             mapping = self.mapping
-            if mapping is not None:
-                local_mappings = [mapping.localize(mesh_entities[0]),
-                                  mapping.localize(mesh_entities[1])]
+        if mapping is not None:
+            local_mappings = [mapping.localize(mesh_entities[0]),
+                              mapping.localize(mesh_entities[1])]
         return InteriorFaceEvalDataBilinearForm(
             [self.test_function_space.localize(mesh_entities[0]),
              self.test_function_space.localize(mesh_entities[1])],
@@ -459,8 +507,8 @@ class BilinearForm(Form):
         local_mapping = None
         if mapping is None:
             mapping = self.mapping
-            if mapping is not None:
-                local_mapping = mapping.localize(mesh_entity)
+        if mapping is not None:
+            local_mapping = mapping.localize(mesh_entity)
         return ExteriorFaceEvalDataBilinearForm(self.test_function_space.localize(mesh_entity),
                                                 self.trial_function_space.localize(mesh_entity),
                                                 self._localize_fe_functions(mesh_entity),
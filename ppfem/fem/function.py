@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import scipy as sp
+import numpy as np
+from ppfem.mesh.spatial_index import SpatialIndex
 
 
 class FEFunction(object):
@@ -23,10 +24,20 @@ class FEFunction(object):
       `set_dof_values_from_interpolation`
     or directly via
       `set_dof_values`.
+    The dof vector can also be provided by the caller, e.g. a memory-mapped array or one living in shared memory; it
+    is then used as storage without copying.
     """
-    def __init__(self, function_space):
+    def __init__(self, function_space, dof_values=None):
         self.function_space = function_space
-        self._dof_values = sp.zeros(self.function_space.number_of_dofs)
+        if dof_values is None:
+            self._dof_values = np.zeros(self.function_space.number_of_dofs)
+        else:
+            if dof_values.shape != (self.function_space.number_of_dofs,):
+                raise Exception("Dof vector of shape {0!r} does not match the {1:d} dofs of the function space."
+                                .format(dof_values.shape, self.function_space.number_of_dofs))
+            self._dof_values = dof_values
+        self._spatial_index = None
+        function_space.register_function(self)
 
     def number_of_dofs(self):
         return self.function_space.number_of_dofs
@@ -48,6 +59,17 @@ class FEFunction(object):
         # TODO: add some checks
         self._dof_values[:] = new_values
 
+    def permute_dofs(self, old_dofs):
+        """
+        Follows a renumbering of the dofs of the function space (see FunctionSpace.mesh_reordered).
+        :param old_dofs: the old number of each dof in the new order
+        """
+        values = self._dof_values[old_dofs]
+        if self._dof_values.flags.writeable:
+            self._dof_values[:] = values
+        else:
+            self._dof_values = values
+
     def localize(self, mesh_entity):
         elmt = self.function_space.get_element(mesh_entity)
         return LocalFEFunction(elmt,
@@ -65,6 +87,30 @@ class FEFunction(object):
     def get_subdomain(self):
         return self.function_space.get_subdomain()
 
+    def evaluate_at(self, points, spatial_index=None, der=0):
+        """
+        Evaluates the function (der=0) or its gradient (der=1) at points in physical space. The points are located
+        with a SpatialIndex, which is built on the first call unless one is given.
+        :param points: array of shape (n_points, space_dim)
+        :return: array of shape (n_points,) + shape of a value; NaN for points outside of the mesh
+        """
+        if spatial_index is None:
+            if self._spatial_index is None:
+                self._spatial_index = SpatialIndex(self.get_mesh(), mapping=self.get_mapping())
+            spatial_index = self._spatial_index
+        cells, reference_points = spatial_index.locate(points)
+        table = self.get_mesh().entity_table()
+        values = [None if cell < 0 else np.asarray(self(table.entity(cell), ref_point, der=der))
+                  for cell, ref_point in zip(cells, reference_points)]
+        found = [v for v in values if v is not None]
+        if len(found) == 0:
+            return np.full(len(values), np.nan)
+        result = np.full((len(values),) + found[0].shape, np.nan)
+        for k, value in enumerate(values):
+            if value is not None:
+                result[k] = value
+        return result
+
     def __call__(self, mesh_entity, ref_point, der=0):
         if der == 0:
             return self.localize(mesh_entity).function_value(ref_point)
@@ -14,7 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import scipy as sp
+import weakref
+import numpy as np
 from ppfem.fem.physical_element import MappedElement
 
 
@@ -36,7 +37,10 @@ class FunctionSpace(object):
         self._subdomain = subdomain
         self._element_dof_map = {}
         self._vertex_dof_map = {}
+        self._topology_version = None
         self.number_of_dofs = None
+        # functions whose dof vectors are permuted when the dofs are renumbered, see mesh_reordered
+        self._functions = weakref.WeakSet()
 
         self.storage_ready = False
         if mesh is not None:
@@ -45,13 +49,80 @@ class FunctionSpace(object):
         if mapping is not None:
             self._element.set_mapping(mapping)
 
+    @classmethod
+    def from_dof_arrays(cls, element, mesh, cell_dofs, vertex_dofs, number_of_dofs, subdomain=None, mapping=None):
+        """
+        Creates a function space with the given dof maps instead of generating them (e.g. from a checkpoint).
+        :param cell_dofs: int array as returned by cell_dof_array()
+        :param vertex_dofs: int array as returned by vertex_dof_array()
+        """
+        space = cls(element, subdomain=subdomain, mapping=mapping)
+        space._mesh = mesh
+        cells = np.flatnonzero(np.any(cell_dofs >= 0, axis=1))
+        if np.all(cell_dofs[cells] >= 0):
+            dof_lists = cell_dofs[cells].tolist()
+        else:
+            dof_lists = [row[row >= 0].tolist() for row in cell_dofs[cells]]
+        space._element_dof_map = dict(zip(cells.tolist(), dof_lists))
+        space._vertex_dof_map = dict(enumerate(row[row >= 0].tolist() for row in vertex_dofs))
+        space.number_of_dofs = int(number_of_dofs)
+        space._topology_version = mesh.topology_version()
+        space.storage_ready = True
+        mesh.add_reorder_listener(space)
+        return space
+
     def _setup_storage(self):
+        self._element_dof_map = {}
+        self._vertex_dof_map = {}
+        self._topology_version = self._mesh.topology_version()
+        self._mesh.add_reorder_listener(self)
         for v in self._mesh.vertices():
             self._vertex_dof_map[v.global_index()] = []
 
         self.number_of_dofs = self._generate_assembly_data()
         self.storage_ready = True
 
+    def _refresh_storage(self):
+        """Regenerates the dofs if the topology of the mesh was changed other than by Mesh.reorder."""
+        if self.storage_ready and self._topology_version != self._mesh.topology_version():
+            self._setup_storage()
+
+    def register_function(self, function):
+        """Registers an FEFunction (weakly) whose dof vector has to follow renumberings of the dofs."""
+        self._functions.add(function)
+
+    def mesh_reordered(self, mesh, topology_version, cell_order, vertex_order):
+        """
+        Called by Mesh.reorder: moves the dof maps to the new cell and vertex indices and renumbers the dofs in the
+        order of their first appearance in the reordered cells (as if they were generated on the reordered mesh), so
+        the dofs of neighbouring cells are close in memory. The dof vectors of all registered functions are
+        permuted accordingly.
+        :return: int array new_dofs with new_dofs[old dof] the new number of each dof, or None if the dofs were not
+        set up for the given mesh and topology version (they are regenerated on the next access then)
+        """
+        if not self.storage_ready or mesh is not self._mesh or self._topology_version != topology_version:
+            return None
+        self._element_dof_map = dict((new, self._element_dof_map[old])
+                                     for new, old in enumerate(cell_order.tolist()) if old in self._element_dof_map)
+        self._vertex_dof_map = dict((new, self._vertex_dof_map[old])
+                                    for new, old in enumerate(vertex_order.tolist()) if old in self._vertex_dof_map)
+        dofs_in_cell_order = np.concatenate([np.asarray(self._element_dof_map[cell], dtype=np.int64)
+                                             for cell in sorted(self._element_dof_map)] + [np.zeros(0, np.int64)])
+        dofs, first = np.unique(dofs_in_cell_order, return_index=True)
+        old_dofs = np.concatenate([dofs[np.argsort(first)],
+                                   np.setdiff1d(np.arange(self.number_of_dofs), dofs, assume_unique=True)])
+        new_dofs = np.empty(self.number_of_dofs, dtype=np.int64)
+        new_dofs[old_dofs] = np.arange(self.number_of_dofs)
+
+        self._element_dof_map = dict((cell, new_dofs[cell_dofs].tolist())
+                                     for cell, cell_dofs in self._element_dof_map.items())
+        self._vertex_dof_map = dict((vertex, new_dofs[vertex_dofs].tolist())
+                                    for vertex, vertex_dofs in self._vertex_dof_map.items())
+        self._topology_version = self._mesh.topology_version()
+        for function in list(self._functions):
+            function.permute_dofs(old_dofs)
+        return new_dofs
+
     def set_mesh(self, mesh, sub_domain=None):
         self._mesh = mesh
         self._subdomain = sub_domain
@@ -96,7 +167,7 @@ class FunctionSpace(object):
 
     def _generate_assembly_data(self):
         """Generates and tabulates the global dofs for each element."""
-        visited_vertices = []
+        visited_vertices = set()
         first_dof_index = 0
 
         for e in self._mesh.get_mesh_entities():
@@ -110,7 +181,7 @@ class FunctionSpace(object):
                 element, first_dof_index, visited_vertices
             )
             dofs += new_dofs
-            visited_vertices += e.global_vertex_indices()
+            visited_vertices.update(e.global_vertex_indices())
 
             new_dofs, first_dof_index = self._generate_element_non_vertex_dofs(element, first_dof_index)
             dofs += new_dofs
@@ -118,14 +189,38 @@ class FunctionSpace(object):
             self._element_dof_map[element.index()] = dofs
         return first_dof_index
 
+    def vertex_dof_array(self):
+        """
+        :return: int array of shape (n_vertices, dofs_per_vertex) with the global dofs of each vertex (-1 for vertices
+        without dofs, e.g. outside of the subdomain)
+        """
+        self._refresh_storage()
+        n_per_vertex = max([len(dofs) for dofs in self._vertex_dof_map.values()] + [0])
+        dofs = np.full((self._mesh.coordinates().shape[0], n_per_vertex), -1, dtype=np.int64)
+        for v, vertex_dofs in self._vertex_dof_map.items():
+            dofs[v, :len(vertex_dofs)] = vertex_dofs
+        return dofs
+
+    def cell_dof_array(self):
+        """
+        :return: int array of shape (n_cells, max_dofs_per_cell), row i holding the global dofs of cell i (padded
+        with -1; rows of cells without dofs, e.g. outside of the subdomain, are -1 entirely)
+        """
+        self._refresh_storage()
+        n_dofs = max([len(dofs) for dofs in self._element_dof_map.values()] + [0])
+        dofs = np.full((self._mesh.entity_table().next_index(), n_dofs), -1, dtype=np.int64)
+        for index, element_dofs in self._element_dof_map.items():
+            dofs[index, :len(element_dofs)] = element_dofs
+        return dofs
+
     def get_element_dof_index_array(self, element_index):
-        return sp.array(self._element_dof_map[element_index], dtype=sp.int64)
+        self._refresh_storage()
+        return np.array(self._element_dof_map[element_index], dtype=np.int64)
 
     def get_element(self, mesh_entity):
         if self._subdomain is not None and mesh_entity.domain_indicator != self._subdomain:
             raise Exception("Mesh entity in wrong subdomain!")
-        self._element.set_mesh_entity(mesh_entity)
-        return self._element
+        return self._element.localize(mesh_entity)
 
     def get_number_of_global_element_dofs(self, mesh_entity):
         return self.get_element(mesh_entity).number_of_global_dofs()
@@ -151,7 +246,8 @@ class FunctionSpace(object):
         :return: an array of values of degrees of freedom, which may be used for construction an object of type
         FEFunction
         """
-        global_dofs = sp.zeros(self.number_of_dofs)
+        self._refresh_storage()
+        global_dofs = np.zeros(self.number_of_dofs)
         for e in self.mesh_entity_iterator():
             global_dofs[self._element_dof_map[e.index]] = self.localize(e).interpolate_function(function)
         return global_dofs
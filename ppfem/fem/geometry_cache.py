@@ -0,0 +1,136 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import weakref
+import numpy as np
+
+
+class CellGeometry(object):
+    """
+    Geometric data of the cells of a mesh for one mapping and one quadrature rule, stored as contiguous arrays
+    with the first axis corresponding to the cell and the second one to the quadrature point:
+      `jxw`: the quadrature weights times the Jacobian determinants, shape (n_cells, n_q)
+      `jacobian_dets`: the Jacobian determinants, shape (n_cells, n_q)
+      `inverse_jacobians`: shape (n_cells, n_q, reference_dim, space_dim)
+      `quadrature_points`: physical coordinates of the quadrature points, shape (n_cells, n_q, space_dim)
+      `reference_points`: the points of the quadrature rule (Point objects in the order of the second axis)
+    Only cells whose number of vertices fits the mapping are contained. Objects are obtained via
+    get_cell_geometry() and are rebuilt there once the geometry version of the mesh has changed.
+    """
+    def __init__(self, mesh, mapping, quadrature, topological_dim=None):
+        self.geometry_version = mesh.geometry_version()
+        n_vertices = mapping.number_of_vertices()
+        table = mesh.entity_table(topological_dim)
+        indices = table.indices()
+        self.cell_indices = indices[table.number_of_vertices(indices) == n_vertices]
+        self._rows = np.full(table.next_index(), -1, dtype=np.int64)
+        self._rows[self.cell_indices] = np.arange(len(self.cell_indices))
+
+        qp_data = quadrature.quadrature_data()
+        ref_points = [d.point for d in qp_data]
+        self.reference_points = ref_points
+        weights = np.array([d.weight for d in qp_data])
+        vertex_coords = mesh.vertex_coords(table.connectivity(self.cell_indices)[:, :n_vertices]).reshape(
+            len(self.cell_indices), n_vertices, mesh.space_dim())
+
+        points, jacs, dets, inv_jacs = mapping.geometry(vertex_coords, ref_points)
+        self.quadrature_points = np.ascontiguousarray(points)
+        self.jxw = np.ascontiguousarray(dets * weights)
+        self.jacobian_dets = np.ascontiguousarray(dets)
+        self.inverse_jacobians = np.ascontiguousarray(inv_jacs)
+
+    def number_of_cells(self):
+        return len(self.cell_indices)
+
+    def row(self, cell_index):
+        """
+        :return: the position of the cell with the given index along the first axis of the arrays or None
+        """
+        if cell_index >= len(self._rows) or self._rows[cell_index] < 0:
+            return None
+        return self._rows[cell_index]
+
+    def localize(self, mesh_entity):
+        """
+        :return: a LocalCellGeometry holding views to the data of the given mesh entity or None if the entity is not
+        covered by this object
+        """
+        row = self.row(mesh_entity.index)
+        if row is None:
+            return None
+        return LocalCellGeometry(self.jxw[row], self.inverse_jacobians[row], self.quadrature_points[row],
+                                 self.jacobian_dets[row], self.reference_points)
+
+
+class LocalCellGeometry(object):
+    """
+    Geometric data of one cell (views to the arrays of a CellGeometry) with the first axis corresponding to the
+    quadrature point.
+    """
+    __slots__ = ("jxw", "inverse_jacobians", "quadrature_points", "jacobian_dets", "reference_points")
+
+    def __init__(self, jxw, inverse_jacobians, quadrature_points, jacobian_dets, reference_points):
+        self.jxw = jxw
+        self.inverse_jacobians = inverse_jacobians
+        self.quadrature_points = quadrature_points
+        self.jacobian_dets = jacobian_dets
+        self.reference_points = reference_points
+
+    def quadrature_point_index(self, ref_point):
+        """
+        :param ref_point: a point on the reference cell
+        :return: its position along the first axis of the arrays if it is the quadrature point with this position
+        (Point.index) of the rule this geometry was computed for, otherwise None. Other points may carry an index as
+        well (e.g. support points), hence the coordinates are compared unless it is the rule's own Point object.
+        """
+        index = getattr(ref_point, "index", None)
+        if index is None or not 0 <= index < len(self.reference_points):
+            return None
+        rule_point = self.reference_points[index]
+        if ref_point is not rule_point and not np.array_equal(ref_point.coords(), rule_point.coords()):
+            return None
+        return index
+
+    def integrate(self, values):
+        """
+        :param values: array with the first axis corresponding to the quadrature point
+        :return: the integral over the cell, i.e. the sum of the values weighted by jxw
+        """
+        return np.tensordot(self.jxw, values, axes=(0, 0))
+
+
+# mesh -> {(mapping, quadrature, topological_dim): CellGeometry}
+_cell_geometries = weakref.WeakKeyDictionary()
+
+
+def get_cell_geometry(mesh, mapping, quadrature, topological_dim=None):
+    """
+    Returns the CellGeometry for the given combination of mesh, mapping and quadrature rule. It is computed on the
+    first request and shared by all callers afterwards (e.g. by all forms on the same mesh) until the geometry
+    version of the mesh changes.
+    :param mapping: a mapping providing batched evaluation (FEMapping)
+    """
+    caches = _cell_geometries.setdefault(mesh, {})
+    key = (mapping, quadrature, topological_dim)
+    geometry = caches.get(key)
+    if geometry is None or geometry.geometry_version != mesh.geometry_version():
+        geometry = CellGeometry(mesh, mapping, quadrature, topological_dim=topological_dim)
+        caches[key] = geometry
+    return geometry
+
+
+def clear_cell_geometries(mesh):
+    _cell_geometries.pop(mesh, None)
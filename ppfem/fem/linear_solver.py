@@ -15,6 +15,9 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import abc
+import zlib
+import numpy as np
+import scipy.sparse as sps
 import scipy.sparse.linalg as spl
 
 
@@ -29,9 +32,94 @@ class LinearSolver(abc.ABC):
 
 
 class DirectSparseSolver(LinearSolver):
+    """
+    Solves by a sparse LU factorization (SuperLU, scipy.sparse.linalg.splu). The factorization is kept and reused
+    as long as the matrix is unchanged, so e.g. the time steps of a linear problem with a constant matrix only cost
+    forward and backward substitutions. By default, a matrix counts as unchanged if a checksum of its CSC arrays is
+    the same, which also detects changes in place (e.g. by an assembler writing into the same matrix); computing it
+    costs O(nnz) per solve. Passing a version to solve (e.g. a counter bumped after every reassembly) skips the
+    checksum: the factorization is then reused exactly while the same matrix object is passed with the same version.
+    """
+    COLUMN_ORDERINGS = ("COLAMD", "MMD_AT_PLUS_A", "MMD_ATA", "NATURAL")
 
-    def __init__(self):
+    def __init__(self, permc_spec="COLAMD", diag_pivot_thresh=None, options=None):
+        """
+        :param permc_spec: the column ordering reducing the fill-in, one of COLUMN_ORDERINGS
+        :param diag_pivot_thresh: threshold for partial pivoting (0: no pivoting, 1: full partial pivoting); see
+        scipy.sparse.linalg.splu
+        :param options: further SuperLU options passed to splu
+        """
         LinearSolver.__init__(self)
+        if permc_spec not in self.COLUMN_ORDERINGS:
+            raise Exception("Unknown column ordering '{0:s}', use one of {1:s}."
+                            .format(permc_spec, ", ".join(self.COLUMN_ORDERINGS)))
+        self._permc_spec = permc_spec
+        self._diag_pivot_thresh = diag_pivot_thresh
+        self._options = options or {}
+        self._matrix = None
+        self._key = None
+        self._factorization = None
+        self._n_factorizations = 0
+        self._n_solves = 0
 
-    def solve(self, lhs_matrix, lhs_vector, solution_vector):
-        solution_vector[:] = spl.spsolve(lhs_matrix, lhs_vector)
+    def factorize(self, matrix, version=None):
+        """
+        :param version: identifies the values of the matrix, see the class documentation; None: use a checksum
+        :return: the (cached) factorization of the matrix, a scipy.sparse.linalg.SuperLU object
+        """
+        csc = None
+        if version is None:
+            csc = sps.csc_matrix(matrix)
+            key = (None, csc.shape, self._checksum(csc))
+            same_matrix = True
+        else:
+            key = (version, matrix.shape, matrix.nnz)
+            same_matrix = self._matrix is matrix
+        if self._factorization is None or not same_matrix or self._key != key:
+            self._factorization = spl.splu(csc if csc is not None else sps.csc_matrix(matrix),
+                                           permc_spec=self._permc_spec, diag_pivot_thresh=self._diag_pivot_thresh,
+                                           options=self._options)
+            # the matrix is referenced so that its id cannot be taken by another object
+            self._matrix = matrix
+            self._key = key
+            self._n_factorizations += 1
+        return self._factorization
+
+    @staticmethod
+    def _checksum(csc):
+        checksum = 0
+        for array in (csc.indptr, csc.indices, csc.data):
+            checksum = zlib.crc32(np.ascontiguousarray(array), checksum)
+        return checksum
+
+    def solve(self, lhs_matrix, lhs_vector, solution_vector, version=None):
+        """
+        :param lhs_vector: the right-hand side, an array of shape (n,) or (n, n_rhs) for several right-hand sides
+        :param solution_vector: array of the same shape as lhs_vector receiving the solution
+        :param version: identifies the values of the matrix, see the class documentation
+        """
+        rhs = lhs_vector.toarray() if sps.issparse(lhs_vector) else np.asarray(lhs_vector)
+        factorization = self.factorize(lhs_matrix, version)
+        solution_vector[:] = factorization.solve(np.asarray(rhs, dtype=factorization.L.dtype).reshape(
+            solution_vector.shape))
+        self._n_solves += 1
+
+    def clear(self):
+        """Forgets the factorization, e.g. after the matrix has been changed in place."""
+        self._matrix = None
+        self._key = None
+        self._factorization = None
+
+    def statistics(self):
+        """
+        :return: dict with the numbers of factorizations and solves and, if a factorization exists, the number of
+        nonzeros of the matrix and of its factors L and U and the fill-in ratio nnz(L + U - I) / nnz(A)
+        """
+        statistics = dict(permc_spec=self._permc_spec, factorizations=self._n_factorizations,
+                          solves=self._n_solves)
+        if self._factorization is not None:
+            nnz_factors = self._factorization.L.nnz + self._factorization.U.nnz - self._factorization.shape[0]
+            statistics.update(matrix_nnz=self._matrix.nnz, l_nnz=self._factorization.L.nnz,
+                              u_nnz=self._factorization.U.nnz,
+                              fill_ratio=nnz_factors / float(max(self._matrix.nnz, 1)))
+        return statistics
@@ -14,8 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-
 import abc
+import copy
 
 
 class LazyEval(object):
@@ -58,6 +58,17 @@ class PhysicalElement(abc.ABC):
     def set_mesh_entity(self, mesh_entity):
         raise Exception('Abstract method called!')
 
+    def localize(self, mesh_entity):
+        """
+        Creates a view of this element on the given mesh entity. The element itself is not modified, thus
+        several localized elements may be used at the same time. Implementations of set_mesh_entity must therefore
+        not modify objects shared with other (localized) copies, but only rebind attributes of the copy.
+        :return: a shallow copy of this element with the mesh entity set
+        """
+        local_element = copy.copy(self)
+        local_element.set_mesh_entity(mesh_entity)
+        return local_element
+
     @abc.abstractmethod
     def boundary_normal(self, local_boundary_index, boundary_ref_point):
         raise Exception('Abstract method called!')
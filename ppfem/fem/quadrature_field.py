@@ -0,0 +1,186 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import numpy as np
+from ppfem.fem.eval_data import EvalData
+from ppfem.fem.geometry_cache import get_cell_geometry
+from ppfem.io.vtk_output import point_cloud_arrays, write_vtu_arrays
+
+
+class QuadratureField(object):
+    """
+    Values at the quadrature points of the cells of a mesh (e.g. stresses or internal variables), stored as
+    contiguous arrays with the first axis corresponding to the cell and the second one to the quadrature point:
+      `cell_indices`: shape (n_cells,)
+      `quadrature_points`: physical coordinates of the quadrature points, shape (n_cells, n_q, space_dim)
+      `values`: shape (n_cells, n_q) + value shape
+      `jxw`: the quadrature weights times the Jacobian determinants, shape (n_cells, n_q), or None
+    Objects are usually created by evaluate_at_quadrature_points.
+    """
+    def __init__(self, cell_indices, quadrature_points, values, jxw=None):
+        self.cell_indices = cell_indices
+        self.quadrature_points = quadrature_points
+        self.values = values
+        self.jxw = jxw
+
+    def number_of_cells(self):
+        return self.values.shape[0]
+
+    def number_of_quadrature_points(self):
+        return self.values.shape[1]
+
+    def value_shape(self):
+        return self.values.shape[2:]
+
+    def point_cloud(self):
+        """
+        :return: tuple (points, values) of shapes (n_cells * n_q, space_dim) and (n_cells * n_q,) + value shape
+        """
+        return (self.quadrature_points.reshape(-1, self.quadrature_points.shape[-1]),
+                self.values.reshape((-1,) + self.value_shape()))
+
+    def integrate(self):
+        """
+        :return: the integrals over the single cells, shape (n_cells,) + value shape
+        """
+        if self.jxw is None:
+            raise Exception("Integration needs the jxw values.")
+        return np.einsum('cq,cq...->c...', self.jxw, self.values)
+
+    def save(self, filename):
+        """
+        Writes the arrays as .npy files: the values to filename, the other arrays next to it to
+        <name>_cells.npy, <name>_points.npy and <name>_jxw.npy.
+        """
+        base = filename[:-4] if filename.endswith(".npy") else filename
+        np.save(base + ".npy", self.values)
+        np.save(base + "_cells.npy", self.cell_indices)
+        np.save(base + "_points.npy", self.quadrature_points)
+        if self.jxw is not None:
+            np.save(base + "_jxw.npy", self.jxw)
+
+    @classmethod
+    def load(cls, filename, mmap_mode=None):
+        """
+        Reads a field written by save().
+        :param mmap_mode: passed to numpy.load, e.g. "r" to memory-map the arrays
+        """
+        base = filename[:-4] if filename.endswith(".npy") else filename
+        jxw = np.load(base + "_jxw.npy", mmap_mode=mmap_mode) if os.path.exists(base + "_jxw.npy") else None
+        return cls(np.load(base + "_cells.npy", mmap_mode=mmap_mode),
+                   np.load(base + "_points.npy", mmap_mode=mmap_mode), np.load(base + ".npy", mmap_mode=mmap_mode), jxw)
+
+    def write_vtu(self, filename, name="values", compress=False):
+        """
+        Writes the quadrature points as VTK point cloud with the values and the index of the cell of each point as
+        point data.
+        """
+        points, values = self.point_cloud()
+        cells = np.repeat(np.asarray(self.cell_indices, dtype=np.int64), self.number_of_quadrature_points())
+        write_vtu_arrays(filename, point_cloud_arrays(points), [(name, values), ("cell_index", cells)], [], compress)
+
+
+def _function_data(function, cells, reference_points, inverse_jacobians, gradients, dof_arrays):
+    """
+    :return: tuple (values, gradients or None) of the function at the reference points of the given cells, which
+    all have the same number of vertices
+    """
+    space = function.function_space
+    element = space.get_element(space.get_mesh().entity_table().entity(cells[0]))
+    reference_element = element.get_reference_element()
+    n_bases = reference_element.n_of_bases()
+    n_components = element.value_dimension()
+    if id(space) not in dof_arrays:
+        dof_arrays[id(space)] = space.cell_dof_array()
+    dofs = dof_arrays[id(space)][cells, :n_bases * n_components]
+    if dofs.shape[1] < n_bases * n_components or np.any(dofs < 0):
+        raise Exception("The function has no dofs on some of the cells.")
+    dof_values = function.dof_values()[dofs].reshape(len(cells), n_bases, n_components)
+
+    shape_values = reference_element.tabulate_basis_function_values(reference_points).reshape(-1, n_bases)
+    values = np.einsum('qb,cbd->cqd', shape_values, dof_values)
+    grads = None
+    if gradients:
+        shape_gradients = reference_element.tabulate_basis_function_gradients(reference_points)
+        grads = np.einsum('qbr,cqrs,cbd->cqds', shape_gradients, inverse_jacobians, dof_values)
+    if n_components == 1:
+        values = values[:, :, 0]
+        grads = grads[:, :, 0] if grads is not None else None
+    return values, grads
+
+
+def evaluate_at_quadrature_points(expression, function_space, quadrature, functions=None, gradients=False):
+    """
+    Evaluates an expression at all quadrature points of all cells of a function space with one call per group of
+    cells with the same number of vertices instead of one call per point. The geometry is taken from the cell
+    geometry cache (see get_cell_geometry) and thus shared with the forms using the same mapping and quadrature.
+    :param expression: callable f(data) returning an array of shape (n_cells, n_q) + value shape for the cells of
+    one group; data is an EvalData with the attributes
+      `x`: physical coordinates of the quadrature points, shape (n_cells, n_q, space_dim)
+      `jxw`: shape (n_cells, n_q)
+      `cell_indices`: shape (n_cells,)
+      `<name>` for each entry of functions: the function values, shape (n_cells, n_q) + value shape
+      `grad_<name>` (only if gradients is True): the gradients, shape (n_cells, n_q) + value shape + (space_dim,)
+    If expression is None, the values of the only entry of functions are stored.
+    :param function_space: its cells and (via its element) mappings are used; it has to use mapped elements
+    :param functions: dict name -> FEFunction on the mesh of function_space, with mapped elements
+    :return: QuadratureField
+    """
+    functions = functions or {}
+    if expression is None:
+        if len(functions) != 1:
+            raise Exception("Without an expression exactly one function has to be given.")
+        name = next(iter(functions))
+
+        def expression(data):
+            return getattr(data, name)
+
+    mesh = function_space.get_mesh()
+    table = mesh.entity_table()
+    cells = np.flatnonzero(np.any(function_space.cell_dof_array() >= 0, axis=1))
+    n_vertices = table.number_of_vertices(cells)
+    reference_points = [qp.point for qp in quadrature.quadrature_data()]
+    dof_arrays = {}
+
+    parts = []
+    for n in np.unique(n_vertices):
+        group = cells[n_vertices == n]
+        mapping = function_space.get_element(table.entity(group[0])).get_mapping()
+        if hasattr(mapping, "get_fe_mapping"):
+            mapping = mapping.get_fe_mapping()
+        geometry = get_cell_geometry(mesh, mapping, quadrature)
+        rows = np.searchsorted(geometry.cell_indices, group)
+        inverse_jacobians = geometry.inverse_jacobians[rows]
+        data = EvalData(dict(x=geometry.quadrature_points[rows], jxw=geometry.jxw[rows], cell_indices=group))
+        for name, function in functions.items():
+            values, grads = _function_data(function, group, reference_points, inverse_jacobians, gradients,
+                                           dof_arrays)
+            data.add_attribute(name, values)
+            if gradients:
+                data.add_attribute("grad_" + name, grads)
+        values = np.asarray(expression(data))
+        if values.shape[:2] != (len(group), len(reference_points)):
+            raise Exception("The expression returned an array of shape {0!r}, expected ({1:d}, {2:d}, ...)."
+                            .format(values.shape, len(group), len(reference_points)))
+        parts.append((group, data.x, values, data.jxw))
+
+    if len(parts) == 1:
+        group, points, values, jxw = parts[0]
+        return QuadratureField(group, np.ascontiguousarray(points), np.ascontiguousarray(values),
+                               np.ascontiguousarray(jxw))
+    order = np.argsort(np.concatenate([part[0] for part in parts]), kind="stable")
+    return QuadratureField(*[np.concatenate([part[k] for part in parts])[order] for k in range(4)])
@@ -0,0 +1,97 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sps
+
+
+class GridTransfer(object):
+    """
+    Transfer of dof vectors between a function space on a mesh and one on a refinement of it (Mesh.refine()).
+    Both spaces have to use the same element with dofs on vertices only (like the Lagrange elements, whose
+    interior nodes are vertices of the mesh). The prolongation P interpolates coarse functions on the fine mesh,
+    the restriction is its transpose P^T (for residuals), and injection takes the values at the coarse vertices.
+    """
+
+    def __init__(self, coarse_space, fine_space):
+        coarse_mesh = coarse_space.get_mesh()
+        fine_mesh = fine_space.get_mesh()
+        if fine_mesh.parent() is not coarse_mesh:
+            raise Exception("The mesh of fine_space has to be a refinement of the mesh of coarse_space.")
+        coarse_dofs = coarse_space.vertex_dof_array()
+        fine_dofs = fine_space.vertex_dof_array()
+        n_coarse_vertex_dofs = np.count_nonzero(coarse_dofs >= 0)
+        n_fine_vertex_dofs = np.count_nonzero(fine_dofs >= 0)
+        if n_coarse_vertex_dofs != coarse_space.number_of_dofs or n_fine_vertex_dofs != fine_space.number_of_dofs:
+            raise NotImplementedError("GridTransfer requires function spaces with vertex dofs only.")
+        if coarse_dofs.shape[1] != fine_dofs.shape[1]:
+            raise Exception("Both function spaces need the same number of dofs per vertex.")
+
+        vertex_prolongation = fine_mesh.vertex_prolongation().tocoo()
+        rows = fine_dofs[vertex_prolongation.row].reshape(-1)
+        cols = coarse_dofs[vertex_prolongation.col].reshape(-1)
+        values = np.repeat(vertex_prolongation.data, coarse_dofs.shape[1])
+        used = (rows >= 0) & (cols >= 0)
+        self._prolongation = sps.csr_matrix((values[used], (rows[used], cols[used])),
+                                            shape=(fine_space.number_of_dofs, coarse_space.number_of_dofs))
+        self._restriction = self._prolongation.T.tocsr()
+
+        # coarse vertices are the rows of the vertex prolongation with a single entry 1
+        single = (np.diff(vertex_prolongation.tocsr().indptr) == 1)[vertex_prolongation.row]
+        kept = single & (vertex_prolongation.data == 1.0)
+        coarse_vertex_dofs = coarse_dofs[vertex_prolongation.col[kept]].reshape(-1)
+        fine_vertex_dofs = fine_dofs[vertex_prolongation.row[kept]].reshape(-1)
+        injected = (coarse_vertex_dofs >= 0) & (fine_vertex_dofs >= 0)
+        self._injection = (coarse_vertex_dofs[injected], fine_vertex_dofs[injected])
+        self._coarse_space = coarse_space
+        self._fine_space = fine_space
+
+    def prolongation(self):
+        """:return: sparse matrix of shape (fine dofs, coarse dofs)"""
+        return self._prolongation
+
+    def restriction(self):
+        """:return: sparse matrix of shape (coarse dofs, fine dofs), the transpose of prolongation()"""
+        return self._restriction
+
+    def prolongate(self, coarse_values):
+        """
+        :param coarse_values: dof vector of the coarse space or an FEFunction on it
+        :return: the dof vector of the interpolant on the fine space
+        """
+        return self._prolongation.dot(_dof_values(coarse_values))
+
+    def restrict(self, fine_values):
+        """
+        :param fine_values: dof vector of the fine space (e.g. a residual) or an FEFunction on it
+        :return: P^T fine_values
+        """
+        return self._restriction.dot(_dof_values(fine_values))
+
+    def inject(self, fine_values):
+        """
+        :param fine_values: dof vector of the fine space or an FEFunction on it
+        :return: the coarse dof vector holding the fine values at the coarse vertices
+        """
+        coarse_values = np.zeros(self._coarse_space.number_of_dofs)
+        coarse_values[self._injection[0]] = _dof_values(fine_values)[self._injection[1]]
+        return coarse_values
+
+
+def _dof_values(values):
+    if hasattr(values, "dof_values"):
+        return values.dof_values()
+    return np.asarray(values)
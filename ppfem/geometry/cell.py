@@ -25,6 +25,3 @@ class Cell(MeshEntity):
     @staticmethod
     def topological_dim():
         return 3
-
-    def _local_sub_entity_vertices(self):
-        raise NotImplementedError("Implement me!")
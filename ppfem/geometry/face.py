@@ -24,16 +24,3 @@ class Face(MeshEntity):
     @staticmethod
     def topological_dim():
         return 2
-
-    def _local_sub_entity_vertices(self):
-        if len(self._vertices) == 3:
-            return [(self._vertices[0], self._vertices[1]),
-                    (self._vertices[1], self._vertices[2]),
-                    (self._vertices[2], self._vertices[0])]
-        elif len(self._vertices) == 4:
-            return [(self._vertices[0], self._vertices[1]),
-                    (self._vertices[1], self._vertices[2]),
-                    (self._vertices[2], self._vertices[3]),
-                    (self._vertices[3], self._vertices[0])]
-        else:
-            raise NotImplementedError("Currently only linear triangle and quad faces support setting subentities.")
@@ -15,12 +15,14 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import abc
-import scipy as sp
+import numpy as np
 import scipy.linalg as spl
 from ppfem.geometry.point import Point
 
 
 class Mapping(abc.ABC):
+    __slots__ = ()
+
     def __init__(self):
         pass
 
@@ -44,60 +46,334 @@ class Mapping(abc.ABC):
         raise Exception("Abstract method called!")
 
 
+def jacobian_det(jac):
+    """
+    Computes the (generalized) determinant of a Jacobian as returned by Mapping.jacobian.
+    For non-square Jacobians of one-dimensional entities (a line in 2d or 3d) this is the length of the tangent.
+    """
+    if np.isscalar(jac):
+        return jac
+    elif np.all(np.array(jac.shape) == 1):
+        # an array with only one entry
+        return jac.item()
+    elif len(jac.shape) == 1 or jac.shape[0] == 1 or jac.shape[1] == 1:
+        return np.linalg.norm(jac)
+    elif jac.shape[0] == jac.shape[1]:
+        # a square matrix
+        return spl.det(jac)
+    else:
+        raise NotImplementedError("Computing Jacobian \"determinant\" not implemented for shape=({0:d}, {1:d})"
+                                  .format(*jac.shape))
+
+
+def inverse_jacobian(jac):
+    if np.isscalar(jac):
+        return np.array([[1 / jac]])
+    elif np.all(np.array(jac.shape) == 1):
+        return 1 / jac.reshape((1, 1))
+    elif len(jac.shape) == 1 or jac.shape[0] == 1 or jac.shape[1] == 1:
+        raise NotImplementedError("Maybe a projection approach is needed here.")
+    elif jac.shape[0] == jac.shape[1]:
+        return spl.inv(jac)
+    else:
+        raise NotImplementedError("Computing the inverse Jacobian not implemented for shape=({0:d}, {1:d})"
+                                  .format(*jac.shape))
+
+
+def _square_det(mats):
+    n = mats.shape[-1]
+    if n == 1:
+        return mats[..., 0, 0].copy()
+    elif n == 2:
+        return mats[..., 0, 0] * mats[..., 1, 1] - mats[..., 0, 1] * mats[..., 1, 0]
+    elif n == 3:
+        return (mats[..., 0, 0] * (mats[..., 1, 1] * mats[..., 2, 2] - mats[..., 1, 2] * mats[..., 2, 1])
+                - mats[..., 0, 1] * (mats[..., 1, 0] * mats[..., 2, 2] - mats[..., 1, 2] * mats[..., 2, 0])
+                + mats[..., 0, 2] * (mats[..., 1, 0] * mats[..., 2, 1] - mats[..., 1, 1] * mats[..., 2, 0]))
+    else:
+        raise NotImplementedError("Batched determinants are only implemented for matrices up to size 3x3.")
+
+
+def _square_inv(mats):
+    n = mats.shape[-1]
+    det = _square_det(mats)
+    inv = np.empty_like(mats)
+    if n == 1:
+        inv[..., 0, 0] = 1 / det
+        return inv
+    elif n == 2:
+        inv[..., 0, 0] = mats[..., 1, 1]
+        inv[..., 0, 1] = -mats[..., 0, 1]
+        inv[..., 1, 0] = -mats[..., 1, 0]
+        inv[..., 1, 1] = mats[..., 0, 0]
+    elif n == 3:
+        # adjugate, i.e. the transposed cofactor matrix
+        for i in range(3):
+            for j in range(3):
+                i1, i2 = (j + 1) % 3, (j + 2) % 3
+                j1, j2 = (i + 1) % 3, (i + 2) % 3
+                inv[..., i, j] = mats[..., i1, j1] * mats[..., i2, j2] - mats[..., i1, j2] * mats[..., i2, j1]
+    else:
+        raise NotImplementedError("Batched inverses are only implemented for matrices up to size 3x3.")
+    return inv / det[..., np.newaxis, np.newaxis]
+
+
+def batched_jacobian_det(jacs):
+    """
+    Batched version of jacobian_det.
+    :param jacs: array of shape (..., space_dim, reference_dim)
+    :return: array of shape (...); for reference_dim < space_dim this is the square root of the Gram determinant
+    det(J^T J), i.e. the length (area) scaling of the embedded line (surface)
+    """
+    if jacs.shape[-2] == jacs.shape[-1]:
+        return _square_det(jacs)
+    return np.sqrt(_square_det(np.einsum('...ki,...kj->...ij', jacs, jacs)))
+
+
+def batched_inverse_jacobian(jacs):
+    """
+    Batched version of inverse_jacobian using closed-form inverses.
+    :param jacs: array of shape (..., space_dim, reference_dim)
+    :return: array of shape (..., reference_dim, space_dim); for reference_dim < space_dim this is the
+    pseudo-inverse (J^T J)^-1 J^T
+    """
+    if jacs.shape[-2] == jacs.shape[-1]:
+        return _square_inv(jacs)
+    return np.einsum('...ij,...kj->...ik', _square_inv(np.einsum('...ki,...kj->...ij', jacs, jacs)), jacs)
+
+
+# relative deviation of the Jacobians at the support points below which a mesh entity is treated as affine
+AFFINE_TOLERANCE = 1e-10
+
+
+class AffineData(object):
+    """
+    Constant Jacobian, its determinant and its inverse of an affinely mapped mesh entity.
+    The inverse is None if the Jacobian is not invertible in the classical sense (e.g. a line in 2d).
+    The arrays are cached per entity and handed out by reference, hence they are read-only.
+    """
+    __slots__ = ("jacobian", "jacobian_det", "inverse_jacobian")
+
+    def __init__(self, jac):
+        self.jacobian = np.array(jac, dtype=float)
+        self.jacobian.flags.writeable = False
+        self.jacobian_det = jacobian_det(self.jacobian)
+        try:
+            self.inverse_jacobian = np.array(inverse_jacobian(self.jacobian), dtype=float)
+            self.inverse_jacobian.flags.writeable = False
+        except NotImplementedError:
+            self.inverse_jacobian = None
+
+
 class FEMapping(Mapping):
+    """
+    Maps points from reference to physical space by means of the shape functions of a reference element and the
+    vertex coordinates of a mesh entity (isoparametric concept).
+    Mesh entities whose Jacobian is constant (straight-sided, e.g. all degree-1 line geometries) are detected when
+    they are localized. For these, the Jacobian, its determinant and its inverse are computed once and kept per
+    entity; only curved entities are evaluated point by point.
+    Use `localize` to obtain an independent LocalFEMapping per entity. `set_mesh_entity` is kept for code that
+    uses the mapping object itself as the localized one.
+    """
     def __init__(self, element):
         Mapping.__init__(self)
         self._element = element
-        self._mesh_entity = None
+        self._local_mapping = None
+        self._affine_cache = {}
+        self._affine_cache_mesh = None
+        self._affine_cache_version = None
+        self._tabulation_cache = {}
+
+    def get_reference_element(self):
+        return self._element
+
+    def number_of_vertices(self):
+        """The number of vertices of mesh entities this mapping can be applied to."""
+        return self._element.n_of_bases()
 
     def set_mesh_entity(self, mesh_entity):
-        self._mesh_entity = mesh_entity
+        self._local_mapping = self.localize(mesh_entity)
 
     def localize(self, mesh_entity):
-        self.set_mesh_entity(mesh_entity)
-        return self
+        return LocalFEMapping(self, mesh_entity, self._get_affine_data(mesh_entity))
 
     def clear_mesh_entity(self):
-        self._mesh_entity = None
+        self._local_mapping = None
 
-    def map_point(self, reference_point):
-        return Point(self._element.function_value(self._mesh_entity.vertex_coords(),
-                                                  reference_point))
+    def clear_cache(self):
+        """Forget the per-entity affine data, e.g. after vertex coordinates have been changed."""
+        self._affine_cache = {}
+        self._affine_cache_mesh = None
+        if self._local_mapping is not None:
+            self.set_mesh_entity(self._local_mapping.mesh_entity())
 
-    def jacobian(self, reference_point):
-        jac = self._element.function_gradient(self._mesh_entity.vertex_coords(),
-                                              reference_point)
-        if sp.isscalar(jac):
-            return sp.array([[jac]])
-        elif sp.all(sp.array(jac.shape) == 1):
+    def is_affine(self):
+        return self._local_mapping.is_affine()
+
+    def _get_affine_data(self, mesh_entity):
+        mesh = mesh_entity.mesh()
+        if mesh is not self._affine_cache_mesh or mesh.geometry_version() != self._affine_cache_version:
+            self._affine_cache = {}
+            self._affine_cache_mesh = mesh
+            self._affine_cache_version = mesh.geometry_version()
+
+        key = (mesh_entity.topological_dim(), mesh_entity.index)
+        affine_data = self._affine_cache.get(key, False)
+        if affine_data is False:
+            affine_data = self._compute_affine_data(mesh_entity.vertex_coords())
+            self._affine_cache[key] = affine_data
+        return affine_data
+
+    def _compute_affine_data(self, vertex_coords):
+        """
+        The Jacobian of a polynomial geometry of degree p is a polynomial of degree p-1. If it takes the same value
+        at all p+1 support points of the element, it is constant. The values are compared with a tolerance relative
+        to the size of the Jacobian, so that the test does not depend on the scale of the mesh.
+        :return: an AffineData object or None if the Jacobian varies
+        """
+        jacs = [self._compute_jacobian(vertex_coords, p) for p in self._element.get_support_points()]
+        tolerance = AFFINE_TOLERANCE * np.abs(jacs[0]).max()
+        for jac in jacs[1:]:
+            if not np.allclose(jac, jacs[0], rtol=0.0, atol=tolerance):
+                return None
+        return AffineData(jacs[0])
+
+    def _compute_jacobian(self, vertex_coords, reference_point):
+        jac = self._element.function_gradient(vertex_coords, reference_point)
+        if np.isscalar(jac):
+            return np.array([[jac]])
+        elif np.all(np.array(jac.shape) == 1):
             return jac.reshape((1, 1))
         else:
             return jac
 
+    def _tabulate(self, reference_points):
+        reference_points = _as_point_array(reference_points)
+        key = (reference_points.shape, reference_points.tobytes())
+        tables = self._tabulation_cache.get(key)
+        if tables is None:
+            tables = (self._element.tabulate_basis_function_values(reference_points),
+                      self._element.tabulate_basis_function_gradients(reference_points))
+            self._tabulation_cache[key] = tables
+        return tables
+
+    def map_points_batch(self, vertex_coords, reference_points):
+        """
+        Maps the same reference points for many mesh entities at once.
+        :param vertex_coords: array of shape (n_entities, n_vertices, space_dim), vertex coordinates of the entities
+        in the local vertex order of the reference element
+        :param reference_points: array of shape (n_points, reference_dim) or a list of Points
+        :return: array of shape (n_entities, n_points, space_dim)
+        """
+        values, gradients = self._tabulate(reference_points)
+        return np.einsum('qb,cbd->cqd', values, vertex_coords)
+
+    def jacobians(self, vertex_coords, reference_points):
+        """
+        :return: array of shape (n_entities, n_points, space_dim, reference_dim); see map_points_batch
+        """
+        values, gradients = self._tabulate(reference_points)
+        return np.einsum('qbr,cbd->cqdr', gradients, vertex_coords)
+
+    def jacobian_dets(self, vertex_coords, reference_points):
+        """
+        :return: array of shape (n_entities, n_points); see map_points_batch
+        """
+        return batched_jacobian_det(self.jacobians(vertex_coords, reference_points))
+
+    def inverse_jacobians(self, vertex_coords, reference_points):
+        """
+        :return: array of shape (n_entities, n_points, reference_dim, space_dim); see map_points_batch
+        """
+        return batched_inverse_jacobian(self.jacobians(vertex_coords, reference_points))
+
+    def map_points_pointwise(self, vertex_coords, reference_points):
+        """
+        Maps one reference point per mesh entity, e.g. the iterates of a Newton inversion; nothing is cached.
+        :param vertex_coords: array of shape (n, n_vertices, space_dim)
+        :param reference_points: array of shape (n, reference_dim), row k belonging to entity k
+        :return: tuple (points, jacobians) of shapes (n, space_dim) and (n, space_dim, reference_dim)
+        """
+        values = self._element.tabulate_basis_function_values(reference_points)
+        gradients = self._element.tabulate_basis_function_gradients(reference_points)
+        return np.einsum('kb,kbd->kd', values, vertex_coords), np.einsum('kbr,kbd->kdr', gradients, vertex_coords)
+
+    def geometry(self, vertex_coords, reference_points):
+        """
+        Computes everything at once, evaluating the Jacobians only once.
+        :return: tuple (points, jacobians, jacobian_dets, inverse_jacobians); see the single methods for the shapes
+        """
+        jacs = self.jacobians(vertex_coords, reference_points)
+        return (self.map_points_batch(vertex_coords, reference_points), jacs, batched_jacobian_det(jacs),
+                batched_inverse_jacobian(jacs))
+
+    def _compute_point(self, vertex_coords, reference_point):
+        return Point(self._element.function_value(vertex_coords, reference_point))
+
+    def map_point(self, reference_point):
+        return self._local_mapping.map_point(reference_point)
+
+    def jacobian(self, reference_point):
+        return self._local_mapping.jacobian(reference_point)
+
     def jacobian_det(self, reference_point):
-        jac = self.jacobian(reference_point)
-        if sp.isscalar(jac):
-            return jac
-        elif sp.all(sp.array(jac.shape) == 1):
-            # an array with only one entry
-            return sp.asscalar(jac)
-        elif len(jac.shape) == 1 or jac.shape[0] == 1 or jac.shape[1] == 1:
-            return sp.linalg.norm(jac)
-        elif jac.shape[0] == jac.shape[1]:
-            # a square matrix
-            return spl.det(jac)
-        else:
-            raise NotImplementedError("Computing Jacobian \"determinant\" not implemented for shpae=({0:d}, {1:d})"
-                                      .format(jac.shape))
+        return self._local_mapping.jacobian_det(reference_point)
 
     def inverse_jacobian(self, reference_point):
-        jac = self.jacobian(reference_point)
-        if sp.isscalar(jac):
-            return sp.array([[1 / jac]])
-        elif sp.all(sp.array(jac.shape) == 1):
-            return 1 / jac.reshape((1, 1))
-        elif len(jac.shape) == 1 or jac.shape[0] == 1 or jac.shape[1] == 1:
-            raise NotImplementedError("Maybe a projection approach is needed here.")
-        elif jac.shape[0] == jac.shape[1]:
-            print(jac.shape, jac)
-            return spl.inv(jac)
+        return self._local_mapping.inverse_jacobian(reference_point)
+
+
+class LocalFEMapping(Mapping):
+    """
+    An FEMapping restricted to a single mesh entity. Objects are created by FEMapping.localize(), hold the vertex
+    coordinates of the entity and share the reference element of their FEMapping. They are never modified after
+    creation, so any number of them may be alive (and used from several threads) at the same time.
+    """
+    __slots__ = ("_fe_mapping", "_mesh_entity", "_vertex_coords", "_affine_data")
+
+    def __init__(self, fe_mapping, mesh_entity, affine_data=None):
+        Mapping.__init__(self)
+        self._fe_mapping = fe_mapping
+        self._mesh_entity = mesh_entity
+        self._vertex_coords = mesh_entity.vertex_coords()
+        self._affine_data = affine_data
+
+    def localize(self, mesh_entity):
+        return self._fe_mapping.localize(mesh_entity)
+
+    def get_fe_mapping(self):
+        """:return: the FEMapping this object was localized from"""
+        return self._fe_mapping
+
+    def mesh_entity(self):
+        return self._mesh_entity
+
+    def index(self):
+        return self._mesh_entity.index
+
+    def is_affine(self):
+        return self._affine_data is not None
+
+    def map_point(self, reference_point):
+        return self._fe_mapping._compute_point(self._vertex_coords, reference_point)
+
+    def jacobian(self, reference_point):
+        if self._affine_data is not None:
+            return self._affine_data.jacobian
+        return self._fe_mapping._compute_jacobian(self._vertex_coords, reference_point)
+
+    def jacobian_det(self, reference_point):
+        if self._affine_data is not None:
+            return self._affine_data.jacobian_det
+        return jacobian_det(self.jacobian(reference_point))
+
+    def inverse_jacobian(self, reference_point):
+        if self._affine_data is not None and self._affine_data.inverse_jacobian is not None:
+            return self._affine_data.inverse_jacobian
+        return inverse_jacobian(self.jacobian(reference_point))
+
+
+def _as_point_array(points):
+    if isinstance(points, np.ndarray):
+        return np.asarray(points, dtype=float).reshape(points.shape[0], -1)
+    return np.array([np.ravel(p.coords()) for p in points], dtype=float)
@@ -15,7 +15,6 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import abc
-import scipy as sp
 
 
 class MeshEntity(abc.ABC):
@@ -24,12 +23,31 @@ class MeshEntity(abc.ABC):
         self._number_of_vertices = len(self._vertices)
         self._mesh = mesh
         self._sub_entities = None
+        # the orientation array of the mesh the sub-entities were set up from
+        self._sub_entity_orientations = None
         self.index = index
-        self.domain_indicator = 0
-        self.boundary_indicator = None
         # self.mapping_index = None
         # self.quadrature_index = None
 
+    @property
+    def domain_indicator(self):
+        return self._mesh.entity_table(self.topological_dim()).domain_indicator(self.index)
+
+    @domain_indicator.setter
+    def domain_indicator(self, value):
+        self._mesh.entity_table(self.topological_dim()).set_domain_indicator(self.index, value)
+
+    @property
+    def boundary_indicator(self):
+        return self._mesh.entity_table(self.topological_dim()).boundary_indicator(self.index)
+
+    @boundary_indicator.setter
+    def boundary_indicator(self, value):
+        self._mesh.entity_table(self.topological_dim()).set_boundary_indicator(self.index, value)
+
+    def mesh(self):
+        return self._mesh
+
     def global_vertex_indices(self):
         return self._vertices
 
@@ -41,17 +59,13 @@ class MeshEntity(abc.ABC):
 
     def vertex_coords(self, local_vertex_number=None):
         if local_vertex_number is None:
-            return sp.array([v.coords() for v in self.vertices()])
+            return self._mesh.vertex_coords(self._vertices)
         else:
-            return self._mesh.select_vertex(local_vertex_number).coords()
+            return self._mesh.coordinates()[self._vertices[local_vertex_number]]
 
     def vertex(self, local_vertex_number):
         return self._mesh.vertex(self._vertices[local_vertex_number])
 
-    @abc.abstractmethod
-    def _local_sub_entity_vertices(self):
-        raise Exception('Abstract method called!')
-
     @staticmethod
     @abc.abstractmethod
     def topological_dim():
@@ -66,36 +80,33 @@ class MeshEntity(abc.ABC):
             return SubEntity.pos
 
     def set_sub_entities(self):
-        self._sub_entities = [self._get_sub_data(local_vertices)
-                              for local_vertices in self._local_sub_entity_vertices()]
+        """
+        Sets up the sub-entities (with their orientations) from the sub-entity arrays of the mesh, which are
+        generated for all entities of this dimension at once on the first request (see Mesh.sub_entities).
+        """
+        sub_dim = self.topological_dim() - 1
+        indices, orientations = self._mesh.sub_entities(self.topological_dim(), sub_dim)
+        sub_table = self._mesh.entity_table(sub_dim)
+        self._sub_entities = [SubEntity(sub_table.entity(int(i)), int(o))
+                              for i, o in zip(indices[self.index], orientations[self.index]) if i >= 0]
+        self._sub_entity_orientations = orientations
 
     def _sub_entity_indices(self):
-        return [s.index for s in self._sub_entities]
+        return [s.entity.index for s in self.sub_entities()]
 
     def sub_entities(self, filter_func=None):
-        if self._sub_entities is None:
-            return None
-        elif filter_func is None:
+        # set up again after the mesh regenerated its arrays, e.g. the orientations of the end points of lines in 1d
+        # after Mesh.move
+        orientations = self._mesh.sub_entities(self.topological_dim(), self.topological_dim() - 1)[1]
+        if self._sub_entities is None or orientations is not self._sub_entity_orientations:
+            self.set_sub_entities()
+        if filter_func is None:
             return self._sub_entities
         else:
             return filter(filter_func, self._sub_entities)
-        # subs = sorted(self._mesh.get_mesh_entities(topological_dim=self.topological_dim() - 1,
-        #                                            indices=self._sub_entity_indices(),
-        #                                            filter=filter_func),
-        #               key=self._sub_entity_indices().index)
 
     def get_sub_entity(self, sub_entity_index):
-        return self._sub_entities[sub_entity_index]
-
-    def _get_sub_data(self, local_sub_entity_vertices):
-        found = list(self._mesh.find_entities_with_vertices(local_sub_entity_vertices, self.topological_dim() - 1))
-        if len(found) == 0:
-            found.append(self._mesh.add_line(local_sub_entity_vertices))
-        elif len(found) > 1:
-            raise Exception("More than one entity with the given vertex indices were found!")
-
-        sub_data = SubEntity(found[0], found[0].ortientation(local_sub_entity_vertices))
-        return sub_data
+        return self.sub_entities()[sub_entity_index]
 
 
 class SubEntity(object):
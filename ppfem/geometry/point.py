@@ -18,14 +18,14 @@ import numpy as np
 
 
 class Point(object):
+    __slots__ = ("_coords", "index")
 
     def __init__(self, *coords, index=None):
-        self._coords = np.array(coords)
-        self._coords = self._coords.reshape((self._coords.size,))
+        self._coords = np.array(coords, dtype=float).reshape(-1)
         self.index = index
 
     def __getitem__(self, item):
-        return self._coords[item]
+        return self.coords()[item]
 
     def coords(self):
         return self._coords
@@ -18,11 +18,63 @@ from ppfem.geometry.point import Point
 
 
 class Vertex(Point):
+    """
+    A mesh vertex. Once added to a mesh, the vertex is only a view: its coordinates are stored as a row of the
+    coordinate array owned by the mesh (see Mesh.coordinates()), at the position of its global index, and its
+    indicators in the vertex EntityTable of the mesh.
+    """
+    __slots__ = ("_mesh", "_domain_indicator", "_boundary_indicator")
 
     def __init__(self, coords, global_number=None):
         Point.__init__(self, *coords, index=global_number)
-        self.domain_indicator = 0
-        self.boundary_indicator = None
+        self._mesh = None
+        self._domain_indicator = 0
+        self._boundary_indicator = None
+
+    @classmethod
+    def view(cls, mesh, global_number):
+        """Creates the object for a vertex that is already stored in the given mesh."""
+        vertex = cls.__new__(cls)
+        vertex._coords = None
+        vertex.index = global_number
+        vertex._mesh = mesh
+        return vertex
+
+    def coords(self):
+        if self._mesh is None:
+            return self._coords
+        return self._mesh.coordinates()[self.index]
+
+    def attach_to_mesh(self, mesh):
+        """Called by the mesh after coordinates and indicators have been copied to its arrays."""
+        self._mesh = mesh
+        self._coords = None
+
+    @property
+    def domain_indicator(self):
+        if self._mesh is None:
+            return self._domain_indicator
+        return self._mesh.entity_table(0).domain_indicator(self.index)
+
+    @domain_indicator.setter
+    def domain_indicator(self, value):
+        if self._mesh is None:
+            self._domain_indicator = value
+        else:
+            self._mesh.entity_table(0).set_domain_indicator(self.index, value)
+
+    @property
+    def boundary_indicator(self):
+        if self._mesh is None:
+            return self._boundary_indicator
+        return self._mesh.entity_table(0).boundary_indicator(self.index)
+
+    @boundary_indicator.setter
+    def boundary_indicator(self, value):
+        if self._mesh is None:
+            self._boundary_indicator = value
+        else:
+            self._mesh.entity_table(0).set_boundary_indicator(self.index, value)
 
     def global_index(self):
         return self.index
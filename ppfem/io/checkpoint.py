@@ -0,0 +1,179 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import os
+import shutil
+import numpy as np
+from ppfem.mesh.mesh import Mesh
+from ppfem.fem.function import FEFunction
+from ppfem.fem.function_space import FunctionSpace
+
+
+CHECKPOINT_FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+
+
+def save_checkpoint(directory, mesh, function_spaces=None, functions=None, sparsity=None, metadata=None):
+    """
+    Writes a checkpoint directory: one .npy file per array and a JSON manifest describing them. The directory is
+    first written under a temporary name and then renamed, so an interrupted write never leaves a checkpoint that
+    looks complete.
+    :param function_spaces: dict name -> FunctionSpace; their dof maps are stored
+    :param functions: dict name -> FEFunction; the dof vectors are stored together with the name of their function
+    space (which has to be contained in function_spaces)
+    :param sparsity: dict name -> tuple (rows, cols) as returned by the assemblers' get_sparsity
+    :param metadata: JSON serializable dict, e.g. time and step number
+    """
+    function_spaces = function_spaces or {}
+    functions = functions or {}
+    sparsity = sparsity or {}
+    temporary = directory.rstrip(os.sep) + ".tmp"
+    if os.path.exists(temporary):
+        shutil.rmtree(temporary)
+    os.makedirs(temporary)
+
+    def store(name, array):
+        np.save(os.path.join(temporary, name + ".npy"), np.asarray(array))
+        return name + ".npy"
+
+    mesh_arrays = dict((key, store("mesh_" + key, array)) for key, array in mesh.array_dict().items())
+    manifest = dict(format_version=CHECKPOINT_FORMAT_VERSION, metadata=metadata or {},
+                    mesh=dict(topological_dim=mesh.topological_dim(), arrays=mesh_arrays),
+                    function_spaces={}, functions={}, sparsity={})
+
+    space_names = {}
+    for name, space in function_spaces.items():
+        space_names[id(space)] = name
+        manifest["function_spaces"][name] = dict(
+            number_of_dofs=int(space.number_of_dofs), subdomain=space.get_subdomain(),
+            cell_dofs=store("space_{0:s}_cell_dofs".format(name), space.cell_dof_array()),
+            vertex_dofs=store("space_{0:s}_vertex_dofs".format(name), space.vertex_dof_array()))
+    for name, function in functions.items():
+        if id(function.function_space) not in space_names:
+            raise Exception("The function space of '{0:s}' has to be checkpointed as well.".format(name))
+        manifest["functions"][name] = dict(function_space=space_names[id(function.function_space)],
+                                           dof_values=store("function_{0:s}".format(name), function.dof_values()))
+    for name, (rows, cols) in sparsity.items():
+        manifest["sparsity"][name] = dict(rows=store("sparsity_{0:s}_rows".format(name), rows),
+                                          cols=store("sparsity_{0:s}_cols".format(name), cols))
+
+    with open(os.path.join(temporary, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    if os.path.exists(directory):
+        shutil.rmtree(directory)
+    os.rename(temporary, directory)
+
+
+class Checkpoint(object):
+    """
+    A checkpoint opened by load_checkpoint. The mesh is rebuilt from the (memory-mapped) arrays without copying;
+    function spaces and functions are restored on request since they need the elements. Arrays are mapped
+    copy-on-write: pages are read from the file on access, and modifications (e.g. Mesh.move) stay in memory.
+    With read_only=True they are mapped read-only instead, so that any number of worker processes opening the same
+    checkpoint share one physical copy through the page cache; modifying such a mesh copies the affected array.
+    """
+
+    def __init__(self, directory, mmap=True, read_only=False):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest["format_version"] != CHECKPOINT_FORMAT_VERSION:
+            raise Exception("Unsupported checkpoint format version {0:d}.".format(self.manifest["format_version"]))
+        self._mmap_mode = ("r" if read_only else "c") if mmap else None
+        self.metadata = self.manifest["metadata"]
+        self.mesh = self._load_mesh()
+
+    def array(self, filename):
+        return np.load(os.path.join(self.directory, filename), mmap_mode=self._mmap_mode)
+
+    def _load_mesh(self):
+        info = self.manifest["mesh"]
+        arrays = dict((key, self.array(filename)) for key, filename in info["arrays"].items())
+        return Mesh.from_array_dict(arrays, info["topological_dim"])
+
+    def function_space(self, name, element, mapping=None):
+        """:return: the FunctionSpace with the stored dof maps on the restored mesh"""
+        info = self.manifest["function_spaces"][name]
+        return FunctionSpace.from_dof_arrays(element, self.mesh, self.array(info["cell_dofs"]),
+                                             self.array(info["vertex_dofs"]), info["number_of_dofs"],
+                                             subdomain=info["subdomain"], mapping=mapping)
+
+    def dof_values(self, name):
+        """:return: the stored dof vector of a function (memory-mapped)"""
+        return self.array(self.manifest["functions"][name]["dof_values"])
+
+    def function(self, name, function_space, copy=True):
+        """
+        :param copy: if False, the function uses the memory-mapped dof vector as its storage
+        :return: a new FEFunction on function_space holding the stored dof values
+        """
+        if not copy:
+            return FEFunction(function_space, dof_values=self.dof_values(name))
+        function = FEFunction(function_space)
+        function.set_dof_values(self.dof_values(name))
+        return function
+
+    def sparsity(self, name):
+        """:return: tuple (rows, cols) of the stored sparsity pattern"""
+        info = self.manifest["sparsity"][name]
+        return self.array(info["rows"]), self.array(info["cols"])
+
+
+def load_checkpoint(directory, mmap=True, read_only=False):
+    """
+    :param mmap: memory-map the arrays (copy-on-write) instead of reading them
+    :param read_only: map the arrays read-only (shared between processes)
+    :return: a Checkpoint
+    """
+    return Checkpoint(directory, mmap, read_only)
+
+
+class CheckpointManager(object):
+    """
+    Rolling checkpoints: save() writes <root>/<prefix>_<step>; only the last `keep` checkpoints are kept.
+    """
+
+    def __init__(self, root, keep=2, prefix="checkpoint"):
+        if keep < 1:
+            raise Exception("At least one checkpoint must be kept, got keep={0:d}.".format(keep))
+        self._root = root
+        self._keep = keep
+        self._prefix = prefix
+        if not os.path.exists(root):
+            os.makedirs(root)
+
+    def checkpoints(self):
+        """:return: the complete checkpoint directories in ascending step order"""
+        names = [n for n in os.listdir(self._root) if n.startswith(self._prefix + "_") and not n.endswith(".tmp")]
+        names = [n for n in names if os.path.exists(os.path.join(self._root, n, MANIFEST))]
+        return [os.path.join(self._root, n) for n in sorted(names)]
+
+    def save(self, step, mesh, function_spaces=None, functions=None, sparsity=None, metadata=None):
+        """See save_checkpoint; the step number is added to the metadata."""
+        metadata = dict(metadata or {}, step=step)
+        directory = os.path.join(self._root, "{0:s}_{1:08d}".format(self._prefix, step))
+        save_checkpoint(directory, mesh, function_spaces, functions, sparsity, metadata)
+        for old in self.checkpoints()[:-self._keep]:
+            shutil.rmtree(old)
+        return directory
+
+    def latest(self, mmap=True):
+        """:return: the Checkpoint of the last step or None"""
+        checkpoints = self.checkpoints()
+        if len(checkpoints) == 0:
+            return None
+        return load_checkpoint(checkpoints[-1], mmap)
@@ -14,3 +14,324 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import numpy as np
+from ppfem.mesh.mesh import Mesh
+
+
+# Gmsh element type -> (topological dimension, number of nodes); the node order of all these types matches the one
+# of the mesh generators (for lines of higher order: end points first, then the interior nodes)
+GMSH_ELEMENT_TYPES = {
+    15: (0, 1),
+    1: (1, 2), 8: (1, 3), 26: (1, 4), 27: (1, 5), 28: (1, 6),
+    2: (2, 3), 3: (2, 4),
+    4: (3, 4), 5: (3, 8),
+}
+
+
+class _Elements(object):
+    """Element blocks of a Gmsh file: lists of (type, node tags (n, n_nodes), physical tags (n,))."""
+    def __init__(self):
+        self.blocks = []
+
+    def add(self, element_type, node_tags, physical_tags):
+        if element_type not in GMSH_ELEMENT_TYPES:
+            raise NotImplementedError("Gmsh elements of type {0:d} are not supported.".format(element_type))
+        self.blocks.append((element_type, node_tags, physical_tags))
+
+    def of_dimension(self, dim):
+        """:return: tuple (node tags, physical tags) of all elements of the given dimension"""
+        blocks = [b for b in self.blocks if GMSH_ELEMENT_TYPES[b[0]][0] == dim]
+        if len(set(b[0] for b in blocks)) > 1:
+            raise NotImplementedError("Meshes with different types of elements of dimension {0:d} are not "
+                                      "supported.".format(dim))
+        if len(blocks) == 0:
+            return None, None
+        return np.concatenate([b[1] for b in blocks]), np.concatenate([b[2] for b in blocks])
+
+    def max_dimension(self):
+        return max(GMSH_ELEMENT_TYPES[b[0]][0] for b in self.blocks)
+
+
+def _section(data, name):
+    """:return: the bytes between $name and $Endname (without the line breaks) or None"""
+    start = data.find(b"$" + name.encode() + b"\n")
+    if start < 0:
+        start = data.find(b"$" + name.encode() + b"\r\n")
+        if start < 0:
+            return None
+    start = data.index(b"\n", start) + 1
+    stop = data.index(b"$End" + name.encode(), start)
+    return data[start:stop]
+
+
+def _ascii(section, dtype):
+    return np.fromstring(section, dtype=dtype, sep=" ")
+
+
+def _token_counts_per_line(section):
+    """Number of whitespace separated tokens on every non-empty line, computed on the raw bytes."""
+    chars = np.frombuffer(section, dtype=np.uint8)
+    space = (chars == 32) | (chars == 9) | (chars == 10) | (chars == 13)
+    token_starts = ~space & np.concatenate([[True], space[:-1]])
+    line = np.cumsum(chars == 10) - (chars == 10)
+    counts = np.bincount(line[token_starts], minlength=int(line[-1]) + 1 if len(line) > 0 else 0)
+    return counts[counts > 0]
+
+
+class _Reader(object):
+    """Cursor over a bytes buffer for the binary sections of Gmsh files."""
+    def __init__(self, data, size_t):
+        self.data = data
+        self.position = 0
+        self.size_t = np.dtype("<u8") if size_t == 8 else np.dtype("<u4")
+
+    def read(self, dtype, count=1):
+        dtype = np.dtype(dtype)
+        values = np.frombuffer(self.data, dtype=dtype, count=count, offset=self.position)
+        self.position += dtype.itemsize * count
+        return values
+
+    def size(self, count=1):
+        return self.read(self.size_t, count).astype(np.int64)
+
+
+def _gmsh2_nodes(section, binary):
+    if not binary:
+        values = _ascii(section, float)
+        n = int(values[0])
+        rows = values[1:1 + 4 * n].reshape(n, 4)
+        return rows[:, 0].astype(np.int64), rows[:, 1:]
+    header_end = section.index(b"\n") + 1
+    n = int(section[:header_end])
+    rows = np.frombuffer(section, dtype=np.dtype([("tag", "<i4"), ("x", "<f8", (3,))]), count=n, offset=header_end)
+    return rows["tag"].astype(np.int64), rows["x"]
+
+
+def _gmsh2_elements(section, binary):
+    elements = _Elements()
+    if not binary:
+        first_line = section.index(b"\n") + 1
+        body = section[first_line:]
+        values = _ascii(body, np.int64)
+        lengths = _token_counts_per_line(body)
+        starts = np.cumsum(lengths) - lengths
+        types = values[starts + 1]
+        n_tags = values[starts + 2]
+        physical = np.where(n_tags > 0, values[np.minimum(starts + 3, len(values) - 1)], 0)
+        for element_type in np.unique(types):
+            selected = np.flatnonzero(types == element_type)
+            n_nodes = GMSH_ELEMENT_TYPES.get(int(element_type), (0, 0))[1]
+            first_node = starts[selected] + 3 + n_tags[selected]
+            nodes = values[first_node[:, np.newaxis] + np.arange(n_nodes)]
+            elements.add(int(element_type), nodes, physical[selected])
+        return elements
+    header_end = section.index(b"\n") + 1
+    n_total = int(section[:header_end])
+    reader = _Reader(section[header_end:], 4)
+    n_read = 0
+    while n_read < n_total:
+        element_type, n_elements, n_tags = reader.read("<i4", 3)
+        n_nodes = GMSH_ELEMENT_TYPES.get(int(element_type), (0, 0))[1]
+        rows = reader.read("<i4", int(n_elements) * (1 + n_tags + n_nodes)).reshape(n_elements, -1)
+        physical = rows[:, 1] if n_tags > 0 else np.zeros(n_elements, dtype=np.int64)
+        elements.add(int(element_type), rows[:, 1 + n_tags:].astype(np.int64), physical.astype(np.int64))
+        n_read += int(n_elements)
+    return elements
+
+
+def _gmsh4_entities(section, binary, size_t):
+    """:return: dict (dimension, entity tag) -> first physical tag (entities without physical tag are omitted)"""
+    physical = {}
+    if not binary:
+        values = _ascii(section, float)
+        counts = values[:4].astype(int)
+        position = 4
+        for dim in range(4):
+            for i in range(counts[dim]):
+                tag = int(values[position])
+                position += 4 if dim == 0 else 7
+                n_physical = int(values[position])
+                if n_physical > 0:
+                    physical[(dim, tag)] = int(values[position + 1])
+                position += 1 + n_physical
+                if dim > 0:
+                    position += 1 + int(values[position])
+        return physical
+    reader = _Reader(section, size_t)
+    counts = reader.size(4)
+    for dim in range(4):
+        for i in range(counts[dim]):
+            tag = int(reader.read("<i4")[0])
+            reader.read("<f8", 3 if dim == 0 else 6)
+            n_physical = int(reader.size()[0])
+            tags = reader.read("<i4", n_physical)
+            if n_physical > 0:
+                physical[(dim, tag)] = int(tags[0])
+            if dim > 0:
+                reader.read("<i4", int(reader.size()[0]))
+    return physical
+
+
+def _gmsh4_nodes(section, binary, size_t):
+    tags = []
+    coords = []
+    if not binary:
+        values = _ascii(section, float)
+        n_blocks = int(values[0])
+        position = 4
+        for block in range(n_blocks):
+            dim, parametric, n = int(values[position]), int(values[position + 2]), int(values[position + 3])
+            position += 4
+            tags.append(values[position:position + n].astype(np.int64))
+            position += n
+            width = 3 + (dim if parametric else 0)
+            coords.append(values[position:position + n * width].reshape(n, width)[:, :3])
+            position += n * width
+    else:
+        reader = _Reader(section, size_t)
+        n_blocks = int(reader.size(4)[0])
+        for block in range(n_blocks):
+            dim, tag, parametric = reader.read("<i4", 3)
+            n = int(reader.size()[0])
+            tags.append(reader.size(n))
+            width = 3 + (int(dim) if parametric else 0)
+            coords.append(reader.read("<f8", n * width).reshape(n, width)[:, :3])
+    if len(tags) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 3))
+    return np.concatenate(tags), np.concatenate(coords)
+
+
+def _gmsh4_elements(section, binary, size_t, physical):
+    elements = _Elements()
+    if not binary:
+        values = _ascii(section, np.int64)
+        n_blocks = int(values[0])
+        position = 4
+        for block in range(n_blocks):
+            dim, tag, element_type, n = (int(v) for v in values[position:position + 4])
+            position += 4
+            n_nodes = GMSH_ELEMENT_TYPES.get(element_type, (0, 0))[1]
+            rows = values[position:position + n * (1 + n_nodes)].reshape(n, 1 + n_nodes)
+            position += n * (1 + n_nodes)
+            elements.add(element_type, rows[:, 1:], np.full(n, physical.get((dim, tag), 0), dtype=np.int64))
+        return elements
+    reader = _Reader(section, size_t)
+    n_blocks = int(reader.size(4)[0])
+    for block in range(n_blocks):
+        dim, tag, element_type = (int(v) for v in reader.read("<i4", 3))
+        n = int(reader.size()[0])
+        n_nodes = GMSH_ELEMENT_TYPES.get(element_type, (0, 0))[1]
+        rows = reader.size(n * (1 + n_nodes)).reshape(n, 1 + n_nodes)
+        elements.add(element_type, rows[:, 1:], np.full(n, physical.get((dim, tag), 0), dtype=np.int64))
+    return elements
+
+
+def read_gmsh(filename, topological_dim=None, space_dim=None):
+    """
+    Reads a Gmsh mesh file of version 2 or 4.1 (not 4.0, which has a different layout) in ASCII or binary format.
+    Node and element blocks are parsed as whole arrays (numpy.frombuffer / numpy.fromstring) without Python loops
+    over nodes or elements.
+    The elements of the highest dimension (or topological_dim) become the cells, their (first) physical tags the
+    cell domain indicators. Elements of dimension topological_dim - 1 with a physical tag become facets with this
+    tag as boundary indicator; for line meshes, the physical tags of point elements become vertex boundary
+    indicators. Nodes are numbered in the order of the file.
+    :param space_dim: default: the highest coordinate direction in which not all nodes have coordinate zero (but at
+    least topological_dim)
+    :return: a Mesh built by Mesh.from_arrays
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    header = _section(data, "MeshFormat")
+    if header is None:
+        raise Exception("{0:s} is not a Gmsh mesh file.".format(filename))
+    version, file_type, data_size = header.split(b"\n")[0].split()[:3]
+    major, _, minor = version.decode().partition(".")
+    major, minor = int(major), int(minor or 0)
+    binary = int(file_type) == 1
+    if binary and np.frombuffer(header, dtype="<i4", count=1, offset=header.index(b"\n") + 1)[0] != 1:
+        raise NotImplementedError("Big-endian Gmsh files are not supported.")
+    size_t = int(data_size)
+
+    if major == 2:
+        node_tags, coordinates = _gmsh2_nodes(_section(data, "Nodes"), binary)
+        elements = _gmsh2_elements(_section(data, "Elements"), binary)
+    elif major == 4 and minor >= 1:
+        entities = _section(data, "Entities")
+        physical = {} if entities is None else _gmsh4_entities(entities, binary, size_t)
+        node_tags, coordinates = _gmsh4_nodes(_section(data, "Nodes"), binary, size_t)
+        elements = _gmsh4_elements(_section(data, "Elements"), binary, size_t, physical)
+    else:
+        raise NotImplementedError("Gmsh files of version {0:s} are not supported.".format(version.decode()))
+
+    node_index = np.full(int(node_tags.max()) + 1 if len(node_tags) > 0 else 0, -1, dtype=np.int64)
+    node_index[node_tags] = np.arange(len(node_tags))
+
+    if topological_dim is None:
+        topological_dim = elements.max_dimension()
+    if space_dim is None:
+        used = np.flatnonzero(np.any(coordinates != 0.0, axis=0))
+        space_dim = max(topological_dim, int(used[-1]) + 1 if len(used) > 0 else 1)
+
+    cells, cell_tags = elements.of_dimension(topological_dim)
+    arrays = dict(coordinates=coordinates[:, :space_dim], cells=node_index[cells], topological_dim=topological_dim,
+                  cell_domain_indicators=cell_tags)
+    facets, facet_tags = elements.of_dimension(topological_dim - 1)
+    if facets is not None:
+        tagged = facet_tags > 0
+        if topological_dim == 1:
+            vertex_indicators = np.full(len(node_tags), -1, dtype=np.int64)
+            vertex_indicators[node_index[facets[tagged, 0]]] = facet_tags[tagged]
+            arrays["vertex_boundary_indicators"] = vertex_indicators
+        elif np.any(tagged):
+            arrays["facets"] = node_index[facets[tagged]]
+            arrays["facet_boundary_indicators"] = facet_tags[tagged]
+    return Mesh.from_arrays(**arrays)
+
+
+def read_text(filename, topological_dim=None, space_dim=None):
+    """
+    Reads the plain whitespace separated format (lines starting with # before the first line are comments):
+      n_vertices space_dim n_cells n_vertices_per_cell topological_dim
+      x_0 ... (space_dim coordinates per vertex, n_vertices lines)
+      v_0 ... v_k domain_indicator (0-based vertex indices per cell, n_cells lines)
+    The whole file is parsed with one call of numpy.fromstring.
+    :param topological_dim: default: the topological dimension given in the file
+    :param space_dim: number of leading coordinate columns to keep; default: all columns of the file
+    :return: a Mesh built by Mesh.from_arrays
+    """
+    with open(filename, "rb") as f:
+        data = f.read()
+    # comments are skipped on the original buffer, a single pass over their characters
+    start = 0
+    while True:
+        while data[start:start + 1].isspace():
+            start += 1
+        if data[start:start + 1] != b"#":
+            break
+        end = data.find(b"\n", start)
+        start = len(data) if end < 0 else end + 1
+    values = _ascii(data[start:], float)
+    n_vertices, file_space_dim, n_cells, n_per_cell, file_topological_dim = (int(v) for v in values[:5])
+    if space_dim is None:
+        space_dim = file_space_dim
+    elif space_dim > file_space_dim:
+        raise Exception("{0:s} has only {1:d} coordinates per vertex.".format(filename, file_space_dim))
+    if topological_dim is None:
+        topological_dim = file_topological_dim
+    coordinates_end = 5 + n_vertices * file_space_dim
+    coordinates = values[5:coordinates_end].reshape(n_vertices, file_space_dim)[:, :space_dim]
+    cells = values[coordinates_end:coordinates_end + n_cells * (n_per_cell + 1)].reshape(n_cells, n_per_cell + 1)
+    cells = cells.astype(np.int64)
+    return Mesh.from_arrays(coordinates, cells[:, :n_per_cell], topological_dim=topological_dim,
+                            cell_domain_indicators=cells[:, n_per_cell])
+
+
+def read_mesh(filename, topological_dim=None, space_dim=None):
+    """
+    Reads a mesh file, choosing the format by the extension: .msh (read_gmsh), anything else: read_text.
+    :param topological_dim: see read_gmsh and read_text
+    :param space_dim: see read_gmsh and read_text
+    """
+    if filename.lower().endswith(".msh"):
+        return read_gmsh(filename, topological_dim=topological_dim, space_dim=space_dim)
+    return read_text(filename, topological_dim=topological_dim, space_dim=space_dim)
@@ -0,0 +1,150 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from multiprocessing import shared_memory
+from ppfem.mesh.mesh import Mesh
+from ppfem.fem.function import FEFunction
+from ppfem.fem.function_space import FunctionSpace
+
+
+_ALIGNMENT = 64
+
+
+class SharedArrays(object):
+    """
+    A set of named numpy arrays stored in one multiprocessing.shared_memory block. The process creating the block
+    passes handle() (a small picklable dict) to its workers, which attach() to the same physical memory instead of
+    receiving copies (workers are expected to be started by multiprocessing). The arrays are views into the block:
+    keep this object alive as long as they are in use. The creating process calls unlink() once all workers are done.
+    """
+
+    def __init__(self, memory, layout, metadata, read_only):
+        self._memory = memory
+        self._layout = layout
+        self.metadata = metadata
+        self.arrays = {}
+        for key, (offset, shape, dtype) in layout.items():
+            array = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=memory.buf, offset=offset)
+            array.flags.writeable = not read_only
+            self.arrays[key] = array
+
+    @classmethod
+    def create(cls, arrays, metadata=None):
+        """
+        Copies arrays into a new shared memory block.
+        :param arrays: dict name -> array
+        :param metadata: small picklable dict passed along with the handle
+        """
+        layout = {}
+        size = 0
+        for key, array in arrays.items():
+            array = np.asarray(array)
+            layout[key] = (size, array.shape, array.dtype.str)
+            size += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls(memory, layout, metadata or {}, read_only=False)
+        for key, array in arrays.items():
+            shared.arrays[key][...] = array
+        return shared
+
+    @classmethod
+    def attach(cls, handle, read_only=True):
+        """
+        :param handle: as returned by handle() in the creating process
+        :param read_only: mark the arrays read-only
+        """
+        try:
+            memory = shared_memory.SharedMemory(name=handle["name"], track=False)
+        except TypeError:
+            # before Python 3.13 attaching registers the block with the resource tracker; that is harmless for
+            # workers started by multiprocessing from the creating process since they share its tracker
+            memory = shared_memory.SharedMemory(name=handle["name"])
+        return cls(memory, handle["layout"], handle["metadata"], read_only)
+
+    def handle(self):
+        return dict(name=self._memory.name, layout=self._layout, metadata=self.metadata)
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        """Releases this process' mapping; the arrays must not be used afterwards."""
+        self.arrays = {}
+        self._memory.close()
+
+    def unlink(self):
+        """Frees the block (in the creating process, after all workers closed it)."""
+        self._memory.unlink()
+
+
+def share_mesh(mesh):
+    """
+    :return: SharedArrays holding the arrays of the mesh (see Mesh.array_dict)
+    """
+    return SharedArrays.create(mesh.array_dict(), metadata=dict(topological_dim=mesh.topological_dim()))
+
+
+def attach_mesh(handle, read_only=True):
+    """
+    Rebuilds a mesh on top of shared arrays without copying them. Read-only arrays are copied by the mesh on the first
+    modification that needs it (e.g. Mesh.move), so the shared copy is never changed.
+    :return: tuple (mesh, shared) where shared is the SharedArrays that has to be kept alive with the mesh
+    """
+    shared = SharedArrays.attach(handle, read_only)
+    return Mesh.from_array_dict(shared.arrays, shared.metadata["topological_dim"]), shared
+
+
+def share_function_space(function_space):
+    """
+    :return: SharedArrays holding the dof maps of the function space
+    """
+    return SharedArrays.create(dict(cell_dofs=function_space.cell_dof_array(),
+                                    vertex_dofs=function_space.vertex_dof_array()),
+                               metadata=dict(number_of_dofs=function_space.number_of_dofs,
+                                             subdomain=function_space.get_subdomain()))
+
+
+def attach_function_space(handle, element, mesh, mapping=None):
+    """
+    :param mesh: the mesh the function space was created on, e.g. from attach_mesh
+    :return: tuple (function_space, shared)
+    """
+    shared = SharedArrays.attach(handle, read_only=True)
+    space = FunctionSpace.from_dof_arrays(element, mesh, shared["cell_dofs"], shared["vertex_dofs"],
+                                          shared.metadata["number_of_dofs"], subdomain=shared.metadata["subdomain"],
+                                          mapping=mapping)
+    return space, shared
+
+
+def share_functions(functions):
+    """
+    Copies the dof vectors of several functions into one shared block.
+    :param functions: dict name -> FEFunction
+    :return: SharedArrays with one dof vector per name
+    """
+    return SharedArrays.create(dict((name, function.dof_values()) for name, function in functions.items()))
+
+
+def attach_functions(handle, function_space, read_only=True):
+    """
+    :param function_space: function space of all shared functions (e.g. from attach_function_space)
+    :param read_only: if False, workers may write their results into the shared dof vectors (disjoint parts)
+    :return: tuple (dict name -> FEFunction using the shared dof vectors as storage, shared)
+    """
+    shared = SharedArrays.attach(handle, read_only)
+    functions = dict((name, FEFunction(function_space, dof_values=values)) for name, values in shared.arrays.items())
+    return functions, shared
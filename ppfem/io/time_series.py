@@ -0,0 +1,142 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import queue
+import threading
+import numpy as np
+from ppfem.io.vtk_output import mesh_arrays, data_arrays, write_vtu_arrays, write_pvd, write_pvtu
+
+
+class TimeSeriesWriter(object):
+    """
+    Writes a ParaView collection (.pvd) of one VTU file per time step. write() copies the data into a bounded queue
+    and returns; a background thread serializes the snapshots (file output and zlib release the GIL, so this
+    overlaps with assembly and solving). If max_pending snapshots are waiting, write() blocks until the writer has
+    caught up (backpressure). flush() waits until everything queued so far is on disk, close() also stops the thread.
+    The .pvd file is rewritten after every step, so the series can be opened while the simulation is running.
+    The mesh arrays are copied only when the geometry or topology of the mesh has changed since the last step.
+    """
+
+    def __init__(self, filename, mesh, max_pending=2, compress=False, indicators=False):
+        """
+        :param filename: the .pvd file; the VTU files are written next to it as <name>_<step>.vtu
+        """
+        self._filename = filename
+        self._mesh = mesh
+        self._compress = compress
+        self._indicators = indicators
+        self._directory, name = os.path.split(filename)
+        self._base = os.path.splitext(name)[0]
+        self._steps = []
+        self._geometry = None
+        self._geometry_key = None
+        self._error = None
+        # encoded geometry arrays, reused by the background thread while the mesh does not change
+        self._geometry_cache = {}
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = threading.Thread(target=self._run, name="TimeSeriesWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, time, point_data=None, cell_data=None):
+        """
+        Queues a snapshot of the given data (see ppfem.io.vtk_output.write_vtu for the arguments); the arrays may be
+        modified as soon as this returns.
+        """
+        self._raise_error()
+        if self._thread is None:
+            raise Exception("TimeSeriesWriter has been closed.")
+        key = (self._mesh.geometry_version(), self._mesh.topology_version())
+        if key != self._geometry_key:
+            self._geometry = dict((name, np.array(array)) for name, array in mesh_arrays(self._mesh).items())
+            self._geometry_key = key
+        point_arrays, cell_arrays = data_arrays(self._mesh, point_data, cell_data, self._indicators)
+        snapshot = ([(name, np.array(array)) for name, array in point_arrays],
+                    [(name, np.array(array)) for name, array in cell_arrays])
+        vtu_name = "{0:s}_{1:06d}.vtu".format(self._base, len(self._steps))
+        self._steps.append((time, vtu_name))
+        self._queue.put((vtu_name, self._geometry, snapshot, list(self._steps)))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._error is None:
+                    vtu_name, geometry, (point_arrays, cell_arrays), steps = item
+                    write_vtu_arrays(os.path.join(self._directory, vtu_name), geometry, point_arrays, cell_arrays,
+                                     self._compress, geometry_cache=self._geometry_cache)
+                    write_pvd(self._filename, steps)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def flush(self):
+        """Blocks until all queued snapshots are written."""
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """Writes the remaining snapshots and stops the background thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PartitionedTimeSeries(object):
+    """
+    The index of a time series written in pieces by worker processes: per step, every worker writes the piece of
+    its partition (ppfem.io.vtk_output.write_vtu_piece to piece_filename(step, part)) and returns the description of
+    the piece; the parent only passes these to add_step, which writes <name>_<step>.pvtu and rewrites the .pvd file.
+    No field data goes through the parent.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: the .pvd file; all other files are written next to it
+        """
+        self._filename = filename
+        self._directory, name = os.path.split(filename)
+        self._base = os.path.splitext(name)[0]
+        self._steps = []
+
+    def piece_filename(self, step, part):
+        return os.path.join(self._directory, "{0:s}_{1:06d}_{2:04d}.vtu".format(self._base, step, part))
+
+    def add_step(self, step, time, pieces):
+        """
+        :param pieces: the descriptions returned by write_vtu_piece for all parts of the step
+        """
+        pvtu_name = "{0:s}_{1:06d}.pvtu".format(self._base, step)
+        write_pvtu(os.path.join(self._directory, pvtu_name), sorted(pieces, key=lambda piece: piece["filename"]))
+        self._steps.append((time, pvtu_name))
+        write_pvd(self._filename, self._steps)
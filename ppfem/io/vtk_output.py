@@ -14,3 +14,288 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import zlib
+import numpy as np
+
+
+# VTK cell types by (topological dimension, number of vertices); lines with more than two vertices are written as
+# VTK_LAGRANGE_CURVE, whose node order (end points, then interior nodes) is the one of LagrangeLine
+VTK_VERTEX = 1
+VTK_LINE = 3
+VTK_TRIANGLE = 5
+VTK_QUAD = 9
+VTK_TETRA = 10
+VTK_HEXAHEDRON = 12
+VTK_LAGRANGE_CURVE = 68
+
+_VTK_CELL_TYPES = {(2, 3): VTK_TRIANGLE, (2, 4): VTK_QUAD, (3, 4): VTK_TETRA, (3, 8): VTK_HEXAHEDRON}
+
+_VTK_DATA_TYPES = {np.dtype("float64"): "Float64", np.dtype("float32"): "Float32", np.dtype("int64"): "Int64",
+                   np.dtype("int32"): "Int32", np.dtype("uint8"): "UInt8", np.dtype("int8"): "Int8",
+                   np.dtype("uint64"): "UInt64", np.dtype("uint32"): "UInt32"}
+
+# size of the blocks compressed separately (the default of VTK)
+COMPRESSION_BLOCK_SIZE = 32768
+
+
+def vtk_cell_type(topological_dim, n_vertices):
+    if topological_dim == 1:
+        return VTK_LINE if n_vertices == 2 else VTK_LAGRANGE_CURVE
+    try:
+        return _VTK_CELL_TYPES[(topological_dim, n_vertices)]
+    except KeyError:
+        raise NotImplementedError("No VTK cell type for cells of dimension {0:d} with {1:d} vertices."
+                                  .format(topological_dim, n_vertices))
+
+
+def mesh_arrays(mesh, cells=None):
+    """
+    The arrays describing the mesh in a VTK unstructured grid. Connectivity (of uniform meshes) and coordinates (of
+    three-dimensional meshes) are views of the mesh arrays, not copies.
+    :param cells: optional indices of the cells to describe (e.g. a partition); only their vertices are included,
+    numbered in ascending order of the global vertex indices
+    :return: dict with the entries points (n, 3), connectivity, offsets and types; if cells are given also vertices,
+    the global indices of the points
+    """
+    table = mesh.entity_table()
+    indices = table.indices() if cells is None else np.asarray(cells, dtype=np.int64)
+    if cells is None and table.is_contiguous():
+        connectivity = table.connectivity()
+    else:
+        connectivity = table.connectivity(indices)
+    n_vertices = table.number_of_vertices(indices)
+    vertices = None
+    if cells is not None:
+        valid = connectivity >= 0
+        vertices = np.unique(connectivity[valid])
+        connectivity = np.where(valid, np.searchsorted(vertices, connectivity), -1)
+    uniform = n_vertices.size == 0 or bool(np.all(n_vertices == n_vertices[0]))
+    if uniform:
+        width = int(n_vertices[0]) if n_vertices.size else connectivity.shape[1]
+        offsets = np.arange(1, len(indices) + 1, dtype=np.int64) * width
+        flat = connectivity[:, :width].reshape(-1)
+    else:
+        offsets = np.cumsum(n_vertices)
+        flat = connectivity[connectivity >= 0]
+    types = np.array([vtk_cell_type(mesh.topological_dim(), int(n)) for n in np.unique(n_vertices)], dtype=np.uint8)
+    types = types[np.searchsorted(np.unique(n_vertices), n_vertices)]
+
+    points = mesh.coordinates() if vertices is None else mesh.coordinates()[vertices]
+    if points.shape[1] != 3:
+        padded = np.zeros((points.shape[0], 3))
+        padded[:, :points.shape[1]] = points
+        points = padded
+    arrays = dict(points=points, connectivity=flat, offsets=offsets, types=types)
+    if vertices is not None:
+        arrays["vertices"] = vertices
+    return arrays
+
+
+def point_cloud_arrays(points):
+    """
+    The arrays describing a cloud of unconnected points (one VTK vertex cell per point).
+    :param points: array of shape (n, space_dim)
+    :return: dict as returned by mesh_arrays
+    """
+    points = np.asarray(points)
+    if points.shape[1] != 3:
+        padded = np.zeros((points.shape[0], 3))
+        padded[:, :points.shape[1]] = points
+        points = padded
+    n = points.shape[0]
+    return dict(points=points, connectivity=np.arange(n, dtype=np.int64), offsets=np.arange(1, n + 1, dtype=np.int64),
+                types=np.full(n, VTK_VERTEX, dtype=np.uint8))
+
+
+def vertex_values(function):
+    """
+    :param function: an FEFunction with dofs on vertices only
+    :return: array of shape (n_vertices,) or (n_vertices, dofs per vertex); a view of the dof values if the dofs are
+    numbered like the vertices
+    """
+    dofs = function.function_space.vertex_dof_array()
+    values = function.dof_values()
+    if dofs.size == values.size and np.array_equal(dofs.reshape(-1), np.arange(values.size)):
+        values = values.reshape(dofs.shape)
+    else:
+        values = np.where(dofs >= 0, values[np.maximum(dofs, 0)], np.nan)
+    return values[:, 0] if values.shape[1] == 1 else values
+
+
+def data_arrays(mesh, point_data=None, cell_data=None, indicators=False):
+    """
+    :param point_data: dict name -> FEFunction or array with one row per vertex
+    :param cell_data: dict name -> array with one row per cell
+    :param indicators: add the domain indicators of the cells and the boundary indicators of the vertices
+    :return: tuple of lists (point arrays, cell arrays) of (name, array)
+    """
+    points = []
+    for name, values in sorted((point_data or {}).items()):
+        if hasattr(values, "dof_values"):
+            values = vertex_values(values)
+        points.append((name, np.asarray(values)))
+    cells = [(name, np.asarray(values)) for name, values in sorted((cell_data or {}).items())]
+    if indicators:
+        points.append(("boundary_indicator", mesh.entity_table(0).boundary_indicators(writeable=False)))
+        cells.append(("domain_indicator", mesh.entity_table().domain_indicators(writeable=False)))
+    return points, cells
+
+
+def _encode(array, compress, level):
+    """:return: list of byte-like blocks of the appended data of one array (header included)"""
+    data = memoryview(np.ascontiguousarray(array)).cast("B")
+    if not compress:
+        return [np.array([data.nbytes], dtype="<u8").tobytes(), data]
+    n_blocks = max(1, -(-data.nbytes // COMPRESSION_BLOCK_SIZE))
+    blocks = [zlib.compress(data[i * COMPRESSION_BLOCK_SIZE:(i + 1) * COMPRESSION_BLOCK_SIZE], level)
+              for i in range(n_blocks)]
+    last = data.nbytes - (n_blocks - 1) * COMPRESSION_BLOCK_SIZE
+    header = np.array([n_blocks, COMPRESSION_BLOCK_SIZE, last] + [len(b) for b in blocks], dtype="<u8")
+    return [header.tobytes()] + blocks
+
+
+def _data_array_tag(name, array, offset):
+    if array.dtype == bool:
+        raise Exception("Convert boolean array '{0:s}' to integers before writing.".format(name))
+    components = 1 if array.ndim == 1 else int(np.prod(array.shape[1:]))
+    return '<DataArray type="{0:s}" Name="{1:s}" NumberOfComponents="{2:d}" format="appended" offset="{3:d}"/>\n' \
+        .format(_VTK_DATA_TYPES[array.dtype], name, components, offset)
+
+
+def write_vtu(filename, mesh, point_data=None, cell_data=None, compress=False, compression_level=6,
+              indicators=False):
+    """
+    Writes the mesh and data on it as VTK XML unstructured grid with raw binary appended data. Arrays are written
+    from the buffers of the mesh and the given data without copying where possible (see mesh_arrays,
+    vertex_values). Lines of higher order become VTK Lagrange curves.
+    :param point_data: dict name -> FEFunction (dofs on vertices only) or array with one row per vertex
+    :param cell_data: dict name -> array with one row per cell
+    :param compress: compress the arrays with zlib
+    :param indicators: also write domain indicators (cell data) and boundary indicators (point data)
+    """
+    geometry = mesh_arrays(mesh)
+    point_arrays, cell_arrays = data_arrays(mesh, point_data, cell_data, indicators)
+    write_vtu_arrays(filename, geometry, point_arrays, cell_arrays, compress, compression_level)
+
+
+def write_vtu_arrays(filename, geometry, point_arrays, cell_arrays, compress=False, compression_level=6,
+                     geometry_cache=None):
+    """
+    Writes arrays prepared by mesh_arrays and data_arrays; see write_vtu.
+    :param geometry_cache: optional dict that keeps the encoded geometry arrays for files written with the same
+    geometry dict
+    """
+    blocks = []
+    offset = [0]
+    if geometry_cache is not None and geometry_cache.get("geometry") is not geometry:
+        geometry_cache.clear()
+        geometry_cache["geometry"] = geometry
+
+    def append_encoded(name, array, encoded):
+        tag = _data_array_tag(name, np.asarray(array), offset[0])
+        blocks.extend(encoded)
+        offset[0] += sum(memoryview(b).nbytes for b in encoded)
+        return tag
+
+    def append(name, array):
+        return append_encoded(name, array, _encode(array, compress, compression_level))
+
+    def append_geometry(name, key):
+        # the geometry arrays are cached by their key in the geometry dict, never by the name of a data array
+        if geometry_cache is None:
+            return append(name, geometry[key])
+        if key not in geometry_cache:
+            geometry_cache[key] = _encode(geometry[key], compress, compression_level)
+        return append_encoded(name, geometry[key], geometry_cache[key])
+
+    n_points = geometry["points"].shape[0]
+    n_cells = geometry["types"].shape[0]
+    xml = ['<?xml version="1.0"?>\n',
+           '<VTKFile type="UnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64"{0:s}>\n'
+           .format(' compressor="vtkZLibDataCompressor"' if compress else ''),
+           '<UnstructuredGrid>\n',
+           '<Piece NumberOfPoints="{0:d}" NumberOfCells="{1:d}">\n'.format(n_points, n_cells),
+           '<Points>\n', append_geometry("Points", "points"), '</Points>\n',
+           '<Cells>\n', append_geometry("connectivity", "connectivity"), append_geometry("offsets", "offsets"),
+           append_geometry("types", "types"), '</Cells>\n',
+           '<PointData>\n'] + [append(name, array) for name, array in point_arrays] + \
+          ['</PointData>\n', '<CellData>\n'] + [append(name, array) for name, array in cell_arrays] + \
+          ['</CellData>\n', '</Piece>\n', '</UnstructuredGrid>\n', '<AppendedData encoding="raw">\n_']
+    with open(filename, "wb") as f:
+        f.write("".join(xml).encode())
+        for block in blocks:
+            f.write(block)
+        f.write(b"\n</AppendedData>\n</VTKFile>\n")
+
+
+def _array_info(name, array):
+    components = 1 if array.ndim == 1 else int(np.prod(array.shape[1:]))
+    return name, _VTK_DATA_TYPES[array.dtype], components
+
+
+def write_vtu_piece(filename, mesh, cells, point_data=None, cell_data=None, compress=False, compression_level=6,
+                    indicators=False, geometry=None):
+    """
+    Writes the given cells (e.g. the owned cells of a Partition) as a VTU file to be referenced by a .pvtu file.
+    This is meant to be called by the worker responsible for the cells, with data given for the whole mesh (e.g.
+    living in shared memory); only the rows of the piece are written.
+    :param cells: indices of the cells of the piece
+    :param geometry: optional result of mesh_arrays(mesh, cells), to be reused for several steps
+    :return: a small description of the piece (file name and arrays) to be passed to write_pvtu
+    """
+    if geometry is None:
+        geometry = mesh_arrays(mesh, cells)
+    point_arrays, cell_arrays = data_arrays(mesh, point_data, cell_data, indicators)
+    table = mesh.entity_table()
+    rows = cells if table.is_contiguous() else np.searchsorted(table.indices(), cells)
+    point_arrays = [(name, array[geometry["vertices"]]) for name, array in point_arrays]
+    cell_arrays = [(name, array[rows]) for name, array in cell_arrays]
+    write_vtu_arrays(filename, geometry, point_arrays, cell_arrays, compress, compression_level)
+    return dict(filename=filename, points=_VTK_DATA_TYPES[geometry["points"].dtype],
+                point_arrays=[_array_info(name, array) for name, array in point_arrays],
+                cell_arrays=[_array_info(name, array) for name, array in cell_arrays])
+
+
+def write_pvtu(filename, pieces):
+    """
+    Writes the index of a partitioned unstructured grid; it only refers to the piece files, which are read by
+    ParaView/VTK in parallel.
+    :param pieces: the descriptions returned by write_vtu_piece, one per piece
+    """
+    first = pieces[0]
+    for piece in pieces[1:]:
+        if piece["point_arrays"] != first["point_arrays"] or piece["cell_arrays"] != first["cell_arrays"]:
+            raise Exception("The pieces of '{0:s}' contain different arrays.".format(filename))
+    directory = os.path.dirname(os.path.abspath(filename))
+
+    def data_array(info):
+        return '<PDataArray type="{1:s}" Name="{0:s}" NumberOfComponents="{2:d}"/>\n'.format(*info)
+
+    xml = ['<?xml version="1.0"?>\n',
+           '<VTKFile type="PUnstructuredGrid" version="1.0" byte_order="LittleEndian" header_type="UInt64">\n',
+           '<PUnstructuredGrid GhostLevel="0">\n',
+           '<PPoints>\n', data_array(("Points", first["points"], 3)), '</PPoints>\n',
+           '<PPointData>\n'] + [data_array(info) for info in first["point_arrays"]] + \
+          ['</PPointData>\n', '<PCellData>\n'] + [data_array(info) for info in first["cell_arrays"]] + \
+          ['</PCellData>\n'] + \
+          ['<Piece Source="{0:s}"/>\n'.format(os.path.relpath(os.path.abspath(piece["filename"]), directory))
+           for piece in pieces] + \
+          ['</PUnstructuredGrid>\n', '</VTKFile>\n']
+    with open(filename, "w") as f:
+        f.write("".join(xml))
+
+
+def write_pvd(filename, datasets):
+    """
+    Writes a ParaView collection of time steps. The file is replaced atomically, so it can be rewritten after every
+    step while being read.
+    :param datasets: list of tuples (time, file name relative to the .pvd file)
+    """
+    lines = ['<?xml version="1.0"?>\n', '<VTKFile type="Collection" version="0.1">\n', '<Collection>\n']
+    lines += ['<DataSet timestep="{0!r}" part="0" file="{1:s}"/>\n'.format(float(t), name) for t, name in datasets]
+    lines += ['</Collection>\n', '</VTKFile>\n']
+    temporary = filename + ".tmp"
+    with open(temporary, "w") as f:
+        f.write("".join(lines))
+    os.replace(temporary, filename)
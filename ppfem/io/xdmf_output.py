@@ -0,0 +1,188 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import numpy as np
+from ppfem.io.vtk_output import data_arrays
+
+
+# XDMF topology types by (topological dimension, number of vertices) and their ids in mixed topologies
+_XDMF_TOPOLOGY_TYPES = {(2, 3): ("Triangle", 4), (2, 4): ("Quadrilateral", 5), (3, 4): ("Tetrahedron", 6),
+                        (3, 8): ("Hexahedron", 9)}
+_XDMF_POLYLINE = 2
+
+_XDMF_NUMBER_TYPES = {np.dtype("float64"): ("Float", 8), np.dtype("float32"): ("Float", 4),
+                      np.dtype("int64"): ("Int", 8), np.dtype("int32"): ("Int", 4), np.dtype("int8"): ("Char", 1),
+                      np.dtype("uint8"): ("UChar", 1), np.dtype("uint32"): ("UInt", 4)}
+
+# two-component vectors (e.g. of planar meshes) are padded with a zero component by the readers
+_XDMF_ATTRIBUTE_TYPES = {1: "Scalar", 2: "Vector", 3: "Vector", 6: "Tensor6", 9: "Tensor"}
+
+_FOOTER = '</Grid>\n</Domain>\n</Xdmf>\n'
+
+
+def _topology(mesh):
+    """
+    :return: tuple (attributes of the Topology element, flat int64 array); lines of higher order become polylines
+    through their nodes in geometric order (end point, interior nodes, end point)
+    """
+    table = mesh.entity_table()
+    tdim = mesh.topological_dim()
+    indices = table.indices()
+    connectivity = table.connectivity() if table.is_contiguous() else table.connectivity(indices)
+    n_vertices = table.number_of_vertices(indices)
+    if tdim == 1:
+        width = connectivity.shape[1]
+        order = np.r_[0, np.arange(2, width), 1]
+        if table.is_uniform():
+            connectivity = connectivity[:, order] if width > 2 else connectivity
+            return dict(TopologyType="Polyline", NodesPerElement=str(width), NumberOfElements=str(len(indices))), \
+                connectivity
+    elif table.is_uniform():
+        try:
+            name = _XDMF_TOPOLOGY_TYPES[(tdim, connectivity.shape[1])][0]
+        except KeyError:
+            raise NotImplementedError("No XDMF topology type for cells of dimension {0:d} with {1:d} vertices."
+                                      .format(tdim, connectivity.shape[1]))
+        return dict(TopologyType=name, NumberOfElements=str(len(indices))), connectivity
+
+    # mixed topology: per cell the type id, for polylines the number of nodes, then the nodes
+    header = 2 if tdim == 1 else 1
+    sizes = header + n_vertices
+    starts = np.cumsum(sizes) - sizes
+    flat = np.empty(int(sizes.sum()), dtype=np.int64)
+    for n in np.unique(n_vertices):
+        cells = np.flatnonzero(n_vertices == n)
+        nodes = connectivity[cells, :n]
+        if tdim == 1:
+            nodes = nodes[:, np.r_[0, np.arange(2, n), 1]]
+            block = np.column_stack([np.full(len(cells), _XDMF_POLYLINE), np.full(len(cells), n)])
+        else:
+            try:
+                block = np.full((len(cells), 1), _XDMF_TOPOLOGY_TYPES[(tdim, int(n))][1])
+            except KeyError:
+                raise NotImplementedError("No XDMF topology type for cells of dimension {0:d} with {1:d} vertices."
+                                          .format(tdim, int(n)))
+        block = np.column_stack([block, nodes])
+        flat[starts[cells][:, None] + np.arange(block.shape[1])] = block
+    return dict(TopologyType="Mixed", NumberOfElements=str(len(indices))), flat
+
+
+class XdmfWriter(object):
+    """
+    Writes a transient XDMF (version 3) file whose heavy data are raw little-endian arrays in one binary file next
+    to it (<name>.bin, XDMF Format="Binary" with Seek offsets), so no HDF5 is needed. Topology, geometry and
+    indicators are written once; every step appends only its data arrays, written from their buffers without
+    copying. The mesh is written again only after its geometry or topology changed (e.g. Mesh.move, refinement).
+    The XML file is extended in place (only its closing tags are rewritten), so writing a step costs the same no
+    matter how many steps there are, and the file is valid after every step.
+    """
+
+    def __init__(self, filename, mesh, indicators=False):
+        """
+        :param filename: the .xdmf file
+        :param indicators: also write domain indicators (cell data) and boundary indicators (vertex data)
+        """
+        self._mesh = mesh
+        self._indicators = indicators
+        base = os.path.splitext(filename)[0]
+        self._heavy_name = os.path.basename(base) + ".bin"
+        self._heavy = open(base + ".bin", "wb")
+        self._xml = open(filename, "w+b")
+        self._xml.write('<?xml version="1.0"?>\n<Xdmf Version="3.0">\n<Domain>\n'
+                        '<Grid Name="TimeSeries" GridType="Collection" CollectionType="Temporal">\n'.encode())
+        self._footer_position = self._xml.tell()
+        self._xml.write(_FOOTER.encode())
+        self._xml.flush()
+        self._mesh_key = None
+        self._mesh_xml = None
+        self._n_steps = 0
+
+    def _data_item(self, array):
+        """Appends array to the heavy data file. :return: the DataItem element referencing it"""
+        array = np.asarray(array)
+        try:
+            number_type, precision = _XDMF_NUMBER_TYPES[array.dtype]
+        except KeyError:
+            raise Exception("Arrays of type {0!s} cannot be written to XDMF.".format(array.dtype))
+        offset = self._heavy.tell()
+        if array.dtype.byteorder == ">":
+            array = array.astype(array.dtype.newbyteorder("<"))
+        self._heavy.write(memoryview(np.ascontiguousarray(array)).cast("B"))
+        return '<DataItem Format="Binary" NumberType="{0:s}" Precision="{1:d}" Endian="Little" Dimensions="{2:s}" ' \
+               'Seek="{3:d}">{4:s}</DataItem>\n'.format(number_type, precision, " ".join(str(n) for n in array.shape),
+                                                       offset, self._heavy_name)
+
+    def _attribute(self, name, center, array):
+        components = 1 if array.ndim == 1 else int(np.prod(array.shape[1:]))
+        attribute_type = _XDMF_ATTRIBUTE_TYPES.get(components, "Matrix")
+        return '<Attribute Name="{0:s}" AttributeType="{1:s}" Center="{2:s}">\n'.format(name, attribute_type, center) \
+            + self._data_item(array) + '</Attribute>\n'
+
+    def _write_mesh(self):
+        mesh = self._mesh
+        attributes, topology = _topology(mesh)
+        points = mesh.coordinates()
+        if points.shape[1] == 1:
+            points = np.column_stack([points, np.zeros(points.shape[0])])
+        attributes = " ".join('{0:s}="{1:s}"'.format(*item) for item in sorted(attributes.items()))
+        xml = ['<Topology {0:s}>\n'.format(attributes),
+               self._data_item(topology), '</Topology>\n',
+               '<Geometry GeometryType="{0:s}">\n'.format("XYZ" if points.shape[1] == 3 else "XY"),
+               self._data_item(points), '</Geometry>\n']
+        if self._indicators:
+            boundary_indicators = mesh.entity_table(0).boundary_indicators(writeable=False)
+            domain_indicators = mesh.entity_table().domain_indicators(writeable=False)
+            xml.append(self._attribute("boundary_indicator", "Node", boundary_indicators))
+            xml.append(self._attribute("domain_indicator", "Cell", domain_indicators))
+        self._mesh_xml = "".join(xml)
+
+    def write(self, time, point_data=None, cell_data=None):
+        """
+        Appends a time step; see ppfem.io.vtk_output.write_vtu for the arguments.
+        """
+        if self._xml is None:
+            raise Exception("XdmfWriter has been closed.")
+        key = (self._mesh.geometry_version(), self._mesh.topology_version())
+        if key != self._mesh_key:
+            self._write_mesh()
+            self._mesh_key = key
+        point_arrays, cell_arrays = data_arrays(self._mesh, point_data, cell_data)
+        xml = ['<Grid Name="step_{0:d}" GridType="Uniform">\n'.format(self._n_steps),
+               '<Time Value="{0!r}"/>\n'.format(float(time)), self._mesh_xml] + \
+              [self._attribute(name, "Node", array) for name, array in point_arrays] + \
+              [self._attribute(name, "Cell", array) for name, array in cell_arrays] + ['</Grid>\n']
+        # the heavy data has to be on disk before the XML refers to it
+        self._heavy.flush()
+        self._xml.seek(self._footer_position)
+        self._xml.write("".join(xml).encode())
+        self._footer_position = self._xml.tell()
+        self._xml.write(_FOOTER.encode())
+        self._xml.truncate()
+        self._xml.flush()
+        self._n_steps += 1
+
+    def close(self):
+        if self._xml is not None:
+            self._heavy.close()
+            self._xml.close()
+            self._xml = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
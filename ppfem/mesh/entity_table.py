@@ -0,0 +1,348 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+# value of the indicator arrays for entities without boundary indicator (None in the object API)
+NO_INDICATOR = -1
+
+
+class EntityTable(object):
+    """
+    Array storage for the mesh entities of one topological dimension.
+    Row i belongs to the entity with index i. The connectivity is an int array of shape (n, width) holding the
+    global vertex indices of each entity, padded with -1 if entities have different numbers of vertices (the
+    table of vertices has width 0). Domain and boundary indicators are int arrays.
+    The objects of the legacy API (Vertex, Line, Face, Cell) are created lazily by `entity_factory` when asked for
+    and are kept afterwards; they read and write their indicators from/to this table.
+    Arrays grow by doubling their capacity, thus adding single entities is amortized O(1).
+    """
+
+    def __init__(self, mesh, topological_dim, entity_factory):
+        self._mesh = mesh
+        self._topological_dim = topological_dim
+        self._entity_factory = entity_factory
+        self._size = 0
+        self._count = 0
+        self._n_vertices = np.zeros(0, dtype=np.int64)
+        self._connectivity = np.full((0, 0), -1, dtype=np.int64)
+        self._domain_indicators = np.zeros(0, dtype=np.int64)
+        self._boundary_indicators = np.full(0, NO_INDICATOR, dtype=np.int64)
+        self._used = np.zeros(0, dtype=bool)
+        self._objects = {}
+        # incidence index, built on the first query and kept current on insertion afterwards:
+        # sorted vertex tuple -> entity index and vertex index -> list of entity indices
+        self._key_index = None
+        self._vertex_index = None
+        # incremented on every change of the set of entities or their connectivity
+        self._version = 0
+
+    def _reserve(self, n_rows, width):
+        capacity = self._used.shape[0]
+        if n_rows > capacity:
+            capacity = max(2 * capacity, n_rows, 16)
+        width = max(width, self._connectivity.shape[1])
+        if capacity == self._used.shape[0] and width == self._connectivity.shape[1]:
+            return
+
+        connectivity = np.full((capacity, width), -1, dtype=np.int64)
+        connectivity[:self._size, :self._connectivity.shape[1]] = self._connectivity[:self._size]
+        self._connectivity = connectivity
+        self._n_vertices = _resized(self._n_vertices, capacity, 0)
+        self._domain_indicators = _resized(self._domain_indicators, capacity, 0)
+        self._boundary_indicators = _resized(self._boundary_indicators, capacity, NO_INDICATOR)
+        self._used = _resized(self._used, capacity, False)
+
+    def topological_dim(self):
+        return self._topological_dim
+
+    def version(self):
+        return self._version
+
+    def next_index(self):
+        return self._size
+
+    def add(self, index, vertices=()):
+        """
+        Adds a single entity.
+        :param vertices: global vertex indices (empty for vertices)
+        """
+        if index < self._size and self._used[index]:
+            raise Exception("There is already an entity with number {0:d} registered for topological dimension "
+                            "{1:d}!".format(index, self._topological_dim))
+        self._reserve(index + 1, len(vertices))
+        self._connectivity[index, :len(vertices)] = vertices
+        self._n_vertices[index] = len(vertices)
+        self._used[index] = True
+        self._size = max(self._size, index + 1)
+        self._count += 1
+        self._version += 1
+        self._index_rows([index])
+        return index
+
+    def add_rows(self, connectivity=None, n_rows=None, domain_indicators=None, boundary_indicators=None):
+        """
+        Appends entities in bulk; they get the indices next_index() ... next_index() + n_rows - 1.
+        :param connectivity: int array of shape (n_rows, n_vertices_per_entity), None for vertices
+        :return: the indices of the new entities
+        """
+        if connectivity is not None:
+            connectivity = np.asarray(connectivity, dtype=np.int64)
+            n_rows = connectivity.shape[0]
+            width = connectivity.shape[1]
+        else:
+            width = 0
+        start = self._size
+        stop = start + n_rows
+        self._reserve(stop, width)
+        if connectivity is not None:
+            self._connectivity[start:stop, :width] = connectivity
+        self._n_vertices[start:stop] = width
+        self._used[start:stop] = True
+        if domain_indicators is not None:
+            self._domain_indicators[start:stop] = domain_indicators
+        if boundary_indicators is not None:
+            self._boundary_indicators[start:stop] = boundary_indicators
+        self._size = stop
+        self._count += n_rows
+        self._version += 1
+        self._index_rows(range(start, stop))
+        return np.arange(start, stop)
+
+    def assign(self, connectivity=None, n_rows=None, domain_indicators=None, boundary_indicators=None):
+        """
+        Replaces the content of an empty table by the given arrays. Arrays of dtype int64 are adopted without
+        copying, so they may also be read-only (e.g. memory-mapped); the indicator arrays are copied on the first write
+        and adding entities allocates new arrays.
+        """
+        if self._size > 0:
+            raise Exception("Arrays can only be assigned to an empty entity table!")
+        if connectivity is not None:
+            connectivity = np.asarray(connectivity, dtype=np.int64)
+            n_rows = connectivity.shape[0]
+            self._connectivity = connectivity
+            self._n_vertices = np.full(n_rows, connectivity.shape[1], dtype=np.int64)
+        else:
+            self._connectivity = np.full((n_rows, 0), -1, dtype=np.int64)
+            self._n_vertices = np.zeros(n_rows, dtype=np.int64)
+        self._used = np.ones(n_rows, dtype=bool)
+        if domain_indicators is not None:
+            self._domain_indicators = np.asarray(domain_indicators, dtype=np.int64)
+        else:
+            self._domain_indicators = np.zeros(n_rows, dtype=np.int64)
+        if boundary_indicators is not None:
+            self._boundary_indicators = np.asarray(boundary_indicators, dtype=np.int64)
+        else:
+            self._boundary_indicators = np.full(n_rows, NO_INDICATOR, dtype=np.int64)
+        self._size = n_rows
+        self._count = n_rows
+        self._version += 1
+        self.clear_index()
+
+    def permute(self, order):
+        """
+        Renumbers the entities of a contiguous table such that entity order[i] gets the index i. Indicators move
+        along; the incidence index and the objects of the legacy API are dropped.
+        """
+        if not self.is_contiguous():
+            raise Exception("Only contiguous entity tables can be permuted!")
+        order = np.asarray(order, dtype=np.int64)
+        self._connectivity = self._connectivity[:self._size][order]
+        self._n_vertices = self._n_vertices[:self._size][order]
+        self._domain_indicators = self._domain_indicators[:self._size][order]
+        self._boundary_indicators = self._boundary_indicators[:self._size][order]
+        self._used = self._used[:self._size][order]
+        self._version += 1
+        self.clear_index()
+        self.clear_objects()
+
+    def renumber_vertices(self, new_vertex_indices):
+        """Replaces every vertex index v in the connectivity by new_vertex_indices[v]."""
+        connectivity = self._connectivity[:self._size]
+        self._connectivity = np.where(connectivity >= 0, new_vertex_indices[np.maximum(connectivity, 0)], -1)
+        self._version += 1
+        self.clear_index()
+        self.clear_objects()
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, index):
+        return 0 <= index < self._size and self._used[index]
+
+    def is_contiguous(self):
+        """True if the entities are numbered 0 ... len(self) - 1 without gaps."""
+        return self._count == self._size
+
+    def is_uniform(self):
+        """True if all entities have the same number of vertices."""
+        n_vertices = self._n_vertices[:self._size][self._used[:self._size]]
+        return n_vertices.size == 0 or bool(np.all(n_vertices == n_vertices[0]))
+
+    def indices(self):
+        """:return: the indices of all entities in ascending order"""
+        if self.is_contiguous():
+            return np.arange(self._size)
+        return np.flatnonzero(self._used[:self._size])
+
+    def connectivity(self, indices=None):
+        """
+        :param indices: optional, select rows; by default all rows up to the largest index are returned (rows of unused
+        indices are -1), which for contiguous tables are exactly the entities
+        :return: the connectivity array, a view if no indices are given
+        """
+        width = int(self._n_vertices[:self._size].max()) if self._size > 0 else 0
+        if indices is None:
+            return self._connectivity[:self._size, :width]
+        return self._connectivity[indices, :width]
+
+    def number_of_vertices(self, indices=None):
+        if indices is None:
+            return self._n_vertices[:self._size]
+        return self._n_vertices[indices]
+
+    def domain_indicators(self, writeable=True):
+        """
+        :param writeable: if True, an adopted read-only array (e.g. memory-mapped or shared) is copied first, so the
+        view may be modified; pass False to read the array without copying it
+        :return: a view to the array of domain indicators
+        """
+        if writeable and not self._domain_indicators.flags.writeable:
+            self._domain_indicators = np.array(self._domain_indicators)
+        return self._domain_indicators[:self._size]
+
+    def boundary_indicators(self, writeable=True):
+        """
+        :param writeable: see domain_indicators
+        :return: a view to the array of boundary indicators, NO_INDICATOR means none
+        """
+        if writeable and not self._boundary_indicators.flags.writeable:
+            self._boundary_indicators = np.array(self._boundary_indicators)
+        return self._boundary_indicators[:self._size]
+
+    def vertices(self, index):
+        return tuple(int(v) for v in self._connectivity[index, :self._n_vertices[index]])
+
+    def domain_indicator(self, index):
+        return int(self._domain_indicators[index])
+
+    def set_domain_indicator(self, index, value):
+        self.domain_indicators()[index] = value
+
+    def boundary_indicator(self, index):
+        value = self._boundary_indicators[index]
+        return None if value == NO_INDICATOR else int(value)
+
+    def set_boundary_indicator(self, index, value):
+        self.boundary_indicators()[index] = NO_INDICATOR if value is None else value
+
+    def _build_index(self):
+        indices = self.indices()
+        self._key_index = {}
+        self._vertex_index = {}
+        if self.is_uniform():
+            rows = self.connectivity(indices)
+            self._key_index = dict(zip(map(tuple, np.sort(rows, axis=1).tolist()), indices.tolist()))
+            # vertex -> entities via a stable sort of the flattened connectivity
+            vertices = rows.reshape(-1)
+            order = np.argsort(vertices, kind="stable")
+            entities = np.repeat(indices, rows.shape[1])[order].tolist()
+            split_vertices, starts = np.unique(vertices[order], return_index=True)
+            stops = np.append(starts[1:], len(order))
+            for v, start, stop in zip(split_vertices.tolist(), starts.tolist(), stops.tolist()):
+                self._vertex_index[v] = entities[start:stop]
+        else:
+            self._index_rows(indices)
+
+    def _index_rows(self, indices):
+        if self._key_index is None:
+            return
+        for index in indices:
+            vertices = self.vertices(index)
+            self._key_index[tuple(sorted(vertices))] = index
+            for v in vertices:
+                self._vertex_index.setdefault(v, []).append(index)
+
+    def clear_index(self):
+        """Drops the incidence index; it is rebuilt on the next query."""
+        self._key_index = None
+        self._vertex_index = None
+
+    def find(self, vertex_indices):
+        """
+        :param vertex_indices: global vertex indices in arbitrary order
+        :return: the index of the entity with exactly these vertices or None; O(1) after the first call
+        """
+        if self._key_index is None:
+            self._build_index()
+        return self._key_index.get(tuple(sorted(vertex_indices)))
+
+    def entities_of_vertex(self, vertex_index):
+        """
+        :return: list of the indices of all entities having the given vertex; O(1) after the first call
+        """
+        if self._key_index is None:
+            self._build_index()
+        return self._vertex_index.get(vertex_index, [])
+
+    def entity(self, index):
+        """:return: the (lazily created) object of the legacy API for the entity with the given index"""
+        entity = self._objects.get(index)
+        if entity is None:
+            if index not in self:
+                raise KeyError(index)
+            entity = self._entity_factory(self._mesh, int(index), self.vertices(index))
+            self._objects[index] = entity
+        return entity
+
+    def set_entity(self, index, entity):
+        """Registers an existing object (e.g. a Vertex added by the user) for the given index."""
+        self._objects[index] = entity
+
+    def entities(self, indices=None):
+        """:return: an iterable over the objects of the legacy API, see EntityIterable"""
+        return EntityIterable(self, indices)
+
+    def clear_objects(self):
+        """Drops all objects of the legacy API, e.g. after the arrays have been permuted."""
+        self._objects = {}
+
+
+class EntityIterable(object):
+    """
+    Iterable over (lazily created) entity objects of an EntityTable in index order.
+    Supports len() and repeated iteration like the dict views the mesh returned formerly.
+    """
+    def __init__(self, table, indices=None):
+        self._table = table
+        self._indices = indices
+
+    def __len__(self):
+        if self._indices is None:
+            return len(self._table)
+        return len(self._indices)
+
+    def __iter__(self):
+        indices = self._table.indices() if self._indices is None else self._indices
+        for index in indices:
+            yield self._table.entity(int(index))
+
+
+def _resized(array, capacity, fill_value):
+    resized = np.full(capacity, fill_value, dtype=array.dtype)
+    resized[:array.shape[0]] = array
+    return resized
@@ -0,0 +1,153 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+def graded_points(n, a, b, grading=None):
+    """
+    :param n: number of intervals
+    :param grading: None for equidistant points, a float r for interval lengths growing geometrically by the
+    factor r from a to b, or a callable mapping an array of parameters in [0, 1] monotonically onto [0, 1]
+    :return: array of n + 1 points from a to b
+    """
+    t = np.linspace(0.0, 1.0, n + 1)
+    if grading is None:
+        pass
+    elif callable(grading):
+        t = np.asarray(grading(t), dtype=float)
+    elif grading != 1.0:
+        t = (np.power(float(grading), np.arange(n + 1)) - 1) / (np.power(float(grading), n) - 1)
+    return a + (b - a) * t
+
+
+def interval(n, a=0.0, b=1.0, degree=1, grading=None):
+    """
+    Lines of the given degree subdividing [a, b]. Vertices are numbered from left to right; line k has the vertex
+    indices [k*degree, (k+1)*degree, k*degree+1, ..., k*degree+degree-1], i.e. the end points first as for
+    LagrangeLine, with the interior vertices placed equidistantly.
+    Boundary indicators: 0 for the vertex at a, 1 for the vertex at b.
+    :return: dict with entries "coordinates", "cells", "vertex_boundary_indicators"
+    """
+    ends = graded_points(n, a, b, grading)
+    s = np.arange(degree + 1) / degree
+    coordinates = (ends[:-1, np.newaxis] + (ends[1:] - ends[:-1])[:, np.newaxis] * s[np.newaxis, :-1]).reshape(-1)
+    coordinates = np.append(coordinates, ends[-1]).reshape(-1, 1)
+
+    first = degree * np.arange(n)[:, np.newaxis]
+    cells = np.hstack([first, first + degree, first + np.arange(1, degree)[np.newaxis, :]])
+
+    vertex_boundary_indicators = np.full(coordinates.shape[0], -1, dtype=np.int64)
+    vertex_boundary_indicators[0] = 0
+    vertex_boundary_indicators[-1] = 1
+    return {"coordinates": coordinates, "cells": cells, "vertex_boundary_indicators": vertex_boundary_indicators}
+
+
+def _split_quads(quads):
+    """Splits quads [v0, v1, v2, v3] (counterclockwise) into the triangles [v0, v1, v2] and [v0, v2, v3]."""
+    return np.stack([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]], axis=1).reshape(-1, 3)
+
+
+def rectangle(nx, ny, p0=(0.0, 0.0), p1=(1.0, 1.0), cell_type="quad", grading=None):
+    """
+    Structured mesh of the rectangle [p0[0], p1[0]] x [p0[1], p1[1]].
+    Vertex (i, j) has the index j*(nx+1) + i. Quads are ordered counterclockwise starting at the lower left vertex;
+    with cell_type "triangle" each quad is split along its diagonal from the lower left to the upper right vertex.
+    Boundary indicators (boundary lines and vertices; corner vertices get the smaller one):
+    0 for x = p0[0], 1 for x = p1[0], 2 for y = p0[1], 3 for y = p1[1].
+    :param grading: None, or one grading (see graded_points) for all directions or a tuple of one per direction
+    :return: dict with entries "coordinates", "cells", "vertex_boundary_indicators", "facets",
+    "facet_boundary_indicators"
+    """
+    gradings = grading if isinstance(grading, (tuple, list)) else (grading, grading)
+    x = graded_points(nx, p0[0], p1[0], gradings[0])
+    y = graded_points(ny, p0[1], p1[1], gradings[1])
+    coordinates = np.stack(np.meshgrid(x, y, indexing="xy"), axis=-1).reshape(-1, 2)
+    index = np.arange((nx + 1) * (ny + 1)).reshape(ny + 1, nx + 1)
+
+    quads = np.stack([index[:-1, :-1], index[:-1, 1:], index[1:, 1:], index[1:, :-1]], axis=-1).reshape(-1, 4)
+    if cell_type == "quad":
+        cells = quads
+    elif cell_type == "triangle":
+        cells = _split_quads(quads)
+    else:
+        raise NotImplementedError("Unknown cell type \"{0:s}\" for rectangles.".format(cell_type))
+
+    # boundary lines, oriented in positive axis direction
+    sides = [(np.stack([index[:-1, 0], index[1:, 0]], axis=-1), 0),
+             (np.stack([index[:-1, -1], index[1:, -1]], axis=-1), 1),
+             (np.stack([index[0, :-1], index[0, 1:]], axis=-1), 2),
+             (np.stack([index[-1, :-1], index[-1, 1:]], axis=-1), 3)]
+    return _with_boundary(coordinates, cells, sides)
+
+
+def box(nx, ny, nz, p0=(0.0, 0.0, 0.0), p1=(1.0, 1.0, 1.0), cell_type="hexahedron", grading=None):
+    """
+    Structured mesh of the box [p0[0], p1[0]] x [p0[1], p1[1]] x [p0[2], p1[2]].
+    Vertex (i, j, k) has the index (k*(ny+1) + j)*(nx+1) + i. Hexahedra are ordered as the bottom quad
+    (counterclockwise) followed by the top quad. With cell_type "tetrahedron" each hexahedron is split into six
+    tetrahedra along its diagonal from the vertex (0, 0, 0) to (1, 1, 1) (Kuhn subdivision), which yields a
+    conforming mesh of positively oriented tetrahedra.
+    Boundary indicators (boundary faces and vertices; vertices on edges get the smallest one):
+    0 for x = p0[0], 1 for x = p1[0], 2 for y = p0[1], 3 for y = p1[1], 4 for z = p0[2], 5 for z = p1[2].
+    :param grading: None, or one grading (see graded_points) for all directions or a tuple of one per direction
+    :return: see rectangle()
+    """
+    gradings = grading if isinstance(grading, (tuple, list)) else (grading, grading, grading)
+    x = graded_points(nx, p0[0], p1[0], gradings[0])
+    y = graded_points(ny, p0[1], p1[1], gradings[1])
+    z = graded_points(nz, p0[2], p1[2], gradings[2])
+    coordinates = np.stack(np.meshgrid(x, y, z, indexing="ij"), axis=-1).transpose(2, 1, 0, 3).reshape(-1, 3)
+    index = np.arange((nx + 1) * (ny + 1) * (nz + 1)).reshape(nz + 1, ny + 1, nx + 1)
+
+    def corner(di, dj, dk):
+        return index[dk:nz + dk, dj:ny + dj, di:nx + di].reshape(-1)
+
+    hexes = np.stack([corner(0, 0, 0), corner(1, 0, 0), corner(1, 1, 0), corner(0, 1, 0),
+                      corner(0, 0, 1), corner(1, 0, 1), corner(1, 1, 1), corner(0, 1, 1)], axis=-1)
+    if cell_type == "hexahedron":
+        cells = hexes
+    elif cell_type == "tetrahedron":
+        # paths from local vertex 0 to 6 along the edges, one per permutation of the axes; for odd permutations
+        # the last two vertices are swapped to keep all tetrahedra positively oriented
+        paths = [[0, 1, 2, 6], [0, 1, 6, 5], [0, 3, 6, 2], [0, 3, 7, 6], [0, 4, 5, 6], [0, 4, 6, 7]]
+        cells = hexes[:, paths].reshape(-1, 4)
+    else:
+        raise NotImplementedError("Unknown cell type \"{0:s}\" for boxes.".format(cell_type))
+
+    def side(quad_index):
+        # quad_index: 2d array of vertex indices on one side with increasing local axes
+        quads = np.stack([quad_index[:-1, :-1], quad_index[:-1, 1:], quad_index[1:, 1:], quad_index[1:, :-1]],
+                         axis=-1).reshape(-1, 4)
+        return quads if cell_type == "hexahedron" else _split_quads(quads)
+
+    sides = [(side(index[:, :, 0]), 0), (side(index[:, :, -1]), 1),
+             (side(index[:, 0, :]), 2), (side(index[:, -1, :]), 3),
+             (side(index[0, :, :]), 4), (side(index[-1, :, :]), 5)]
+    return _with_boundary(coordinates, cells, sides)
+
+
+def _with_boundary(coordinates, cells, sides):
+    vertex_boundary_indicators = np.full(coordinates.shape[0], -1, dtype=np.int64)
+    # reversed, so that the smallest indicator wins for vertices on several sides
+    for facets, indicator in reversed(sides):
+        vertex_boundary_indicators[facets.reshape(-1)] = indicator
+    return {"coordinates": coordinates,
+            "cells": cells,
+            "vertex_boundary_indicators": vertex_boundary_indicators,
+            "facets": np.concatenate([facets for facets, indicator in sides]),
+            "facet_boundary_indicators": np.concatenate([np.full(facets.shape[0], indicator, dtype=np.int64)
+                                                         for facets, indicator in sides])}
@@ -14,9 +14,20 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+
+import weakref
+import numpy as np
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from ppfem.geometry.vertex import Vertex
 from ppfem.geometry.line import Line
 from ppfem.geometry.face import Face
 from ppfem.geometry.cell import Cell
+from ppfem.mesh.entity_table import EntityTable, NO_INDICATOR
+from ppfem.mesh import generators
+from ppfem.mesh import topology
+from ppfem.mesh import refinement
+from ppfem.mesh import partitioning
+from ppfem.mesh.ordering import space_filling_curve_keys
 
 
 class FilterIndices(object):
@@ -32,38 +43,414 @@ class FilterEntitiesOnVertexIndices(object):
         self.vertex_indices = frozenset(vertex_indices)
 
     def __call__(self, e):
-        self.vertex_indices == frozenset(e.global_vertex_indices())
+        return self.vertex_indices == frozenset(e.global_vertex_indices())
+
+
+def _create_vertex(mesh, index, vertices):
+    return Vertex.view(mesh, index)
+
+
+def _create_line(mesh, index, vertices):
+    return Line(vertices, index, mesh)
+
+
+def _create_face(mesh, index, vertices):
+    return Face(vertices, index, mesh)
+
+
+def _create_cell(mesh, index, vertices):
+    return Cell(vertices, index, mesh)
 
 
 class Mesh(object):
+    """
+    The topology is stored in one EntityTable per topological dimension (connectivity and indicators as int arrays),
+    the vertex coordinates in one float array. Objects of type Vertex, Line, Face and Cell are only created when
+    they are asked for (e.g. by iterating over cells()). Large meshes should be built in bulk via from_arrays().
+    """
 
     def __init__(self, space_dim, topological_dim=None):
-        self._cell_dict = {}
-        self._face_dict = {}
-        self._line_dict = {}
-        self._vertex_dict = {}
         self._space_dim = space_dim
+        self._tables = [EntityTable(self, 0, _create_vertex),
+                        EntityTable(self, 1, _create_line),
+                        EntityTable(self, 2, _create_face),
+                        EntityTable(self, 3, _create_cell)]
+        # vertex coordinates, row i belongs to the vertex with global index i; grown by doubling its capacity
+        self._coordinates = np.full((0, space_dim), np.nan)
+        self._n_coordinate_rows = 0
+        self._geometry_version = 0
+        self._topology_version = 0
+        # (topological_dim, sub_dim) -> ((version of the entity table, geometry version or None), sub-entity indices,
+        # orientations)
+        self._sub_entity_maps = {}
+        # set by refine(): (coarse mesh, parent cell per cell, vertex prolongation matrix)
+        self._parent = None
+        # meshes refined from this one, whose parent data has to follow a reorder()
+        self._children = weakref.WeakSet()
+        # objects with a method mesh_reordered(mesh, topology_version, cell_order, vertex_order), e.g. function spaces
+        self._reorder_listeners = weakref.WeakSet()
         if topological_dim is None:
             self._topological_dim = space_dim
         else:
             self._topological_dim = topological_dim
 
-    def get_mesh_entities(self, topological_dim=None, indices=None, filter_func=None):
-        _iters = []
+    @classmethod
+    def from_arrays(cls, coordinates, cells, topological_dim=None, cell_domain_indicators=None,
+                    vertex_domain_indicators=None, vertex_boundary_indicators=None, facets=None,
+                    facet_boundary_indicators=None):
+        """
+        Builds a mesh in bulk without creating any objects per entity.
+        :param coordinates: float array of shape (n_vertices, space_dim); row i holds the coordinates of vertex i
+        :param cells: int array of shape (n_cells, n_vertices_per_cell) of global vertex indices (cell i is row i)
+        :param topological_dim: topological dimension of the cells; defaults to space_dim
+        :param cell_domain_indicators: optional int array of shape (n_cells,)
+        :param vertex_domain_indicators: optional int array of shape (n_vertices,)
+        :param vertex_boundary_indicators: optional int array of shape (n_vertices,), -1 means no indicator
+        :param facets: optional int array of shape (n_facets, n_vertices_per_facet), entities of dimension
+        topological_dim - 1 (e.g. boundary facets) for topological_dim > 1
+        :param facet_boundary_indicators: optional int array of shape (n_facets,)
+        Arrays that already have the right dtype (float64 / int64) and are contiguous are used without copying.
+        """
+        coordinates = np.ascontiguousarray(coordinates, dtype=float)
+        if coordinates.ndim == 1:
+            coordinates = coordinates.reshape(-1, 1)
+        mesh = cls(coordinates.shape[1], topological_dim=topological_dim)
+        mesh._coordinates = coordinates
+        mesh._n_coordinate_rows = coordinates.shape[0]
+        mesh._tables[0].assign(n_rows=coordinates.shape[0], domain_indicators=vertex_domain_indicators,
+                               boundary_indicators=vertex_boundary_indicators)
+        mesh._tables[mesh.topological_dim()].assign(connectivity=cells, domain_indicators=cell_domain_indicators)
+        if facets is not None:
+            if mesh.topological_dim() < 2:
+                raise Exception("Facets of one-dimensional meshes are vertices; use vertex_boundary_indicators.")
+            mesh._tables[mesh.topological_dim() - 1].assign(connectivity=facets,
+                                                            boundary_indicators=facet_boundary_indicators)
+        mesh.geometry_changed()
+        return mesh
+
+    def array_dict(self):
+        """
+        All arrays of the mesh as a flat dict (views, no copies): "coordinates" and, per topological dimension d
+        with entities, "connectivity_d" (not for vertices), "domain_indicators_d" and "boundary_indicators_d".
+        See from_array_dict for the inverse.
+        """
+        arrays = dict(coordinates=self.coordinates())
+        for dim in range(self.topological_dim() + 1):
+            table = self.entity_table(dim)
+            if len(table) == 0:
+                continue
+            if not (table.is_contiguous() and table.is_uniform()):
+                raise NotImplementedError("Only contiguously numbered entities with equal numbers of vertices can be "
+                                          "exported as arrays.")
+            if dim > 0:
+                arrays["connectivity_{0:d}".format(dim)] = table.connectivity()
+            arrays["domain_indicators_{0:d}".format(dim)] = table.domain_indicators(writeable=False)
+            arrays["boundary_indicators_{0:d}".format(dim)] = table.boundary_indicators(writeable=False)
+        return arrays
+
+    @classmethod
+    def from_array_dict(cls, arrays, topological_dim):
+        """
+        Rebuilds a mesh from the arrays of array_dict() without copying them, so they may be memory-mapped or live in
+        shared memory (read-only arrays are copied on the first modification that needs it).
+        """
+        mesh = cls.from_arrays(arrays["coordinates"], arrays["connectivity_{0:d}".format(topological_dim)],
+                               topological_dim=topological_dim,
+                               cell_domain_indicators=arrays.get("domain_indicators_{0:d}".format(topological_dim)),
+                               vertex_domain_indicators=arrays.get("domain_indicators_0"),
+                               vertex_boundary_indicators=arrays.get("boundary_indicators_0"))
+        for dim in range(1, topological_dim):
+            connectivity = arrays.get("connectivity_{0:d}".format(dim))
+            if connectivity is not None:
+                mesh.entity_table(dim).assign(connectivity=connectivity,
+                                              domain_indicators=arrays.get("domain_indicators_{0:d}".format(dim)),
+                                              boundary_indicators=arrays.get("boundary_indicators_{0:d}".format(dim)))
+        return mesh
+
+    @classmethod
+    def interval(cls, n, a=0.0, b=1.0, degree=1, grading=None):
+        """
+        Mesh of n lines of the given degree subdividing [a, b]; see ppfem.mesh.generators.interval for the
+        numbering. The vertex at a gets the boundary indicator 0, the one at b the indicator 1.
+        :param grading: None (uniform), a float ratio of consecutive line lengths or a callable mapping [0, 1] onto
+        itself, see ppfem.mesh.generators.graded_points
+        """
+        return cls.from_arrays(**generators.interval(n, a=a, b=b, degree=degree, grading=grading))
+
+    @classmethod
+    def rectangle(cls, nx, ny, p0=(0.0, 0.0), p1=(1.0, 1.0), cell_type="quad", grading=None):
+        """
+        Structured mesh of quads (cell_type "quad") or triangles ("triangle") of the rectangle spanned by p0 and p1
+        including its boundary lines; see ppfem.mesh.generators.rectangle for numbering and boundary indicators.
+        """
+        return cls.from_arrays(**generators.rectangle(nx, ny, p0=p0, p1=p1, cell_type=cell_type, grading=grading))
+
+    @classmethod
+    def box(cls, nx, ny, nz, p0=(0.0, 0.0, 0.0), p1=(1.0, 1.0, 1.0), cell_type="hexahedron", grading=None):
+        """
+        Structured mesh of hexahedra (cell_type "hexahedron") or tetrahedra ("tetrahedron") of the box spanned by
+        p0 and p1 including its boundary faces; see ppfem.mesh.generators.box for numbering and boundary indicators.
+        """
+        return cls.from_arrays(**generators.box(nx, ny, nz, p0=p0, p1=p1, cell_type=cell_type, grading=grading))
+
+    def refine(self, marked_cells=None):
+        """
+        Creates a refined mesh; see ppfem.mesh.refinement for the supported cells. Lines of any degree are bisected,
+        triangles and quads are split into four (marked triangles are refined conformingly by red-green closure).
+        Coarse vertices keep their indices (unless the fine mesh is reordered). Cells inherit the domain indicator of
+        their parent, new vertices the indicators of the coarse entity (line, face) they were created on, and
+        boundary facets are split along with their edge.
+        :param marked_cells: None (uniform refinement), a boolean mask or an array of cell indices
+        :return: the fine mesh, see parent(), parent_cells() and vertex_prolongation()
+        """
+        tdim = self.topological_dim()
+        cell_table = self.entity_table(tdim)
+        if not (cell_table.is_contiguous() and self._tables[0].is_contiguous()):
+            raise Exception("Only meshes with contiguously numbered vertices and cells can be refined.")
+        n_vertices = self.coordinates().shape[0]
+        cells = cell_table.connectivity()
+        facet_data = None
+        if tdim == 1:
+            result = refinement.refine_lines(n_vertices, cells, marked_cells)
+        elif tdim == 2 and cell_table.is_uniform() and cells.shape[1] in (3, 4):
+            edges = self.sub_entities(2, 1)[0]
+            edge_table = self._tables[1]
+            boundary = np.flatnonzero(edge_table.boundary_indicators() != NO_INDICATOR)
+            result = refinement.refine_faces(n_vertices, cells, edges, edge_table.connectivity()[:, :2],
+                                             marked_cells, facets=boundary)
+            facet_parents, facets = result.facets
+            facet_data = dict(facets=facets, facet_boundary_indicators=edge_table.boundary_indicators()[facet_parents])
+        else:
+            raise NotImplementedError("Refinement is implemented for lines, triangles and quads only.")
+
+        vertex_domain = np.empty(result.prolongation.shape[0], dtype=np.int64)
+        vertex_boundary = np.empty(result.prolongation.shape[0], dtype=np.int64)
+        vertex_domain[:n_vertices] = self._tables[0].domain_indicators()
+        vertex_boundary[:n_vertices] = self._tables[0].boundary_indicators()
+        parent_dims = result.vertex_parent_dims[n_vertices:]
+        parent_indices = result.vertex_parent_indices[n_vertices:]
+        for dim in np.unique(parent_dims):
+            selected = parent_dims == dim
+            vertex_domain[n_vertices:][selected] = self._tables[dim].domain_indicators()[parent_indices[selected]]
+            vertex_boundary[n_vertices:][selected] = self._tables[dim].boundary_indicators()[parent_indices[selected]]
+
+        fine = Mesh.from_arrays(result.prolongation.dot(self.coordinates()), result.cells, topological_dim=tdim,
+                                cell_domain_indicators=cell_table.domain_indicators()[result.parent_cells],
+                                vertex_domain_indicators=vertex_domain, vertex_boundary_indicators=vertex_boundary,
+                                **(facet_data or {}))
+        fine._parent = (self, result.parent_cells, result.prolongation)
+        self._children.add(fine)
+        return fine
+
+    def parent(self):
+        """:return: the mesh this one was refined from or None"""
+        return None if self._parent is None else self._parent[0]
+
+    def parent_cells(self):
+        """:return: int array with the index of the parent cell (in parent()) of each cell"""
+        return None if self._parent is None else self._parent[1]
+
+    def child_cells(self, parent_cell):
+        """:return: int array of the cells refining the given cell of parent()"""
+        return np.flatnonzero(self.parent_cells() == parent_cell)
+
+    def vertex_prolongation(self):
+        """
+        :return: sparse matrix of shape (n_vertices, n_vertices of parent()) interpolating vertex values of the parent
+        mesh at the vertices of this mesh, or None
+        """
+        return None if self._parent is None else self._parent[2]
+
+    def reorder(self, strategy="hilbert"):
+        """
+        Renumbers cells and vertices in place to improve memory locality. Cells are sorted along a space-filling curve
+        through their centroids ("hilbert", "morton") or by reverse Cuthill-McKee on the cell adjacency graph ("rcm").
+        Vertices are then numbered in the order of their first appearance in the cells. Indicators move along with
+        their entities. Entities of other dimensions keep their indices but refer to the new vertex numbers.
+        Entity objects obtained before are invalid afterwards. Function spaces on this mesh renumber their dofs to
+        follow the new cell order and permute the dof vectors of their functions (see add_reorder_listener). The
+        parent data of meshes refined from this one is updated to the new numbering.
+        :return: tuple (cell_order, vertex_order) of the old indices of cells and vertices in their new order
+        """
+        cell_table = self.entity_table()
+        vertex_table = self._tables[0]
+        if not (cell_table.is_contiguous() and vertex_table.is_contiguous()):
+            raise Exception("Only meshes with contiguously numbered vertices and cells can be reordered.")
+        if strategy in ("hilbert", "morton"):
+            cell_order = np.argsort(space_filling_curve_keys(partitioning.cell_centroids(self), strategy),
+                                    kind="stable")
+        elif strategy == "rcm":
+            cell_order = reverse_cuthill_mckee(partitioning.cell_adjacency(self), symmetric_mode=True)
+            cell_order = np.asarray(cell_order, dtype=np.int64)
+        else:
+            raise Exception("Unknown reordering strategy '{0:s}'.".format(strategy))
+        cell_table.permute(cell_order)
+
+        n_vertices = self.coordinates().shape[0]
+        cell_vertices = cell_table.connectivity().reshape(-1)
+        cell_vertices = cell_vertices[cell_vertices >= 0]
+        seen, first = np.unique(cell_vertices, return_index=True)
+        isolated = np.setdiff1d(np.arange(n_vertices), seen)
+        vertex_order = np.concatenate([seen[np.argsort(first)], isolated])
+        new_vertex_indices = np.empty(n_vertices, dtype=np.int64)
+        new_vertex_indices[vertex_order] = np.arange(n_vertices)
+
+        self._coordinates = self.coordinates()[vertex_order]
+        vertex_table.permute(vertex_order)
+        for table in self._tables[1:]:
+            if len(table) > 0:
+                table.renumber_vertices(new_vertex_indices)
+        self._sub_entity_maps = {}
+        if self._parent is not None:
+            self._parent = (self._parent[0], self._parent[1][cell_order], self._parent[2][vertex_order])
+        new_cell_indices = np.empty(len(cell_order), dtype=np.int64)
+        new_cell_indices[cell_order] = np.arange(len(cell_order))
+        for child in self._children:
+            child._parent = (self, new_cell_indices[child._parent[1]], child._parent[2][:, vertex_order])
+        self._topology_version += 1
+        self.geometry_changed()
+        for listener in list(self._reorder_listeners):
+            listener.mesh_reordered(self, self._topology_version - 1, cell_order, vertex_order)
+        return cell_order, vertex_order
+
+    def add_reorder_listener(self, listener):
+        """
+        Registers an object holding data indexed by entity numbers. After every reorder(), its method
+        mesh_reordered(mesh, topology_version, cell_order, vertex_order) is called with this mesh, the topology version
+        before the reorder and the permutations returned by it. The mesh only keeps a weak reference.
+        """
+        self._reorder_listeners.add(listener)
+
+    def entity_table(self, topological_dim=None):
+        """
+        :return: the EntityTable holding connectivity and indicator arrays of the given dimension (default: cells)
+        """
         if topological_dim is None:
             topological_dim = self.topological_dim()
-        if topological_dim == 0:
-            _iter = self.vertices()
-        elif topological_dim == 1:
-            _iter = self.lines()
-        elif topological_dim == 2:
-            _iter = self.faces()
-        elif topological_dim == 3:
-            _iter = self.cells()
-        else:
+        if not 0 <= topological_dim <= 3:
             raise NotImplementedError("Topological dimension of mesh entities must be 0, 1, 2 or 3.")
+        return self._tables[topological_dim]
 
-        _iters.append(_iter)
+    def connectivity(self, topological_dim=None):
+        """
+        :return: int array of shape (n_entities, n_vertices_per_entity) of the given dimension (default: cells)
+        """
+        return self.entity_table(topological_dim).connectivity()
+
+    def sub_entities(self, topological_dim=None, sub_dim=None):
+        """
+        Sub-entities of all entities of the given dimension (default: cells, and facets as sub-entities), generated
+        on the first request in one vectorized pass over the connectivity (see ppfem.mesh.topology). Missing
+        sub-entities are added to the mesh. The result is kept until the entities of topological_dim change (or, for
+        the end points of lines in 1d, the geometry).
+        :return: tuple (sub_entity_indices, orientations) of int arrays of shape (n_entities, n_sub_entities),
+        orientations being +1 / -1 relative to the local vertex order of the entity
+        """
+        if topological_dim is None:
+            topological_dim = self.topological_dim()
+        if sub_dim is None:
+            sub_dim = topological_dim - 1
+        table = self.entity_table(topological_dim)
+        # the orientations of the end points of lines in 1d depend on the vertex coordinates
+        key = (table.version(), self._geometry_version if topological_dim == 1 and sub_dim == 0 else None)
+        cached = self._sub_entity_maps.get((topological_dim, sub_dim))
+        if cached is None or cached[0] != key:
+            indices, orientations = topology.generate_sub_entities(table, self.entity_table(sub_dim), sub_dim,
+                                                                   self.coordinates())
+            cached = (key, indices, orientations)
+            self._sub_entity_maps[(topological_dim, sub_dim)] = cached
+        return cached[1], cached[2]
+
+    def boundary_facets(self):
+        """
+        Finds the facets belonging to exactly one cell by counting the entries of the facet array of the cells
+        (see sub_entities); facets of one-dimensional meshes are the end points of the lines (vertices).
+        :return: sorted int array of facet indices
+        """
+        table = self.entity_table()
+        if self.topological_dim() == 1:
+            facets = table.connectivity(table.indices())[:, :2]
+        else:
+            facets = self.sub_entities()[0][table.indices()]
+        counts = np.bincount(facets[facets >= 0])
+        return np.flatnonzero(counts == 1)
+
+    def facet_centroids(self, facets):
+        """
+        :param facets: int array of facet indices
+        :return: array of shape (len(facets), space_dim), the mean of the vertices of each facet
+        """
+        facets = np.asarray(facets, dtype=np.int64)
+        if self.topological_dim() == 1:
+            return self.coordinates()[facets]
+        connectivity = self.entity_table(self.topological_dim() - 1).connectivity(facets)
+        valid = connectivity >= 0
+        coords = self.coordinates()[np.where(valid, connectivity, 0)] * valid[:, :, np.newaxis]
+        return coords.sum(axis=1) / valid.sum(axis=1)[:, np.newaxis]
+
+    def mark_boundary(self, predicates, default=None, facets=None):
+        """
+        Assigns boundary indicators to facets in bulk. The predicates are evaluated once on the array of all facet
+        centroids. The vertices of the marked facets get the smallest indicator among their facets (for
+        one-dimensional meshes the facets are vertices).
+        :param predicates: list of (indicator, predicate) pairs or a dict; predicate(centroids) gets an array of
+        shape (n_facets, space_dim) and returns a boolean array of shape (n_facets,); the first matching pair wins
+        :param default: indicator for the facets matched by no predicate (None: keep their indicators)
+        :param facets: the facets to consider; default: boundary_facets()
+        :return: the indices of the considered facets
+        """
+        if facets is None:
+            facets = self.boundary_facets()
+        facets = np.asarray(facets, dtype=np.int64)
+        if isinstance(predicates, dict):
+            predicates = sorted(predicates.items())
+        centroids = self.facet_centroids(facets)
+        indicators = np.full(len(facets), NO_INDICATOR, dtype=np.int64)
+        for indicator, predicate in predicates:
+            matched = (indicators == NO_INDICATOR) & np.asarray(predicate(centroids), dtype=bool)
+            indicators[matched] = indicator
+        unmatched = indicators == NO_INDICATOR
+        if default is not None:
+            indicators[unmatched] = default
+            unmatched[:] = False
+
+        facet_dim = self.topological_dim() - 1
+        self.entity_table(facet_dim).boundary_indicators()[facets[~unmatched]] = indicators[~unmatched]
+        if facet_dim > 0:
+            marked = facets[~unmatched]
+            connectivity = self.entity_table(facet_dim).connectivity(marked)
+            vertex_indicators = np.full(self.coordinates().shape[0], np.iinfo(np.int64).max, dtype=np.int64)
+            valid = connectivity >= 0
+            np.minimum.at(vertex_indicators, connectivity[valid],
+                          np.broadcast_to(indicators[~unmatched][:, np.newaxis], connectivity.shape)[valid])
+            touched = vertex_indicators != np.iinfo(np.int64).max
+            self._tables[0].boundary_indicators()[touched] = vertex_indicators[touched]
+        return facets
+
+    def boundary_entities(self, indicator=None, topological_dim=None):
+        """
+        Groups the entities of the given dimension (default: facets) by their boundary indicator in one pass.
+        :return: the sorted indices of the entities with the given indicator, or, if indicator is None, a dict
+        mapping each boundary indicator to these index arrays
+        """
+        if topological_dim is None:
+            topological_dim = self.topological_dim() - 1
+        indicators = self.entity_table(topological_dim).boundary_indicators()
+        if indicator is not None:
+            return np.flatnonzero(indicators == indicator)
+        indices = np.flatnonzero(indicators != NO_INDICATOR)
+        order = np.argsort(indicators[indices], kind="stable")
+        values, starts = np.unique(indicators[indices][order], return_index=True)
+        return dict(zip(values.tolist(), np.split(indices[order], starts[1:])))
+
+    def number_of_entities(self, topological_dim=None):
+        return len(self.entity_table(topological_dim))
+
+    def get_mesh_entities(self, topological_dim=None, indices=None, filter_func=None):
+        _iters = []
+        if topological_dim is None:
+            topological_dim = self.topological_dim()
+        _iters.append(self.entity_table(topological_dim).entities())
 
         if filter_func is not None:
             _iters.append(filter(filter_func, _iters[-1]))
@@ -72,82 +459,158 @@ class Mesh(object):
         return _iters[-1]
 
     def add_vertex(self, vertex):
+        table = self._tables[0]
+        # validated before the table is touched, so that a failure leaves no vertex without coordinates
+        self._check_coordinates(vertex.coords())
         if vertex.index is None:
-            if len(self._vertex_dict) == 0:
-                vertex.index = 0
-            else:
-                vertex.index = max(self._vertex_dict.keys()) + 1
-        Mesh._add_entity(vertex, vertex.global_index(), self._vertex_dict, "vertex dict")
+            vertex.index = table.next_index()
+        table.add(vertex.global_index())
+        table.set_domain_indicator(vertex.index, vertex.domain_indicator)
+        table.set_boundary_indicator(vertex.index, vertex.boundary_indicator)
+        self._store_coordinates(vertex.global_index(), vertex.coords())
+        vertex.attach_to_mesh(self)
+        table.set_entity(vertex.index, vertex)
+        self.geometry_changed()
         return vertex
 
-    def add_line(self, vertex_numbers, number=None):
+    def _check_coordinates(self, coords):
+        if len(coords) != self._space_dim:
+            raise Exception("Vertex has {0:d} coordinates, but the mesh has space dimension {1:d}!"
+                            .format(len(coords), self._space_dim))
+
+    def _store_coordinates(self, row, coords):
+        self._check_coordinates(coords)
+        if row >= self._coordinates.shape[0]:
+            capacity = max(2 * self._coordinates.shape[0], row + 1, 16)
+            coordinates = np.full((capacity, self._space_dim), np.nan)
+            coordinates[:self._n_coordinate_rows] = self._coordinates[:self._n_coordinate_rows]
+            self._coordinates = coordinates
+        self._coordinates[row] = coords
+        self._n_coordinate_rows = max(self._n_coordinate_rows, row + 1)
+
+    def add_entity(self, topological_dim, vertex_numbers, number=None):
+        table = self.entity_table(topological_dim)
         if number is None:
-            if len(self._line_dict) == 0:
-                number = 0
-            else:
-                number = max(self._line_dict.keys()) + 1
-        Mesh._add_entity(Line(vertex_numbers, number, self), number, self._line_dict, "edge dict")
-        return self._line_dict[number]
+            number = table.next_index()
+        table.add(number, vertex_numbers)
+        self.geometry_changed()
+        return table.entity(number)
+
+    def add_line(self, vertex_numbers, number=None):
+        return self.add_entity(1, vertex_numbers, number)
 
     def add_face(self, vertex_numbers, number=None):
-        if number is None:
-            if len(self._line_dict) == 0:
-                number = 0
-            else:
-                number = max(self._face_dict.keys()) + 1
-        Mesh._add_entity(Face(vertex_numbers, number, self), number, self._face_dict, "face dict")
-        return self._face_dict[number]
+        return self.add_entity(2, vertex_numbers, number)
 
     def add_cell(self, vertex_numbers, number=None):
-        if number is None:
-            if len(self._line_dict) == 0:
-                number = 0
-            else:
-                number = max(self._line_dict.keys()) + 1
-        Mesh._add_entity(Cell(vertex_numbers, number, self), number, self._cell_dict, "cell dict")
-        return self._cell_dict[number]
+        return self.add_entity(3, vertex_numbers, number)
 
     def find_entities_with_vertices(self, vertex_indices, topological_dim):
-        if topological_dim == 1:
-            return filter(FilterEntitiesOnVertexIndices(vertex_indices), self.lines())
-        elif topological_dim == 2:
-            return filter(FilterEntitiesOnVertexIndices(vertex_indices), self.faces())
-        elif topological_dim == 3:
-            return filter(FilterEntitiesOnVertexIndices(vertex_indices), self.cells())
-        else:
+        """
+        :return: a list with the entity having exactly the given vertices (in any order) or an empty list
+        """
+        if not 1 <= topological_dim <= 3:
             raise NotImplementedError("Topological dimension of mesh entities must be 1, 2 or 3.")
+        index = self.find_entity_index(vertex_indices, topological_dim)
+        if index is None:
+            return []
+        return [self._tables[topological_dim].entity(index)]
+
+    def find_entity_index(self, vertex_indices, topological_dim):
+        """
+        Looks up the index of the entity with exactly the given vertices (in any order) in the incidence index of
+        the entity table (a hash of sorted vertex tuples), which is built once and kept current on insertion.
+        :return: the entity index or None
+        """
+        return self.entity_table(topological_dim).find(vertex_indices)
+
+    def entities_with_vertex(self, global_vertex_number, topological_dim):
+        """
+        :return: list of the indices of all entities of the given dimension having the given vertex
+        """
+        return self.entity_table(topological_dim).entities_of_vertex(global_vertex_number)
 
     def select_vertex(self, global_vertex_number):
-        return self._vertex_dict[global_vertex_number]
+        return self._tables[0].entity(global_vertex_number)
 
     def select_vertices(self, global_vertex_numbers):
-        return [self._vertex_dict[v] for v in global_vertex_numbers]
+        return [self._tables[0].entity(v) for v in global_vertex_numbers]
+
+    def coordinates(self):
+        """
+        :return: the coordinate array of shape (n, space_dim) where row i holds the coordinates of the vertex with
+        global index i (rows of unused indices are NaN). This is a view; modifying it moves the vertices and has to be
+        followed by a call to geometry_changed().
+        """
+        return self._coordinates[:self._n_coordinate_rows]
+
+    def move(self, displacement):
+        """
+        Displaces all vertices in place in one vectorized update and increases the geometry version, so Jacobians,
+        quadrature geometry and spatial indices are recomputed on their next use. Topology, dof maps and sparsity
+        patterns are not affected.
+        :param displacement: array of shape (n_vertices, space_dim) (or flat, vertex by vertex) or an FEFunction on
+        a function space with space_dim dofs per vertex (the components of the displacement); vertices without dofs
+        are not moved
+        """
+        coordinates = self.coordinates()
+        if hasattr(displacement, "dof_values"):
+            vertex_dofs = displacement.function_space.vertex_dof_array()
+            if vertex_dofs.shape[1] != self._space_dim:
+                raise Exception("A displacement needs {0:d} dofs per vertex, the function space has {1:d}."
+                                .format(self._space_dim, vertex_dofs.shape[1]))
+            values = displacement.dof_values()
+            displacement = np.where(vertex_dofs >= 0, values[np.maximum(vertex_dofs, 0)], 0.0)
+        displacement = np.asarray(displacement, dtype=float).reshape(coordinates.shape)
+        if not self._coordinates.flags.writeable:
+            # adopted read-only (e.g. memory-mapped) arrays are copied on the first write
+            self._coordinates = self._coordinates.copy()
+            coordinates = self.coordinates()
+        coordinates += displacement
+        self.geometry_changed()
+
+    def vertex_coords(self, global_vertex_numbers):
+        """
+        :return: array of shape (len(global_vertex_numbers), space_dim) gathered from the coordinate array
+        """
+        return self._coordinates[np.asarray(global_vertex_numbers, dtype=np.int64)]
 
     def vertex(self, global_vertex_number):
-        return self._vertex_dict[global_vertex_number]
+        return self._tables[0].entity(global_vertex_number)
 
     def vertices(self):
-        return self._vertex_dict.values()
+        return self._tables[0].entities()
 
     def cells(self):
-        return self._cell_dict.values()
+        return self._tables[3].entities()
 
     def faces(self):
-        return self._face_dict.values()
+        return self._tables[2].entities()
 
     def lines(self):
-        return self._line_dict.values()
+        return self._tables[1].entities()
 
     def topological_dim(self):
         return self._topological_dim
 
+    def geometry_version(self):
+        """
+        A counter that is increased whenever vertices or mesh entities are added or vertex coordinates are changed.
+        Data derived from the geometry (Jacobians, quadrature point coordinates, ...) remains valid as long as this
+        number does not change.
+        """
+        return self._geometry_version
+
+    def topology_version(self):
+        """
+        A counter that is increased whenever entities are renumbered (see reorder()). Data indexed by entity numbers,
+        like the dof maps of function spaces, has to be regenerated when it changes.
+        """
+        return self._topology_version
+
+    def geometry_changed(self):
+        """Has to be called after vertex coordinates have been modified in place."""
+        self._geometry_version += 1
+
     def space_dim(self):
         return self._space_dim
-
-    @staticmethod
-    def _add_entity(entity, number, container, container_name):
-        if number not in container.keys():
-            container[number] = entity
-        else:
-            raise Exception("There is already an entity with number {0:d} registered in container \"{1:s}\"!"
-                            .format(number, container_name))
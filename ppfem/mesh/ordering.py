@@ -0,0 +1,120 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+def _as_points(points):
+    points = np.asarray(points, dtype=float)
+    if points.ndim == 1:
+        return points.reshape(-1, 1)
+    return points
+
+
+def _quantize(points, bits):
+    """Maps the points onto the integer grid {0, ..., 2**bits - 1}^d spanned by their bounding box."""
+    lower = points.min(axis=0)
+    extent = np.max(points.max(axis=0) - lower)
+    if extent == 0.0:
+        extent = 1.0
+    scaled = (points - lower) / extent * float(2 ** bits - 1)
+    return np.clip(np.rint(scaled), 0, 2 ** bits - 1).astype(np.uint64)
+
+
+def _default_bits(dim):
+    return min(63 // dim, 52)
+
+
+# shifts and masks spreading the bits of an integer such that dim - 1 zero bits follow each of them
+_SPREAD_MASKS = {
+    2: [(16, 0x0000ffff0000ffff), (8, 0x00ff00ff00ff00ff), (4, 0x0f0f0f0f0f0f0f0f), (2, 0x3333333333333333),
+        (1, 0x5555555555555555)],
+    3: [(32, 0x001f00000000ffff), (16, 0x001f0000ff0000ff), (8, 0x100f00f00f00f00f), (4, 0x10c30c30c30c30c3),
+        (2, 0x1249249249249249)],
+}
+
+
+def _interleave(grid_coords, bits):
+    """Key whose bits are, from the most significant one on, bit b of the coordinates 0, ..., d - 1 for b descending."""
+    n, dim = grid_coords.shape
+    keys = np.zeros(n, dtype=np.uint64)
+    if dim in _SPREAD_MASKS and bits <= 64 // dim:
+        for i in range(dim):
+            spread = grid_coords[:, i].copy()
+            for shift, mask in _SPREAD_MASKS[dim]:
+                spread = (spread | (spread << np.uint64(shift))) & np.uint64(mask)
+            keys |= spread << np.uint64(dim - 1 - i)
+        return keys
+    for b in range(bits - 1, -1, -1):
+        for i in range(dim):
+            keys = (keys << np.uint64(1)) | ((grid_coords[:, i] >> np.uint64(b)) & np.uint64(1))
+    return keys
+
+
+def morton_keys(points, bits=None):
+    """
+    :param points: array of shape (n, d)
+    :param bits: resolution per coordinate (default: as many as fit into 63 bits)
+    :return: uint64 array of shape (n,), the positions of the points on the Morton (Z-order) curve
+    """
+    points = _as_points(points)
+    bits = bits or _default_bits(points.shape[1])
+    return _interleave(_quantize(points, bits), bits)
+
+
+def hilbert_keys(points, bits=None):
+    """
+    Positions on the Hilbert curve, computed for all points at once with Skilling's transposition algorithm
+    ("Programming the Hilbert curve", AIP Conf. Proc. 707, 2004).
+    :param points: array of shape (n, d)
+    :param bits: resolution per coordinate (default: as many as fit into 63 bits)
+    :return: uint64 array of shape (n,)
+    """
+    points = _as_points(points)
+    dim = points.shape[1]
+    bits = bits or _default_bits(dim)
+    grid_coords = _quantize(points, bits)
+    x = [np.ascontiguousarray(grid_coords[:, i]) for i in range(dim)]
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = np.uint64(q - 1)
+        for i in range(dim):
+            high = (x[i] & np.uint64(q)) != 0
+            # invert the low bits of x[0] where bit q of x[i] is set, exchange them with those of x[i] elsewhere
+            t = np.where(high, np.uint64(0), (x[0] ^ x[i]) & p)
+            x[0] = np.where(high, x[0] ^ p, x[0] ^ t)
+            if i > 0:
+                x[i] ^= t
+        q >>= 1
+    for i in range(1, dim):
+        x[i] ^= x[i - 1]
+    t = np.zeros(grid_coords.shape[0], dtype=np.uint64)
+    q = 1 << (bits - 1)
+    while q > 1:
+        t ^= np.where((x[dim - 1] & np.uint64(q)) != 0, np.uint64(q - 1), np.uint64(0))
+        q >>= 1
+    return _interleave(np.stack(x, axis=1) ^ t[:, np.newaxis], bits)
+
+
+def space_filling_curve_keys(points, curve="hilbert", bits=None):
+    """
+    :param curve: "hilbert" or "morton"
+    """
+    if curve == "hilbert":
+        return hilbert_keys(points, bits)
+    if curve == "morton":
+        return morton_keys(points, bits)
+    raise Exception("Unknown space-filling curve '{0:s}'.".format(curve))
@@ -0,0 +1,235 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sps
+from ppfem.mesh.ordering import space_filling_curve_keys
+
+
+def cell_adjacency(mesh):
+    """
+    The dual graph of the mesh: cells are adjacent if they share a facet (an end point for lines).
+    :return: symmetric sparse matrix (CSR) of shape (n_cells, n_cells) with entries 1; rows and columns refer to the
+    positions in mesh.entity_table().indices(), which are the cell indices for contiguous tables
+    """
+    table = mesh.entity_table()
+    indices = table.indices()
+    if mesh.topological_dim() == 1:
+        facets = table.connectivity(indices)[:, :2]
+    else:
+        facets = mesh.sub_entities()[0][indices]
+    cells = np.repeat(np.arange(len(indices)), facets.shape[1])
+    facets = facets.reshape(-1)
+    valid = facets >= 0
+    order = np.argsort(facets[valid], kind="stable")
+    facets = facets[valid][order]
+    cells = cells[valid][order]
+    shared = np.flatnonzero(facets[1:] == facets[:-1])
+    rows = np.concatenate([cells[shared], cells[shared + 1]])
+    cols = np.concatenate([cells[shared + 1], cells[shared]])
+    adjacency = sps.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(indices), len(indices)))
+    adjacency.data[:] = 1.0
+    return adjacency
+
+
+def cell_vertex_incidence(mesh):
+    """:return: sparse matrix (CSR) of shape (n_cells, n_vertices) with 1 where a cell has a vertex"""
+    table = mesh.entity_table()
+    connectivity = table.connectivity(table.indices())
+    rows = np.repeat(np.arange(connectivity.shape[0]), connectivity.shape[1])
+    cols = connectivity.reshape(-1)
+    valid = cols >= 0
+    incidence = sps.csr_matrix((np.ones(np.count_nonzero(valid)), (rows[valid], cols[valid])),
+                               shape=(connectivity.shape[0], mesh.coordinates().shape[0]))
+    incidence.data[:] = 1.0
+    return incidence
+
+
+def cell_centroids(mesh):
+    """:return: array of shape (n_cells, space_dim), the mean of the vertices (end points for lines) of each cell"""
+    table = mesh.entity_table()
+    indices = table.indices()
+    connectivity = table.connectivity(indices)
+    if mesh.topological_dim() == 1:
+        connectivity = connectivity[:, :2]
+    n_vertices = np.count_nonzero(connectivity >= 0, axis=1)
+    coords = mesh.coordinates()[np.where(connectivity >= 0, connectivity, 0)]
+    coords[connectivity < 0] = 0.0
+    return coords.sum(axis=1) / n_vertices[:, np.newaxis]
+
+
+def recursive_coordinate_bisection(points, n_parts):
+    """
+    Splits the points recursively at the median of the coordinate with the largest extent. For n_parts not being a
+    power of two, the points are split in proportion to the number of parts on either side.
+    :return: int array with the part (0, ..., n_parts - 1) of each point
+    """
+    points = np.asarray(points, dtype=float)
+    parts = np.zeros(points.shape[0], dtype=np.int64)
+    stack = [(np.arange(points.shape[0]), 0, n_parts)]
+    while stack:
+        selected, first_part, n = stack.pop()
+        if n == 1:
+            parts[selected] = first_part
+            continue
+        n_left = n // 2
+        split = int(round(len(selected) * n_left / float(n)))
+        local = points[selected]
+        axis = np.argmax(local.max(axis=0) - local.min(axis=0)) if len(selected) > 0 else 0
+        order = np.argpartition(local[:, axis], split) if 0 < split < len(selected) else np.arange(len(selected))
+        stack.append((selected[order[:split]], first_part, n_left))
+        stack.append((selected[order[split:]], first_part + n_left, n - n_left))
+    return parts
+
+
+def space_filling_curve_partition(points, n_parts, curve="hilbert"):
+    """
+    Sorts the points along a space-filling curve (see ppfem.mesh.ordering) and cuts the curve into n_parts pieces
+    of equal size.
+    :return: int array with the part of each point
+    """
+    order = np.argsort(space_filling_curve_keys(points, curve), kind="stable")
+    parts = np.empty(len(order), dtype=np.int64)
+    parts[order] = np.arange(len(order)) * n_parts // max(len(order), 1)
+    return parts
+
+
+def greedy_graph_growing(adjacency, n_parts):
+    """
+    Grows the parts one after another from a seed by breadth-first search over the graph until they have their
+    target size. The seed is a vertex of minimal degree among the unassigned ones, i.e. a cell at the boundary of
+    the mesh. Each BFS level is processed as a whole with a sparse matrix-vector product.
+    :param adjacency: symmetric sparse matrix, e.g. from cell_adjacency()
+    :return: int array with the part of each graph vertex
+    """
+    adjacency = sps.csr_matrix(adjacency)
+    n = adjacency.shape[0]
+    degree = np.diff(adjacency.indptr)
+    parts = np.full(n, -1, dtype=np.int64)
+    n_assigned = 0
+    for part in range(n_parts):
+        target = (part + 1) * n // n_parts - n_assigned
+        unassigned = np.flatnonzero(parts < 0)
+        if target <= 0 or len(unassigned) == 0:
+            continue
+        frontier = np.zeros(n, dtype=bool)
+        frontier[unassigned[np.argmin(degree[unassigned])]] = True
+        size = 0
+        while size < target:
+            level = np.flatnonzero(frontier)
+            if len(level) == 0:
+                # the remaining graph is disconnected: continue from another seed
+                unassigned = np.flatnonzero(parts < 0)
+                level = unassigned[np.argmin(degree[unassigned])][np.newaxis]
+            level = level[:target - size]
+            parts[level] = part
+            size += len(level)
+            indicator = np.zeros(n)
+            indicator[level] = 1.0
+            reached = adjacency.dot(indicator) > 0
+            frontier = (reached | frontier) & (parts < 0)
+        n_assigned += size
+    return parts
+
+
+def edge_cut(adjacency, parts):
+    """:return: the number of graph edges between different parts (the size of the interfaces)"""
+    coo = sps.triu(adjacency, k=1).tocoo()
+    return int(np.count_nonzero(parts[coo.row] != parts[coo.col]))
+
+
+class Partition(object):
+    """
+    The piece of a mesh (and optionally a function space) a worker is responsible for:
+      `cells`: the owned cells; every cell is owned by exactly one partition
+      `ghost_cells`: cells of other partitions sharing a vertex with an owned cell (ghost layer)
+      `local_to_global`: global dofs of the owned and ghost cells, the dofs owned by this partition first
+      (a dof is owned by the smallest partition having a cell with this dof)
+      `n_owned_dofs`: number of owned dofs, i.e. local_to_global[:n_owned_dofs] are owned
+      `cell_dofs`: local dof numbers of the cells concatenated from cells and ghost_cells, shape
+      (len(cells) + len(ghost_cells), dofs_per_cell), padded with -1
+    The dof related attributes are None if the partition was created without a function space.
+    """
+    def __init__(self, index, cells, ghost_cells, local_to_global=None, n_owned_dofs=None, cell_dofs=None):
+        self.index = index
+        self.cells = cells
+        self.ghost_cells = ghost_cells
+        self.local_to_global = local_to_global
+        self.n_owned_dofs = n_owned_dofs
+        self.cell_dofs = cell_dofs
+
+    def all_cells(self):
+        return np.concatenate([self.cells, self.ghost_cells])
+
+    def number_of_local_dofs(self):
+        return None if self.local_to_global is None else len(self.local_to_global)
+
+
+def partition_cells(mesh, n_parts, method="rcb"):
+    """
+    :param method: "rcb" (recursive coordinate bisection of the cell centroids), "hilbert" or "morton"
+    (space-filling curves over the cell centroids) or "greedy" (greedy graph growing on cell_adjacency())
+    :return: int array with the part of each cell (by position in mesh.entity_table().indices())
+    """
+    if method == "rcb":
+        return recursive_coordinate_bisection(cell_centroids(mesh), n_parts)
+    if method in ("hilbert", "morton"):
+        return space_filling_curve_partition(cell_centroids(mesh), n_parts, curve=method)
+    if method == "greedy":
+        return greedy_graph_growing(cell_adjacency(mesh), n_parts)
+    raise Exception("Unknown partitioning method '{0:s}'.".format(method))
+
+
+def partition_mesh(mesh, n_parts, method="rcb", function_space=None, parts=None):
+    """
+    Splits the cells of the mesh into n_parts partitions with ghost layers and, if a function space is given, the
+    local-to-global dof maps built from its cell dof table.
+    :param parts: optional precomputed part of each cell (otherwise from partition_cells(mesh, n_parts, method))
+    :return: list of Partition objects
+    """
+    if parts is None:
+        parts = partition_cells(mesh, n_parts, method)
+    cell_indices = mesh.entity_table().indices()
+    incidence = cell_vertex_incidence(mesh)
+
+    cell_dofs = None
+    dof_owner = None
+    if function_space is not None:
+        cell_dofs = function_space.cell_dof_array()[cell_indices]
+        valid = cell_dofs >= 0
+        dof_owner = np.full(function_space.number_of_dofs, n_parts, dtype=np.int64)
+        np.minimum.at(dof_owner, cell_dofs[valid], np.broadcast_to(parts[:, np.newaxis], cell_dofs.shape)[valid])
+
+    partitions = []
+    for part in range(n_parts):
+        owned = np.flatnonzero(parts == part)
+        touched = np.zeros(incidence.shape[0])
+        touched[owned] = 1.0
+        touched_vertices = incidence.T.dot(touched) > 0
+        ghosts = np.flatnonzero((incidence.dot(touched_vertices.astype(float)) > 0) & (parts != part))
+        partition = Partition(part, cell_indices[owned], cell_indices[ghosts])
+        if cell_dofs is not None:
+            local_cells = cell_dofs[np.concatenate([owned, ghosts])]
+            dofs = np.unique(local_cells[local_cells >= 0])
+            owned_first = np.argsort(dof_owner[dofs] != part, kind="stable")
+            partition.local_to_global = dofs[owned_first]
+            partition.n_owned_dofs = int(np.count_nonzero(dof_owner[dofs] == part))
+            global_to_local = np.argsort(partition.local_to_global)
+            positions = np.searchsorted(partition.local_to_global, local_cells, sorter=global_to_local)
+            local_numbers = global_to_local[np.minimum(positions, len(dofs) - 1)] if len(dofs) > 0 else positions
+            partition.cell_dofs = np.where(local_cells >= 0, local_numbers, -1)
+        partitions.append(partition)
+    return partitions
@@ -0,0 +1,234 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sps
+
+
+def lagrange_weights(nodes, points):
+    """
+    :param nodes: 1d array of n distinct interpolation nodes
+    :param points: 1d array of m points
+    :return: array of shape (m, n), the Lagrange polynomials of the nodes evaluated at the points
+    """
+    nodes = np.asarray(nodes, dtype=float)
+    points = np.asarray(points, dtype=float)
+    weights = np.ones((len(points), len(nodes)))
+    for j in range(len(nodes)):
+        for k in range(len(nodes)):
+            if k != j:
+                weights[:, j] *= (points - nodes[k]) / (nodes[j] - nodes[k])
+    return weights
+
+
+def marked_mask(n_cells, marked_cells=None):
+    """
+    :param marked_cells: None (all cells), a boolean mask or an array of cell indices
+    :return: boolean array of shape (n_cells,)
+    """
+    if marked_cells is None:
+        return np.ones(n_cells, dtype=bool)
+    marked_cells = np.asarray(marked_cells)
+    if marked_cells.dtype == bool:
+        return marked_cells.copy()
+    mask = np.zeros(n_cells, dtype=bool)
+    mask[marked_cells.astype(np.int64)] = True
+    return mask
+
+
+class Refinement(object):
+    """
+    Arrays describing one refinement step:
+      `cells`: connectivity of the fine cells; the cells replacing coarse cell i follow those replacing cell i - 1
+      `parent_cells`: the coarse cell of each fine cell
+      `prolongation`: sparse matrix of shape (n_fine_vertices, n_coarse_vertices) interpolating vertex values
+      (and coordinates) from the coarse to the fine mesh; coarse vertices keep their indices
+      `vertex_parent_dims`, `vertex_parent_indices`: the coarse entity each new vertex was created on
+      `facets`: optional tuple (parent edge indices, connectivity) of the fine facets replacing the edges that were
+      passed as facets to refine_faces
+    """
+    def __init__(self, cells, parent_cells, prolongation, vertex_parent_dims, vertex_parent_indices, facets=None):
+        self.cells = cells
+        self.parent_cells = parent_cells
+        self.prolongation = prolongation
+        self.vertex_parent_dims = vertex_parent_dims
+        self.vertex_parent_indices = vertex_parent_indices
+        self.facets = facets
+
+
+def _collect_children(refined, kept_cells, children):
+    """
+    :param refined: boolean array (n_cells,), the cells that are replaced by children
+    :param kept_cells: connectivity of the cells that are not refined
+    :param children: list of (cell indices, array of shape (n, n_children, n_vertices_per_cell))
+    :return: (cells, parent_cells)
+    """
+    counts = np.ones(refined.shape[0], dtype=np.int64)
+    for indices, group in children:
+        counts[indices] = group.shape[1]
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    cells = np.empty((offsets[-1], kept_cells.shape[1]), dtype=np.int64)
+    cells[offsets[:-1][~refined]] = kept_cells
+    for indices, group in children:
+        rows = offsets[indices][:, np.newaxis] + np.arange(group.shape[1])
+        cells[rows.reshape(-1)] = group.reshape(-1, kept_cells.shape[1])
+    return cells, np.repeat(np.arange(refined.shape[0]), counts)
+
+
+def _prolongation(n_coarse, groups):
+    """
+    :param groups: list of (parents, weights), parents being an int array (n_new, k) of the coarse vertices the next
+    n_new vertices are interpolated from with the weights (n_new, k)
+    """
+    rows = [np.arange(n_coarse)]
+    cols = [np.arange(n_coarse)]
+    values = [np.ones(n_coarse)]
+    first = n_coarse
+    for parents, weights in groups:
+        rows.append(np.repeat(np.arange(first, first + parents.shape[0]), parents.shape[1]))
+        cols.append(parents.reshape(-1))
+        values.append(weights.reshape(-1))
+        first += parents.shape[0]
+    prolongation = sps.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                                  shape=(first, n_coarse))
+    prolongation.eliminate_zeros()
+    return prolongation
+
+
+def refine_lines(n_vertices, lines, marked_cells=None):
+    """
+    Bisects the marked lines (default: all). A line of degree p (p + 1 vertices ordered as in LagrangeLine) is split
+    at the midpoint of its parameter interval into two lines of degree p. The new vertices are interpolated with the
+    Lagrange polynomials of the coarse line, hence curved lines keep their shape and the prolongation is exact for
+    isoparametric functions of degree p.
+    :param n_vertices: number of vertices of the coarse mesh
+    :param lines: int array (n_lines, p + 1)
+    :return: a Refinement
+    """
+    n_per_line = lines.shape[1]
+    refined = marked_mask(lines.shape[0], marked_cells)
+    refined_indices = np.flatnonzero(refined)
+
+    nodes = np.concatenate([[-1.0, 1.0], np.linspace(-1.0, 1.0, n_per_line)[1:-1]])
+    # parameters of the vertices of both children in the parent line; coinciding ones are the same vertex
+    params, child_local = np.unique(np.round(np.stack([(nodes - 1.0) / 2.0, (nodes + 1.0) / 2.0]), 12),
+                                    return_inverse=True)
+    child_local = child_local.reshape(2, n_per_line)
+    matches = np.isclose(params[:, np.newaxis], nodes[np.newaxis, :])
+    is_new = ~np.any(matches, axis=1)
+    n_new = int(np.count_nonzero(is_new))
+
+    param_vertices = np.empty((len(refined_indices), len(params)), dtype=np.int64)
+    param_vertices[:, ~is_new] = lines[refined_indices][:, np.argmax(matches[~is_new], axis=1)]
+    param_vertices[:, is_new] = n_vertices + np.arange(len(refined_indices) * n_new).reshape(-1, n_new)
+
+    weights = np.tile(lagrange_weights(nodes, params[is_new]), (len(refined_indices), 1))
+    prolongation = _prolongation(n_vertices, [(np.repeat(lines[refined_indices], n_new, axis=0), weights)])
+    children = [(refined_indices, param_vertices[:, child_local])]
+    cells, parent_cells = _collect_children(refined, lines[~refined], children)
+    return Refinement(cells, parent_cells, prolongation,
+                      np.concatenate([np.zeros(n_vertices, dtype=np.int64), np.ones(weights.shape[0], dtype=np.int64)]),
+                      np.concatenate([np.arange(n_vertices), np.repeat(refined_indices, n_new)]))
+
+
+def _close_triangles(edges, edge_refined):
+    """Bisects the third edge of every triangle with two bisected edges until there are no such triangles left."""
+    while True:
+        n_refined = np.count_nonzero(edge_refined[edges], axis=1)
+        incomplete = n_refined == 2
+        if not np.any(incomplete):
+            return n_refined
+        edge_refined[edges[incomplete].reshape(-1)] = True
+
+
+def refine_faces(n_vertices, cells, edges, edge_vertices, marked_cells=None, facets=None):
+    """
+    Refines triangles or quads. Refined cells are split into four by connecting the edge midpoints (and, for quads,
+    the cell center). For triangles, any subset of cells may be marked: all edges of marked triangles are bisected,
+    triangles with two bisected edges get the third one bisected as well, then triangles with three bisected edges
+    are split into four and triangles with one bisected edge into two, which keeps the mesh conforming.
+    Marking a subset of quads is not supported since it would create hanging nodes.
+    :param n_vertices: number of vertices of the coarse mesh
+    :param cells: int array (n_cells, 3 or 4)
+    :param edges: int array (n_cells, 3 or 4), the edge indices of the cells (see Mesh.sub_entities)
+    :param edge_vertices: int array (n_edges, 2)
+    :param facets: optional array of edge indices (e.g. boundary facets) whose children are to be returned
+    :return: a Refinement
+    """
+    n_cells, n_per_cell = cells.shape
+    marked = marked_mask(n_cells, marked_cells)
+    if n_per_cell == 4 and not np.all(marked):
+        raise NotImplementedError("Refining a subset of quads would create hanging nodes, which are not supported.")
+
+    edge_refined = np.zeros(edge_vertices.shape[0], dtype=bool)
+    edge_refined[edges[marked].reshape(-1)] = True
+    if n_per_cell == 3:
+        n_refined = _close_triangles(edges, edge_refined)
+    else:
+        n_refined = np.full(n_cells, 4)
+
+    refined_edges = np.flatnonzero(edge_refined)
+    midpoints = np.full(edge_vertices.shape[0], -1, dtype=np.int64)
+    midpoints[refined_edges] = n_vertices + np.arange(len(refined_edges))
+    new_vertices = [(edge_vertices[refined_edges], np.full((len(refined_edges), 2), 0.5))]
+    parent_dims = [np.zeros(n_vertices, dtype=np.int64), np.ones(len(refined_edges), dtype=np.int64)]
+    parent_indices = [np.arange(n_vertices), refined_edges]
+
+    v = cells
+    m = midpoints[edges]
+    if n_per_cell == 3:
+        red = np.flatnonzero(n_refined == 3)
+        v, m = cells[red], m[red]
+        children = [(red, np.stack([np.stack([v[:, 0], m[:, 0], m[:, 2]], axis=-1),
+                                    np.stack([m[:, 0], v[:, 1], m[:, 1]], axis=-1),
+                                    np.stack([m[:, 2], m[:, 1], v[:, 2]], axis=-1),
+                                    np.stack([m[:, 0], m[:, 1], m[:, 2]], axis=-1)], axis=1))]
+        green = np.flatnonzero(n_refined == 1)
+        if len(green) > 0:
+            local = np.argmax(edge_refined[edges[green]], axis=1)
+            a = cells[green, local]
+            b = cells[green, (local + 1) % 3]
+            c = cells[green, (local + 2) % 3]
+            mid = midpoints[edges[green, local]]
+            children.append((green, np.stack([np.stack([a, mid, c], axis=-1),
+                                              np.stack([mid, b, c], axis=-1)], axis=1)))
+        refined = n_refined > 0
+    else:
+        center = n_vertices + len(refined_edges) + np.arange(n_cells)
+        new_vertices.append((cells, np.full((n_cells, 4), 0.25)))
+        parent_dims.append(np.full(n_cells, 2, dtype=np.int64))
+        parent_indices.append(np.arange(n_cells))
+        children = [(np.arange(n_cells), np.stack([np.stack([v[:, 0], m[:, 0], center, m[:, 3]], axis=-1),
+                                                   np.stack([m[:, 0], v[:, 1], m[:, 1], center], axis=-1),
+                                                   np.stack([center, m[:, 1], v[:, 2], m[:, 2]], axis=-1),
+                                                   np.stack([m[:, 3], center, m[:, 2], v[:, 3]], axis=-1)], axis=1))]
+        refined = marked
+
+    prolongation = _prolongation(n_vertices, new_vertices)
+    fine_cells, parent_cells = _collect_children(refined, cells[~refined], children)
+
+    fine_facets = None
+    if facets is not None:
+        facets = np.asarray(facets, dtype=np.int64)
+        split = edge_refined[facets]
+        vertices = edge_vertices[facets]
+        mid = midpoints[facets[split]]
+        fine_facets = (np.concatenate([facets[~split], facets[split], facets[split]]),
+                       np.concatenate([vertices[~split],
+                                       np.stack([vertices[split, 0], mid], axis=-1),
+                                       np.stack([mid, vertices[split, 1]], axis=-1)]))
+    return Refinement(fine_cells, parent_cells, prolongation, np.concatenate(parent_dims),
+                      np.concatenate(parent_indices), fine_facets)
@@ -0,0 +1,222 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from ppfem.geometry.mapping import batched_inverse_jacobian
+
+
+def _linear_shape_functions(topological_dim, n_vertices, points):
+    """
+    First order shape functions of the cells the mesh generators create. Reference cells are [-1, 1]^d for lines,
+    quads and hexahedra (vertex order as in ppfem.mesh.generators) and the unit simplex for triangles and tetrahedra.
+    :param points: array of shape (n, topological_dim)
+    :return: tuple (values, gradients) of shapes (n, n_vertices) and (n, n_vertices, topological_dim)
+    """
+    n = points.shape[0]
+    if n_vertices == topological_dim + 1 and topological_dim > 1:
+        values = np.concatenate([1.0 - points.sum(axis=1, keepdims=True), points], axis=1)
+        gradients = np.concatenate([-np.ones((1, topological_dim)), np.eye(topological_dim)])
+        return values, np.broadcast_to(gradients, (n,) + gradients.shape)
+    corners = {1: [(-1,), (1,)],
+               2: [(-1, -1), (1, -1), (1, 1), (-1, 1)],
+               3: [(-1, -1, -1), (1, -1, -1), (1, 1, -1), (-1, 1, -1),
+                   (-1, -1, 1), (1, -1, 1), (1, 1, 1), (-1, 1, 1)]}.get(topological_dim)
+    if corners is None or n_vertices != len(corners):
+        raise NotImplementedError("No first order shape functions for cells of dimension {0:d} with {1:d} vertices."
+                                  .format(topological_dim, n_vertices))
+    corners = np.array(corners, dtype=float)
+    # factors (1 + c_i x_i) / 2 per vertex and direction
+    factors = (1.0 + corners[np.newaxis, :, :] * points[:, np.newaxis, :]) / 2.0
+    values = np.prod(factors, axis=2)
+    gradients = np.empty((n, len(corners), topological_dim))
+    for i in range(topological_dim):
+        others = np.prod(np.delete(factors, i, axis=2), axis=2)
+        gradients[:, :, i] = others * corners[np.newaxis, :, i] / 2.0
+    return values, gradients
+
+
+def _inside_reference(topological_dim, n_vertices, points, tol):
+    """:param n_vertices: number of vertices of the cell of each point (or of all cells)"""
+    simplex = (np.asarray(n_vertices) == topological_dim + 1) & (topological_dim > 1)
+    return np.where(simplex, np.all(points >= -tol, axis=1) & (points.sum(axis=1) <= 1.0 + tol),
+                    np.all(np.abs(points) <= 1.0 + tol, axis=1))
+
+
+def _reference_center(topological_dim, n_vertices):
+    if n_vertices == topological_dim + 1 and topological_dim > 1:
+        return np.full(topological_dim, 1.0 / (topological_dim + 1))
+    return np.zeros(topological_dim)
+
+
+class SpatialIndex(object):
+    """
+    Uniform grid of bins over the bounding boxes of the cells for locating points in the mesh. Each bin holds the
+    cells whose (slightly enlarged) bounding box overlaps it, stored in CSR format. A query looks up the bin of the
+    point, i.e. costs O(1) for meshes of bounded cell size variation, and inverts the cell mappings of the candidate
+    cells by a vectorized Newton iteration.
+    Cells are mapped with the given FEMapping (needed for higher order / curved cells); without a mapping, the first
+    order shape functions of lines, triangles, quads, tetrahedra and hexahedra are used, and reference coordinates
+    refer to [-1, 1]^d or the unit simplex, respectively. Cells with different numbers of vertices (e.g. triangles and
+    quads, or lines of different degree) are mapped group by group; a given mapping has to handle all of them.
+    The index is rebuilt automatically when the geometry of the mesh changes (see Mesh.geometry_version).
+    """
+
+    def __init__(self, mesh, mapping=None, cells_per_bin=2.0, padding=1e-3):
+        """
+        :param cells_per_bin: average number of cells per bin
+        :param padding: enlargement of the cell bounding boxes relative to their size
+        """
+        self._mesh = mesh
+        self._mapping = mapping
+        self._cells_per_bin = cells_per_bin
+        self._padding = padding
+        self._geometry_version = None
+        self._build()
+
+    def _cell_data(self):
+        table = self._mesh.entity_table()
+        cell_indices = table.indices()
+        connectivity = table.connectivity(cell_indices)
+        n_vertices = table.number_of_vertices(cell_indices)
+        if self._mapping is None and self._mesh.topological_dim() == 1:
+            connectivity = connectivity[:, :2]
+            n_vertices = np.minimum(n_vertices, 2)
+        return cell_indices, connectivity, n_vertices
+
+    def _build(self):
+        mesh = self._mesh
+        self._cell_indices, self._connectivity, self._n_vertices = self._cell_data()
+        # padding entries (-1) of cells with fewer vertices are replaced by the first vertex of the cell
+        coords = mesh.coordinates()[np.where(self._connectivity >= 0, self._connectivity, self._connectivity[:, :1])]
+        lower = coords.min(axis=1)
+        upper = coords.max(axis=1)
+        pad = self._padding * np.max(upper - lower, axis=1, keepdims=True) + 1e-12
+        self._lower = lower - pad
+        self._upper = upper + pad
+
+        n_cells, dim = self._lower.shape
+        self._origin = self._lower.min(axis=0)
+        extent = np.maximum(self._upper.max(axis=0) - self._origin, 1e-300)
+        bin_size = (np.prod(extent) * self._cells_per_bin / max(n_cells, 1)) ** (1.0 / dim)
+        self._n_bins = np.maximum(1, np.minimum(np.ceil(extent / bin_size), 2 ** 20)).astype(np.int64)
+        self._bin_size = extent / self._n_bins
+
+        first = self._bin_of(self._lower)
+        span = self._bin_of(self._upper) - first + 1
+        counts = np.prod(span, axis=1)
+        cells = np.repeat(np.arange(n_cells), counts)
+        # enumerate the bins covered by each cell: position within the box of bins of its cell
+        local = np.arange(len(cells)) - np.repeat(np.cumsum(counts) - counts, counts)
+        bins = np.zeros(len(cells), dtype=np.int64)
+        for i in range(dim - 1, -1, -1):
+            bins = bins * self._n_bins[i] + first[cells, i] + local % span[cells, i]
+            local //= span[cells, i]
+        order = np.argsort(bins, kind="stable")
+        self._bin_cells = cells[order]
+        self._bin_offsets = np.searchsorted(bins[order], np.arange(np.prod(self._n_bins) + 1))
+        self._geometry_version = mesh.geometry_version()
+
+    def _bin_of(self, points):
+        bins = np.floor((points - self._origin) / self._bin_size).astype(np.int64)
+        return np.clip(bins, 0, self._n_bins - 1)
+
+    def _flat_bin_of(self, points):
+        bins = self._bin_of(points)
+        flat = np.zeros(points.shape[0], dtype=np.int64)
+        for i in range(points.shape[1] - 1, -1, -1):
+            flat = flat * self._n_bins[i] + bins[:, i]
+        return flat
+
+    def candidates(self, points):
+        """
+        :return: tuple (point_numbers, cell_positions) of all pairs of a point and a cell whose bounding box contains
+        it; cell positions refer to the rows of the cell arrays (see cell_indices())
+        """
+        if self._geometry_version != self._mesh.geometry_version():
+            self._build()
+        points = np.asarray(points, dtype=float).reshape(-1, self._mesh.space_dim())
+        flat = self._flat_bin_of(points)
+        starts = self._bin_offsets[flat]
+        counts = self._bin_offsets[flat + 1] - starts
+        point_numbers = np.repeat(np.arange(points.shape[0]), counts)
+        cells = self._bin_cells[np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(counts.sum())]
+        inside = np.all((points[point_numbers] >= self._lower[cells]) & (points[point_numbers] <= self._upper[cells]),
+                        axis=1)
+        return point_numbers[inside], cells[inside]
+
+    def cell_indices(self):
+        return self._cell_indices
+
+    def _map(self, vertex_coords, reference_points):
+        if self._mapping is not None:
+            return self._mapping.map_points_pointwise(vertex_coords, reference_points)
+        values, gradients = _linear_shape_functions(self._mesh.topological_dim(), vertex_coords.shape[1],
+                                                    reference_points)
+        return np.einsum('kb,kbd->kd', values, vertex_coords), np.einsum('kbr,kbd->kdr', gradients, vertex_coords)
+
+    def reference_coordinates(self, points, cell_positions, max_iterations=20, tol=1e-12):
+        """
+        Inverts the mappings of the given cells at the given points (pairwise) by Newton's method, all pairs of cells
+        with the same number of vertices at once.
+        For cells embedded in a higher dimensional space the result minimizes the distance (Gauss-Newton).
+        :return: tuple (reference_points, residuals), the latter being the distances of the mapped points
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, self._mesh.space_dim())
+        n_vertices = self._n_vertices[cell_positions]
+        reference = np.empty((points.shape[0], self._mesh.topological_dim()))
+        residuals = np.empty(points.shape[0])
+        for n in np.unique(n_vertices):
+            rows = np.flatnonzero(n_vertices == n)
+            vertex_coords = self._mesh.coordinates()[self._connectivity[cell_positions[rows], :n]]
+            reference[rows], residuals[rows] = self._invert(points[rows], vertex_coords, max_iterations, tol)
+        return reference, residuals
+
+    def _invert(self, points, vertex_coords, max_iterations, tol):
+        tdim = self._mesh.topological_dim()
+        reference = np.tile(_reference_center(tdim, vertex_coords.shape[1]), (points.shape[0], 1))
+        active = np.arange(points.shape[0])
+        for iteration in range(max_iterations):
+            if len(active) == 0:
+                break
+            mapped, jacobians = self._map(vertex_coords[active], reference[active])
+            step = np.einsum('krd,kd->kr', batched_inverse_jacobian(jacobians), mapped - points[active])
+            reference[active] -= step
+            active = active[np.max(np.abs(step), axis=1) > tol]
+        mapped = self._map(vertex_coords, reference)[0]
+        return reference, np.linalg.norm(mapped - points, axis=1)
+
+    def locate(self, points, tol=1e-10):
+        """
+        :param points: array of shape (n_points, space_dim)
+        :param tol: tolerance for points on cell boundaries (in reference coordinates and relative to the cell size)
+        :return: tuple (cell_indices, reference_coordinates) of shapes (n_points,) and (n_points, topological_dim);
+        points outside of the mesh get the cell index -1 and NaN coordinates. Points on interfaces are assigned
+        to one of their cells.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, self._mesh.space_dim())
+        point_numbers, cell_positions = self.candidates(points)
+        reference, residuals = self.reference_coordinates(points[point_numbers], cell_positions)
+        size = np.max(self._upper[cell_positions] - self._lower[cell_positions], axis=1)
+        found = _inside_reference(self._mesh.topological_dim(), self._n_vertices[cell_positions], reference, tol)
+        found &= residuals <= tol * size + 1e-14
+
+        cells = np.full(points.shape[0], -1, dtype=np.int64)
+        result = np.full((points.shape[0], self._mesh.topological_dim()), np.nan)
+        hits = np.flatnonzero(found)
+        hits = hits[np.unique(point_numbers[hits], return_index=True)[1]]
+        cells[point_numbers[hits]] = self._cell_indices[cell_positions[hits]]
+        result[point_numbers[hits]] = reference[hits]
+        return cells, result
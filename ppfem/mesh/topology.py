@@ -0,0 +1,161 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+
+
+# local vertex tuples of the sub-entities of the supported (first order) reference entities,
+# keyed by (topological dimension, number of vertices) and the dimension of the sub-entities
+LOCAL_SUB_ENTITIES = {
+    (2, 3): {1: [(0, 1), (1, 2), (2, 0)]},
+    (2, 4): {1: [(0, 1), (1, 2), (2, 3), (3, 0)]},
+    (3, 4): {1: [(0, 1), (1, 2), (2, 0), (0, 3), (1, 3), (2, 3)],
+             2: [(1, 2, 3), (0, 3, 2), (0, 1, 3), (0, 2, 1)]},
+    (3, 8): {1: [(0, 1), (1, 2), (2, 3), (3, 0), (4, 5), (5, 6), (6, 7), (7, 4), (0, 4), (1, 5), (2, 6), (3, 7)],
+             2: [(0, 3, 2, 1), (4, 5, 6, 7), (0, 1, 5, 4), (1, 2, 6, 5), (2, 3, 7, 6), (3, 0, 4, 7)]},
+}
+
+
+def local_sub_entities(topological_dim, n_vertices, sub_dim):
+    if sub_dim == 0:
+        return [(i,) for i in range(n_vertices if topological_dim > 1 else 2)]
+    try:
+        return LOCAL_SUB_ENTITIES[(topological_dim, n_vertices)][sub_dim]
+    except KeyError:
+        raise NotImplementedError("Sub-entities of dimension {0:d} are not defined for entities of dimension {1:d} "
+                                  "with {2:d} vertices.".format(sub_dim, topological_dim, n_vertices))
+
+
+def vertex_orientations(coordinates, lines):
+    """
+    Orientation of the two end vertices of lines in 1d: the vertex with the smaller coordinate is oriented
+    negatively, the other one positively, i.e. orientation is defined to be the axis direction.
+    :param lines: int array of shape (n_lines, n_vertices_per_line), the end vertices being the first two
+    :return: int array of shape (n_lines, 2)
+    """
+    if coordinates.shape[1] > 1:
+        raise Exception("Vertices have more than one coordinate. In such a >1d setting sub entities are not"
+                        "defined for lines.")
+    first_is_left = coordinates[lines[:, 0], 0] < coordinates[lines[:, 1], 0]
+    orientations = np.empty((lines.shape[0], 2), dtype=np.int64)
+    orientations[:, 0] = np.where(first_is_left, -1, 1)
+    orientations[:, 1] = -orientations[:, 0]
+    return orientations
+
+
+def relative_orientations(local_vertices, entity_vertices):
+    """
+    :param local_vertices: int array (..., k), sub-entity vertices in the local order of the containing entity
+    :param entity_vertices: int array (..., k), the same vertices in the order stored for the sub-entity
+    :return: +1 where both orders describe the same direction of traversal (for edges: same direction, for faces:
+    same cyclic order, i.e. the same normal) and -1 otherwise
+    """
+    k = local_vertices.shape[-1]
+    if k == 2:
+        return np.where(entity_vertices[..., 0] == local_vertices[..., 0], 1, -1)
+    start = np.argmax(entity_vertices == local_vertices[..., :1], axis=-1)
+    following = np.take_along_axis(entity_vertices, ((start + 1) % k)[..., np.newaxis], axis=-1)[..., 0]
+    return np.where(following == local_vertices[..., 1], 1, -1)
+
+
+def unique_rows(rows):
+    """
+    Like np.unique(rows, axis=0, return_index=True, return_inverse=True) for 2d int arrays, but based on np.lexsort,
+    which is considerably faster than sorting the rows as opaque byte strings.
+    :return: tuple (unique_rows, first_occurrences, inverse)
+    """
+    if rows.shape[0] == 0:
+        return rows, np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    order = np.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    is_first = np.ones(rows.shape[0], dtype=bool)
+    is_first[1:] = np.any(sorted_rows[1:] != sorted_rows[:-1], axis=1)
+    group = np.cumsum(is_first) - 1
+    inverse = np.empty(rows.shape[0], dtype=np.int64)
+    inverse[order] = group
+    # lexsort is stable, so the first row of each group is the first occurrence
+    first = order[is_first]
+    return sorted_rows[is_first], first, inverse
+
+
+def generate_sub_entities(table, sub_table, sub_dim, coordinates):
+    """
+    Determines the sub-entities of dimension sub_dim of all entities in table in one pass: the local vertex tuples
+    of all entities are sorted, made unique (see unique_rows) and matched against the corner vertices of the entities
+    already contained in sub_table. Missing sub-entities are appended to sub_table in bulk (with the vertex order of
+    their first occurrence).
+    :param coordinates: the vertex coordinates of the mesh (only needed for the vertex orientation of 1d lines)
+    :return: tuple (sub_entity_indices, orientations) of int arrays of shape (n, max_number_of_sub_entities),
+    row i belonging to the entity with index i; entries of unused rows or missing sub-entities are -1 / 0
+    """
+    indices = table.indices()
+    n_vertices = table.number_of_vertices(indices)
+    connectivity = table.connectivity()
+    groups = []
+    for n in np.unique(n_vertices):
+        group = indices[n_vertices == n]
+        local = np.array(local_sub_entities(table.topological_dim(), int(n), sub_dim), dtype=np.int64)
+        groups.append((group, local, connectivity[group][:, local]))
+
+    n_local_max = max([local.shape[0] for group, local, vertices in groups] + [0])
+    sub_entity_indices = np.full((table.next_index(), n_local_max), -1, dtype=np.int64)
+    orientations = np.zeros((table.next_index(), n_local_max), dtype=np.int64)
+    if len(groups) == 0:
+        return sub_entity_indices, orientations
+    k = groups[0][1].shape[1]
+    if any(local.shape[1] != k for group, local, vertices in groups):
+        raise NotImplementedError("Sub-entities with different numbers of vertices are not supported.")
+
+    if sub_dim == 0:
+        for group, local, vertices in groups:
+            sub_entity_indices[group, :local.shape[0]] = vertices[..., 0]
+            if table.topological_dim() == 1:
+                orientations[group, :2] = vertex_orientations(coordinates, vertices[..., 0])
+            else:
+                orientations[group, :local.shape[0]] = 1
+        return sub_entity_indices, orientations
+
+    flat_vertices = np.concatenate([vertices.reshape(-1, k) for group, local, vertices in groups])
+    keys = np.sort(flat_vertices, axis=1)
+    unique_keys, first, inverse = unique_rows(keys)
+
+    # match against existing sub-entities on their corner vertices; lines of higher order store their end vertices
+    # first, so they are matched on these
+    unique_indices = np.full(unique_keys.shape[0], -1, dtype=np.int64)
+    existing = sub_table.indices()
+    n_existing_vertices = sub_table.number_of_vertices(existing)
+    existing = existing[n_existing_vertices >= k if sub_dim == 1 else n_existing_vertices == k]
+    if len(existing) > 0:
+        existing_keys = np.sort(sub_table.connectivity(existing)[:, :k], axis=1)
+        all_keys, all_first, all_inverse = unique_rows(np.vstack([existing_keys, unique_keys]))
+        id_to_existing = np.full(all_keys.shape[0], -1, dtype=np.int64)
+        id_to_existing[all_inverse[:len(existing)]] = existing
+        unique_indices = id_to_existing[all_inverse[len(existing):]]
+
+    missing = np.flatnonzero(unique_indices < 0)
+    if len(missing) > 0:
+        unique_indices[missing] = sub_table.add_rows(flat_vertices[first[missing]])
+
+    flat_indices = unique_indices[inverse]
+    sub_connectivity = sub_table.connectivity()
+    offset = 0
+    for group, local, vertices in groups:
+        n_local = local.shape[0]
+        group_indices = flat_indices[offset:offset + len(group) * n_local].reshape(len(group), n_local)
+        offset += len(group) * n_local
+        sub_entity_indices[group, :n_local] = group_indices
+        orientations[group, :n_local] = relative_orientations(vertices, sub_connectivity[group_indices, :k])
+    return sub_entity_indices, orientations
@@ -45,10 +45,19 @@ class Quadrature(abc.ABC):
 
 
 class QuadratureFunctor(abc.ABC):
-
-    def __init__(self, functor, mapping):
+    """
+    Multiplies the values of functor by the Jacobian determinant of the mapping. If the precomputed geometry of the
+    cell (a LocalCellGeometry for the quadrature rule in use, see CellEvalDataBase.geometry) is given, the
+    determinants are read from it; the mapping is only evaluated for points unknown to the geometry.
+    """
+    def __init__(self, functor, mapping, geometry=None):
         self._functor = functor
         self._mapping = mapping
+        self._geometry = geometry
 
     def __call__(self, q_point):
+        if self._geometry is not None:
+            index = self._geometry.quadrature_point_index(q_point)
+            if index is not None:
+                return self._functor(q_point) * self._geometry.jacobian_dets[index]
         return self._functor(q_point) * self._mapping.jacobian_det(q_point)
@@ -19,6 +19,33 @@ from ppfem.fem.physical_element import MappedElement
 from ppfem.elements.lagrange_elements import LagrangeLine
 from ppfem.geometry.mapping import FEMapping
 import scipy as sp
+import threading
+
+
+class LagrangeLineMappings(object):
+    """
+    The mapping of an IsoparametricContinuousLagrange1d element that is not localized. Mesh entities and batches of
+    vertex coordinates are mapped by the FEMapping of the degree given by their number of vertices, so the result
+    does not depend on which entities have been seen before, and meshes of mixed degree are supported.
+    """
+    def __init__(self, element):
+        self._element = element
+
+    def fe_mapping(self, number_of_vertices):
+        """
+        :param number_of_vertices: number of vertices of the mesh entities, i.e. degree + 1
+        :return: the FEMapping shared by all entities of this degree
+        """
+        return self._element.reference_data(number_of_vertices - 1)[1]
+
+    def localize(self, mesh_entity):
+        return self.fe_mapping(mesh_entity.number_of_vertices()).localize(mesh_entity)
+
+    def map_points_pointwise(self, vertex_coords, reference_points):
+        """
+        See FEMapping.map_points_pointwise; all entities must have the same number of vertices.
+        """
+        return self.fe_mapping(vertex_coords.shape[1]).map_points_pointwise(vertex_coords, reference_points)
 
 
 class IsoparametricContinuousLagrange1d(MappedElement):
@@ -30,6 +57,9 @@ class IsoparametricContinuousLagrange1d(MappedElement):
         self._ref_element = None
         self._mesh_entity = None
         self._cache = {}
+        # localized copies share the cache and may fill it concurrently
+        self._cache_lock = threading.Lock()
+        self._mappings = LagrangeLineMappings(self)
 
     def number_of_global_dofs_per_vertex(self):
         return self._dim
@@ -43,10 +73,33 @@ class IsoparametricContinuousLagrange1d(MappedElement):
 
     def set_mesh_entity(self, mesh_entity):
         self._mesh_entity = mesh_entity
-        vertices = mesh_entity.vertices()
-        self._ref_element = LagrangeLine(len(vertices) - 1, self._space_dim)
-        self._mapping = FEMapping(self._ref_element)
-        self._mapping.set_mesh_entity(mesh_entity)
+        self._ref_element, mapping = self.reference_data(mesh_entity.number_of_vertices() - 1)
+        self._mapping = mapping.localize(mesh_entity)
+
+    def reference_data(self, degree):
+        """
+        Reference elements and mappings are reused for all entities of the same degree, which keeps the per-entity
+        affine data of the mapping alive. They are created once, even if several threads localize at the same time.
+        :param degree: polynomial degree of the mesh entities
+        :return: tuple (LagrangeLine, FEMapping)
+        """
+        data = self._cache.get(degree)
+        if data is None:
+            with self._cache_lock:
+                data = self._cache.get(degree)
+                if data is None:
+                    ref_element = LagrangeLine(degree, self._space_dim)
+                    data = (ref_element, FEMapping(ref_element))
+                    self._cache[degree] = data
+        return data
+
+    def get_mapping(self):
+        """
+        :return: the LocalFEMapping of the mesh entity if localized, the LagrangeLineMappings of all degrees otherwise
+        """
+        if self._mapping is None:
+            return self._mappings
+        return self._mapping
 
     def set_mapping(self, mapping):
         raise Exception("Isoparametric element sets mapping internally!")
@@ -58,7 +111,8 @@ class IsoparametricContinuousLagrange1d(MappedElement):
         return self._dim
 
     def _clear_cache(self):
-        self._cache = {}
+        with self._cache_lock:
+            self._cache.clear()
 
     def _mapping_is_valid(self, ref_point):
         raise NotImplementedError("This kind of check is not implemented yet.")
@@ -0,0 +1,52 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.io.checkpoint import CheckpointManager, save_checkpoint, load_checkpoint
+
+
+def test_manager_keeps_the_last_checkpoints(tmp_path):
+    mesh = Mesh.rectangle(2, 2, cell_type="triangle")
+    manager = CheckpointManager(str(tmp_path), keep=2)
+    for step in range(4):
+        manager.save(step, mesh)
+    assert [os.path.basename(c) for c in manager.checkpoints()] == ["checkpoint_00000002", "checkpoint_00000003"]
+    assert manager.latest().metadata["step"] == 3
+
+
+def test_manager_refuses_to_keep_nothing(tmp_path):
+    with pytest.raises(Exception):
+        CheckpointManager(str(tmp_path), keep=0)
+
+
+def test_read_only_checkpoint_mesh_can_be_marked_and_moved(tmp_path):
+    mesh = Mesh.rectangle(3, 2)
+    directory = str(tmp_path / "checkpoint")
+    save_checkpoint(directory, mesh)
+    restored = load_checkpoint(directory, read_only=True).mesh
+    facets = restored.mark_boundary({1: lambda x: x[:, 1] > 1. - 1e-12}, default=2)
+    restored.entity_table().domain_indicators()[:] = 4
+    restored.move(np.ones(restored.coordinates().shape))
+
+    assert set(restored.entity_table(1).boundary_indicators()[facets].tolist()) == {1, 2}
+    assert np.all(restored.entity_table().domain_indicators() == 4)
+    assert np.allclose(restored.coordinates(), mesh.coordinates() + 1.)
+    reloaded = load_checkpoint(directory, read_only=True).mesh
+    assert np.array_equal(reloaded.entity_table().domain_indicators(writeable=False),
+                          mesh.entity_table().domain_indicators())
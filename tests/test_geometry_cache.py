@@ -0,0 +1,120 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from ppfem import Mesh, FunctionSpace, FEFunction, Functional, DefaultSystemAssembler, QGauss, \
+    IsoparametricContinuousLagrange1d
+from ppfem.fem.form import FormCollection
+from ppfem.geometry.point import Point
+from ppfem.quadrature.quadrature import QuadratureFunctor
+
+# setting up the Lagrange basis is expensive, the element (and its per-degree cache) is shared by the tests; with
+# meshes of one degree only, the form can take the mapping from it
+ELEMENT = IsoparametricContinuousLagrange1d(1)
+
+
+class _Integral(Functional):
+    """Integral of x^2 over the mesh, x being the physical coordinate."""
+
+    def implements_quadrature_on(self, entity_type=None):
+        return entity_type == Functional.cells
+
+    def local_cell_functional(self, eval_data):
+        return eval_data.integrate(lambda p: eval_data.physical_point(p).coords()[0] ** 2)
+
+    def local_interior_face_functional(self, interior_face_eval_data_functional):
+        pass
+
+    def local_exterior_face_functional(self, exterior_face_eval_data_functional):
+        pass
+
+
+class _NoJacobians(object):
+    """Stands in for a localized mapping; fails if the per-point path is used."""
+
+    def __init__(self, mapping):
+        self._mapping = mapping
+
+    def jacobian_det(self, ref_point):
+        raise AssertionError("jacobian_det evaluated although the cell geometry is available")
+
+    def inverse_jacobian(self, ref_point):
+        raise AssertionError("inverse_jacobian evaluated although the cell geometry is available")
+
+    def map_point(self, ref_point):
+        raise AssertionError("map_point evaluated although the cell geometry is available")
+
+
+def _functional(mesh):
+    space = FunctionSpace(ELEMENT, mesh)
+    return _Integral(QGauss("line", 5), fe_functions={"u": FEFunction(space)})
+
+
+def test_cell_eval_data_uses_cell_geometry():
+    mesh = Mesh.interval(7, 0., 2., degree=2)
+    functional = _functional(mesh)
+    total = 0.
+    for entity in functional.mesh_entity_iterator():
+        eval_data = functional.get_cell_eval_data_functional(entity)
+        assert eval_data.geometry is not None
+        reference = eval_data.mapping
+        point = functional.quadrature.quadrature_data()[1].point
+        assert np.isclose(eval_data.jacobian_det(point), reference.jacobian_det(point))
+        assert np.allclose(eval_data.inverse_jacobian(point), reference.inverse_jacobian(point))
+        assert np.allclose(eval_data.physical_point(point).coords(), reference.map_point(point).coords())
+        eval_data.mapping = _NoJacobians(reference)
+        total += functional.local_cell_functional(eval_data)
+    assert np.isclose(total, 8. / 3.)
+
+
+def test_points_with_foreign_indices_use_the_mapping():
+    mesh = Mesh.interval(4, 0., 2., degree=2)
+    functional = _functional(mesh)
+    entity = next(iter(functional.mesh_entity_iterator()))
+    eval_data = functional.get_cell_eval_data_functional(entity)
+    mapping = eval_data.mapping
+    # support points (here those of LagrangeLine(3)) and points created by users carry indices of their own, which
+    # must not select quadrature data
+    points = [Point(-1. / 3., index=1), Point(1. / 3., index=2)] + [Point(-0.5, index=i) for i in range(3)]
+    for point in points:
+        assert np.allclose(eval_data.physical_point(point).coords(), mapping.map_point(point).coords())
+        assert np.isclose(eval_data.jacobian_det(point), mapping.jacobian_det(point))
+        assert np.allclose(eval_data.inverse_jacobian(point), mapping.inverse_jacobian(point))
+    copy = Point(*functional.quadrature.quadrature_data()[1].point.coords(), index=1)
+    eval_data.mapping = _NoJacobians(mapping)
+    assert np.allclose(eval_data.physical_point(copy).coords(), eval_data.geometry.quadrature_points[1])
+    # a different rule evaluated with the geometry of the functional's rule
+    eval_data.mapping = mapping
+    other_rule = QGauss("line", 3)
+    assert np.isclose(other_rule(QuadratureFunctor(lambda p: p.coords()[0] ** 2, mapping, eval_data.geometry)),
+                      other_rule(QuadratureFunctor(lambda p: p.coords()[0] ** 2, mapping)))
+
+
+def test_quadrature_functor_falls_back_to_mapping():
+    mesh = Mesh.interval(3, 0., 3., degree=2)
+    functional = _functional(mesh)
+    entity = next(iter(functional.mesh_entity_iterator()))
+    eval_data = functional.get_cell_eval_data_functional(entity)
+    quadrature = functional.quadrature
+    with_geometry = quadrature(QuadratureFunctor(lambda p: 1., eval_data.mapping, eval_data.geometry))
+    without_geometry = quadrature(QuadratureFunctor(lambda p: 1., eval_data.mapping))
+    assert np.isclose(with_geometry, 1.) and np.isclose(without_geometry, 1.)
+
+
+def test_assembly_with_cell_geometry():
+    mesh = Mesh.interval(5, -1., 1., degree=2)
+    forms = FormCollection({"integral": _functional(mesh)})
+    assert np.isclose(DefaultSystemAssembler.assemble_functionals(0., forms), 2. / 3.)
@@ -0,0 +1,49 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem.elements.hierarchical_elements import HierarchicalLine
+
+# the basis functions are compiled on construction, the element is shared by the tests
+ELEMENT = HierarchicalLine(3)
+
+
+def test_bubble_derivatives_are_orthonormal():
+    points, weights = np.polynomial.legendre.leggauss(4)
+    gradients = ELEMENT.tabulate_basis_function_gradients(points[:, np.newaxis])[:, :, 0]
+    bubbles = gradients[:, 2:]
+    assert np.allclose(np.einsum('q,qi,qj->ij', weights, bubbles, bubbles), np.eye(2))
+    # the bubble functions vanish at the vertices, where the vertex functions are nodal
+    assert np.allclose(ELEMENT.tabulate_basis_function_values(np.array([[-1.], [1.]])),
+                       [[1., 0., 0., 0.], [0., 1., 0., 0.]])
+
+
+def test_interpolation_reproduces_cubic_polynomials():
+    def function(x):
+        return 2. - x[0] + 0.5 * x[0] ** 2 + 3. * x[0] ** 3
+
+    dof_values = ELEMENT.interpolate_function(function)
+    assert dof_values.shape == (4, 1)
+    assert np.allclose(dof_values[:2, 0], [function([-1.]), function([1.])])
+    for x in (-0.9, -0.2, 0.35, 0.8):
+        assert np.allclose(ELEMENT.function_value(dof_values, np.array([x])), function([x]))
+        assert np.allclose(ELEMENT.function_gradient(dof_values, np.array([x])), -1. + x + 9. * x ** 2)
+
+
+def test_vector_valued_elements_are_rejected():
+    with pytest.raises(NotImplementedError):
+        HierarchicalLine(2, dimension=2)
@@ -0,0 +1,74 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import threading
+import numpy as np
+from ppfem import Mesh
+from ppfem.geometry.point import Point
+from ppfem.geometry.vertex import Vertex
+from ppfem.user_elements.lagrange_elements import IsoparametricContinuousLagrange1d
+
+
+def mixed_degree_mesh():
+    # a linear line [0, 1] followed by a quadratic one [1, 2] with a shifted midpoint
+    mesh = Mesh(1)
+    for x in (0., 1., 2., 1.4):
+        mesh.add_vertex(Vertex((x,)))
+    mesh.add_line([0, 1])
+    mesh.add_line([1, 2, 3])
+    return mesh
+
+
+def test_unlocalized_mapping_does_not_depend_on_seen_degrees():
+    mesh = mixed_degree_mesh()
+    table = mesh.entity_table()
+    element = IsoparametricContinuousLagrange1d(1)
+    mapping = element.get_mapping()
+    assert mapping is not None
+    local_mappings = []
+    for i in range(2):
+        element.localize(table.entity(i))
+        assert element.get_mapping() is mapping
+        local_mappings.append(mapping.localize(table.entity(i)))
+    linear, quadratic = (m.get_fe_mapping() for m in local_mappings)
+    assert linear is not quadratic
+    assert linear is mapping.fe_mapping(2) and quadratic is mapping.fe_mapping(3)
+    # the quadratic line is curved: its midpoint is not the image of the reference midpoint 0
+    assert np.allclose(local_mappings[0].map_point(Point(0.)).coords(), [0.5])
+    assert np.allclose(local_mappings[1].map_point(Point(0.)).coords(), [1.4])
+    points, _ = mapping.map_points_pointwise(mesh.coordinates()[[[1, 2, 3]]], np.array([[0.]]))
+    assert np.allclose(points, [[1.4]])
+
+
+def test_concurrent_localization_shares_one_mapping_per_degree():
+    mesh = Mesh.interval(32, degree=2)
+    table = mesh.entity_table()
+    element = IsoparametricContinuousLagrange1d(1)
+    fe_mappings = [None] * mesh.number_of_entities(1)
+    start = threading.Barrier(4)
+
+    def localize(cells):
+        start.wait()
+        for i in cells:
+            fe_mappings[i] = element.localize(table.entity(i)).get_mapping().get_fe_mapping()
+
+    threads = [threading.Thread(target=localize, args=(range(k, len(fe_mappings), 4),)) for k in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(m is fe_mappings[0] for m in fe_mappings)
+    assert fe_mappings[0] is element.get_mapping().fe_mapping(3)
@@ -0,0 +1,66 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import scipy.sparse as sps
+from ppfem.fem.linear_solver import DirectSparseSolver
+
+
+def _laplacian(n):
+    return sps.diags([-np.ones(n - 1), 2.0 * np.ones(n), -np.ones(n - 1)], [-1, 0, 1], format="csr")
+
+
+def _solve(solver, matrix, rhs, version=None):
+    solution = np.zeros_like(rhs)
+    solver.solve(matrix, rhs, solution, version=version)
+    return solution
+
+
+def test_in_place_changes_are_detected_without_version():
+    matrix = _laplacian(10)
+    rhs = np.arange(1.0, 11.0)
+    solver = DirectSparseSolver()
+    assert np.allclose(matrix @ _solve(solver, matrix, rhs), rhs)
+    assert np.allclose(matrix @ _solve(solver, matrix, rhs), rhs)
+    assert solver.statistics()["factorizations"] == 1
+    matrix.data *= 2.0
+    assert np.allclose(matrix @ _solve(solver, matrix, rhs), rhs)
+    assert solver.statistics()["factorizations"] == 2
+
+
+def test_in_place_changes_of_lil_matrix():
+    matrix = _laplacian(10).tolil()
+    rhs = np.ones(10)
+    solver = DirectSparseSolver()
+    _solve(solver, matrix, rhs)
+    matrix[0, 9] = 0.5
+    assert np.allclose(matrix @ _solve(solver, matrix, rhs), rhs)
+    assert solver.statistics()["factorizations"] == 2
+
+
+def test_factorization_is_reused_exactly_while_the_version_is_unchanged():
+    matrix = _laplacian(10)
+    rhs = np.ones(10)
+    solver = DirectSparseSolver()
+    first = _solve(solver, matrix, rhs, version=0)
+    # an unchanged version is trusted, even after a change in place
+    matrix.data *= 2.0
+    assert np.allclose(_solve(solver, matrix, rhs, version=0), first)
+    assert solver.statistics()["factorizations"] == 1
+    assert np.allclose(matrix @ _solve(solver, matrix, rhs, version=1), rhs)
+    assert solver.statistics()["factorizations"] == 2
+    assert np.allclose(matrix @ _solve(solver, matrix.copy(), rhs, version=1), rhs)
+    assert solver.statistics()["factorizations"] == 3
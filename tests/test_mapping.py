@@ -0,0 +1,42 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem.elements.lagrange_elements import LagrangeLine
+from ppfem.geometry.mapping import FEMapping
+
+# setting up the Lagrange basis is expensive, the mapping is shared by the tests
+MAPPING = FEMapping(LagrangeLine(2))
+
+
+@pytest.mark.parametrize("scale", [1e-7, 1., 1e6])
+def test_affine_detection_is_independent_of_the_scale(scale):
+    # vertex order of LagrangeLine: end points first, then the midpoint
+    straight = np.array([[0.], [1.], [0.5]]) * scale
+    curved = np.array([[0.], [1.], [0.51]]) * scale
+    affine_data = MAPPING._compute_affine_data(straight)
+    assert affine_data is not None
+    assert np.isclose(affine_data.jacobian_det, 0.5 * scale)
+    assert MAPPING._compute_affine_data(curved) is None
+
+
+def test_affine_data_is_read_only():
+    affine_data = MAPPING._compute_affine_data(np.array([[1.], [3.], [2.]]))
+    for array in (affine_data.jacobian, affine_data.inverse_jacobian):
+        with pytest.raises(ValueError):
+            array[...] = 0.
+    assert np.allclose(affine_data.jacobian, [[1.]]) and np.allclose(affine_data.inverse_jacobian, [[1.]])
@@ -0,0 +1,59 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.geometry.vertex import Vertex
+
+
+def test_add_vertex_with_wrong_dimension_leaves_mesh_unchanged():
+    mesh = Mesh.rectangle(2, 2, cell_type="triangle")
+    n_vertices = mesh.number_of_entities(0)
+    coordinates = mesh.coordinates().copy()
+    with pytest.raises(Exception):
+        mesh.add_vertex(Vertex((0.5, 0.5, 0.5)))
+    assert mesh.number_of_entities(0) == n_vertices
+    assert np.array_equal(mesh.coordinates(), coordinates)
+    vertex = mesh.add_vertex(Vertex((0.25, 0.75)))
+    assert vertex.global_index() == n_vertices
+    assert np.array_equal(mesh.coordinates()[-1], [0.25, 0.75])
+
+
+def test_existing_higher_order_edges_are_reused():
+    # two triangles of the unit square whose bottom edge already exists as a quadratic line with midpoint 4
+    coordinates = np.array([[0., 0.], [1., 0.], [1., 1.], [0., 1.], [0.5, 0.]])
+    mesh = Mesh.from_arrays(coordinates, np.array([[0, 1, 2], [0, 2, 3]]), facets=np.array([[0, 1, 4]]),
+                            facet_boundary_indicators=np.array([3]))
+    edges, orientations = mesh.sub_entities(2, 1)
+    assert mesh.number_of_entities(1) == 5
+    assert edges[0, 0] == 0 and orientations[0, 0] == 1
+    # the edge from vertex 2 to 0 of the second triangle is traversed the other way round
+    assert edges[1, 0] == edges[0, 2] and orientations[1, 0] == -orientations[0, 2]
+    assert mesh.entity_table(1).boundary_indicators()[0] == 3
+
+
+def test_line_end_point_orientations_follow_move():
+    mesh = Mesh.interval(3, 0., 1.)
+    vertices, orientations = mesh.sub_entities(1, 0)
+    assert np.array_equal(orientations, [[-1, 1]] * 3)
+    assert mesh.entity_table(1).entity(0).get_sub_entity(0).orientation == -1
+    # mirror the mesh at the origin
+    mesh.move(-2. * mesh.coordinates())
+    moved_vertices, moved_orientations = mesh.sub_entities(1, 0)
+    assert np.array_equal(moved_vertices, vertices)
+    assert np.array_equal(moved_orientations, [[1, -1]] * 3)
+    assert mesh.entity_table(1).entity(0).get_sub_entity(0).orientation == 1
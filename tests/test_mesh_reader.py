@@ -0,0 +1,148 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import struct
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.io.mesh_reader import read_mesh
+
+
+TRIANGLE = 2
+LINE = 1
+
+
+def _unit_square():
+    """Two triangles with domain indicator 5, the bottom edge tagged 7 and the right edge tagged 8 (0-based)."""
+    coordinates = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+    cells = np.array([[0, 1, 2], [0, 2, 3]])
+    facets = np.array([[0, 1], [1, 2]])
+    return coordinates, cells, np.array([5, 5]), facets, np.array([7, 8])
+
+
+def _gmsh2(binary):
+    coordinates, cells, cell_tags, facets, facet_tags = _unit_square()
+    nodes = np.hstack([coordinates, np.zeros((len(coordinates), 1))])
+    blocks = [(LINE, facets + 1, facet_tags), (TRIANGLE, cells + 1, cell_tags)]
+    out = [b"$MeshFormat\n", b"2.2 1 8\n" + struct.pack("<i", 1) + b"\n" if binary else b"2.2 0 8\n",
+           b"$EndMeshFormat\n$Nodes\n", "{0:d}\n".format(len(nodes)).encode()]
+    for i, x in enumerate(nodes):
+        if binary:
+            out.append(struct.pack("<i3d", i + 1, *x))
+        else:
+            out.append("{0:d} {1:.17g} {2:.17g} {3:.17g}\n".format(i + 1, *x).encode())
+    out.append(b"\n$EndNodes\n$Elements\n" if binary else b"$EndNodes\n$Elements\n")
+    out.append("{0:d}\n".format(sum(len(b[1]) for b in blocks)).encode())
+    number = 1
+    for element_type, element_nodes, tags in blocks:
+        if binary:
+            out.append(struct.pack("<3i", element_type, len(element_nodes), 2))
+        for row, tag in zip(element_nodes, tags):
+            values = [number, tag, 1] + list(row)
+            if binary:
+                out.append(struct.pack("<{0:d}i".format(len(values)), *values))
+            else:
+                out.append(" ".join(str(v) for v in [number, element_type, 2] + values[1:]).encode() + b"\n")
+            number += 1
+    out.append(b"\n$EndElements\n" if binary else b"$EndElements\n")
+    return b"".join(out)
+
+
+def _gmsh4(binary):
+    coordinates, cells, cell_tags, facets, facet_tags = _unit_square()
+    nodes = np.hstack([coordinates, np.zeros((len(coordinates), 1))])
+
+    def pack(fmt, *values):
+        return struct.pack("<" + fmt.replace("s", "Q"), *values)
+
+    def text(*values):
+        return (" ".join(repr(v) if isinstance(v, float) else str(v) for v in values) + "\n").encode()
+
+    write = pack if binary else (lambda fmt, *values: text(*values))
+    # entities: curves 1, 2 (tags 7, 8) and surface 1 (tag 5), all without bounding entities
+    out = [b"$MeshFormat\n", b"4.1 1 8\n" + struct.pack("<i", 1) + b"\n" if binary else b"4.1 0 8\n",
+           b"$EndMeshFormat\n$Entities\n", write("4s", 0, 2, 1, 0)]
+    for tag, physical in ((1, facet_tags[0]), (2, facet_tags[1])):
+        out += [write("i6dsis", tag, 0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1, int(physical), 0)]
+    out += [write("i6dsis", 1, 0.0, 0.0, 0.0, 1.0, 1.0, 0.0, 1, int(cell_tags[0]), 0)]
+    out.append(b"\n$EndEntities\n$Nodes\n" if binary else b"$EndEntities\n$Nodes\n")
+    out += [write("4s", 1, len(nodes), 1, len(nodes)), write("3is", 2, 1, 0, len(nodes))]
+    out += [write("s", i + 1) for i in range(len(nodes))]
+    out += [write("3d", *(float(v) for v in x)) for x in nodes]
+    out.append(b"\n$EndNodes\n$Elements\n" if binary else b"$EndNodes\n$Elements\n")
+    n_elements = len(facets) + len(cells)
+    out.append(write("4s", 3, n_elements, 1, n_elements))
+    number = 1
+    for dim, tag, element_type, element_nodes in ((1, 1, LINE, facets[:1]), (1, 2, LINE, facets[1:]),
+                                                  (2, 1, TRIANGLE, cells)):
+        out.append(write("3is", dim, tag, element_type, len(element_nodes)))
+        for row in element_nodes:
+            out.append(write("{0:d}s".format(1 + len(row)), number, *(int(v) + 1 for v in row)))
+            number += 1
+    out.append(b"\n$EndElements\n" if binary else b"$EndElements\n")
+    return b"".join(out)
+
+
+@pytest.mark.parametrize("writer", [_gmsh2, _gmsh4], ids=["msh2.2", "msh4.1"])
+@pytest.mark.parametrize("binary", [False, True], ids=["ascii", "binary"])
+def test_gmsh_round_trip(tmp_path, writer, binary):
+    coordinates, cells, cell_tags, facets, facet_tags = _unit_square()
+    filename = str(tmp_path / "square.msh")
+    with open(filename, "wb") as f:
+        f.write(writer(binary))
+    arrays = read_mesh(filename).array_dict()
+    assert np.array_equal(arrays["coordinates"], coordinates)
+    assert np.array_equal(arrays["connectivity_2"], cells)
+    assert np.array_equal(arrays["domain_indicators_2"], cell_tags)
+    assert np.array_equal(arrays["connectivity_1"], facets)
+    assert np.array_equal(arrays["boundary_indicators_1"], facet_tags)
+
+
+def test_text_round_trip(tmp_path):
+    mesh = Mesh.rectangle(3, 2, cell_type="triangle")
+    arrays = mesh.array_dict()
+    coordinates = np.hstack([arrays["coordinates"], np.zeros((len(arrays["coordinates"]), 1))])
+    cells = arrays["connectivity_2"]
+    filename = str(tmp_path / "square.txt")
+    with open(filename, "w") as f:
+        f.write("# a 3x2 rectangle with a zero third coordinate\n")
+        f.write("{0:d} 3 {1:d} 3 2\n".format(len(coordinates), len(cells)))
+        np.savetxt(f, coordinates, fmt="%.17g")
+        np.savetxt(f, np.hstack([cells, arrays["domain_indicators_2"][:, np.newaxis]]), fmt="%d")
+    read_back = read_mesh(filename, space_dim=2).array_dict()
+    assert np.array_equal(read_back["coordinates"], arrays["coordinates"])
+    assert np.array_equal(read_back["connectivity_2"], cells)
+    assert read_mesh(filename).space_dim() == 3
+
+
+def test_gmsh_4_0_is_rejected(tmp_path):
+    filename = str(tmp_path / "square.msh")
+    with open(filename, "wb") as f:
+        f.write(_gmsh4(False).replace(b"4.1 0 8", b"4.0 0 8"))
+    with pytest.raises(NotImplementedError):
+        read_mesh(filename)
+
+
+def test_text_with_many_comments(tmp_path):
+    filename = str(tmp_path / "interval.txt")
+    with open(filename, "w") as f:
+        f.write("# comment\n" * 20000)
+        f.write("  \n  # an indented comment without a line break before the data\n\n")
+        f.write("3 1 2 2 1\n0.0\n0.5\n1.0\n0 1 4\n1 2 5\n")
+    arrays = read_mesh(filename).array_dict()
+    assert np.array_equal(arrays["coordinates"], [[0.0], [0.5], [1.0]])
+    assert np.array_equal(arrays["connectivity_1"], [[0, 1], [1, 2]])
+    assert np.array_equal(arrays["domain_indicators_1"], [4, 5])
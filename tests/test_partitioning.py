@@ -0,0 +1,44 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.mesh.partitioning import partition_cells, partition_mesh
+
+
+@pytest.mark.parametrize("method", ["rcb", "hilbert", "morton", "greedy"])
+@pytest.mark.parametrize("n_parts", [2, 3, 4, 7])
+def test_partitions_are_balanced(method, n_parts):
+    mesh = Mesh.rectangle(9, 7, cell_type="triangle")
+    parts = partition_cells(mesh, n_parts, method)
+    sizes = np.bincount(parts, minlength=n_parts)
+    assert len(sizes) == n_parts
+    assert sizes.sum() == mesh.number_of_entities(2)
+    assert sizes.max() - sizes.min() <= 1
+
+
+def test_every_cell_is_owned_once_and_ghosts_are_neighbours():
+    mesh = Mesh.rectangle(6, 6)
+    partitions = partition_mesh(mesh, 4)
+    owned = np.concatenate([p.cells for p in partitions])
+    assert np.array_equal(np.sort(owned), np.arange(mesh.number_of_entities(2)))
+    cells = mesh.entity_table().connectivity()
+    for partition in partitions:
+        assert len(np.intersect1d(partition.cells, partition.ghost_cells)) == 0
+        owned_vertices = np.unique(cells[partition.cells])
+        for ghost in partition.ghost_cells:
+            assert len(np.intersect1d(cells[ghost], owned_vertices)) > 0
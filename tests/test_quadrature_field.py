@@ -0,0 +1,102 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh, FunctionSpace, FEFunction, QGauss, IsoparametricContinuousLagrange1d, QuadratureField, \
+    evaluate_at_quadrature_points
+
+# setting up the Lagrange basis is expensive, the element (and its per-degree cache) is shared by the tests
+ELEMENT = IsoparametricContinuousLagrange1d(1)
+
+
+def _function(mesh, f):
+    space = FunctionSpace(ELEMENT, mesh)
+    function = FEFunction(space)
+    values = np.empty(space.number_of_dofs)
+    values[space.vertex_dof_array()[:, 0]] = f(mesh.coordinates()[:, 0])
+    function.set_dof_values(values)
+    return function
+
+
+def _curved_mesh():
+    mesh = Mesh.interval(6, 0., 1., degree=2, grading=1.3)
+    # shift the midpoints, which makes the cells curved (non-affine)
+    displacement = np.zeros_like(mesh.coordinates())
+    midpoints = np.unique(mesh.entity_table().connectivity()[:, 2])
+    displacement[midpoints] = 0.01
+    mesh.move(displacement)
+    return mesh
+
+
+def test_values_and_gradients_match_evaluate_at():
+    mesh = _curved_mesh()
+    u = _function(mesh, np.sin)
+    field = evaluate_at_quadrature_points(None, u.function_space, QGauss("line", 5), functions=dict(u=u))
+    gradients = evaluate_at_quadrature_points(lambda data: data.grad_u, u.function_space, QGauss("line", 5),
+                                              functions=dict(u=u), gradients=True)
+    assert field.values.shape == (6, 3) and gradients.values.shape == (6, 3, 1)
+    assert np.array_equal(field.cell_indices, np.arange(6))
+    points = field.quadrature_points.reshape(-1, 1)
+    assert np.allclose(field.values.reshape(-1), u.evaluate_at(points).reshape(-1))
+    assert np.allclose(gradients.values.reshape(-1), u.evaluate_at(points, der=1).reshape(-1))
+
+
+def test_integrate():
+    mesh = Mesh.interval(5, 0., 2., degree=2, grading=1.5)
+    u = _function(mesh, lambda x: x ** 2)
+    field = evaluate_at_quadrature_points(lambda data: data.u * data.x[:, :, 0], u.function_space,
+                                          QGauss("line", 5), functions=dict(u=u))
+    assert np.allclose(field.jxw.sum(), 2.)
+    # x^3 is integrated exactly by the 3-point Gauss rule
+    assert np.isclose(field.integrate().sum(), 4.)
+    cells = mesh.entity_table().connectivity()[:, :2]
+    a, b = np.sort(mesh.coordinates()[cells, 0], axis=1).T
+    assert np.allclose(field.integrate(), (b ** 4 - a ** 4) / 4.)
+    with pytest.raises(Exception):
+        QuadratureField(field.cell_indices, field.quadrature_points, field.values).integrate()
+
+
+@pytest.mark.parametrize("mmap_mode", [None, "r"])
+def test_save_load(tmp_path, mmap_mode):
+    mesh = _curved_mesh()
+    u = _function(mesh, np.cos)
+    field = evaluate_at_quadrature_points(None, u.function_space, QGauss("line", 5), functions=dict(u=u))
+    filename = str(tmp_path / "field.npy")
+    field.save(filename)
+    loaded = QuadratureField.load(filename, mmap_mode=mmap_mode)
+    for name in ("cell_indices", "quadrature_points", "values", "jxw"):
+        assert np.array_equal(getattr(loaded, name), getattr(field, name))
+    assert np.allclose(loaded.integrate(), field.integrate())
+
+
+def test_write_vtu(tmp_path):
+    vtk = pytest.importorskip("vtk")
+    from vtk.util.numpy_support import vtk_to_numpy
+    mesh = _curved_mesh()
+    u = _function(mesh, np.exp)
+    field = evaluate_at_quadrature_points(None, u.function_space, QGauss("line", 5), functions=dict(u=u))
+    filename = str(tmp_path / "field.vtu")
+    field.write_vtu(filename, name="u")
+    reader = vtk.vtkXMLUnstructuredGridReader()
+    reader.SetFileName(filename)
+    reader.Update()
+    grid = reader.GetOutput()
+    points, values = field.point_cloud()
+    assert grid.GetNumberOfPoints() == len(points) == grid.GetNumberOfCells()
+    assert np.allclose(vtk_to_numpy(grid.GetPoints().GetData())[:, 0], points[:, 0])
+    assert np.allclose(vtk_to_numpy(grid.GetPointData().GetArray("u")), values)
+    assert np.array_equal(vtk_to_numpy(grid.GetPointData().GetArray("cell_index")), np.repeat(np.arange(6), 3))
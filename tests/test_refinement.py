@@ -0,0 +1,52 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh, FunctionSpace, IsoparametricContinuousLagrange1d
+from ppfem.fem.transfer import GridTransfer
+
+# setting up the Lagrange basis is expensive, the element (and its per-degree cache) is shared by the tests
+ELEMENT = IsoparametricContinuousLagrange1d(1)
+
+
+def _quadratic(x):
+    return 3.0 * x ** 2 - 2.0 * x + 0.5
+
+
+@pytest.mark.parametrize("marked_cells", [None, np.array([0, 3, 4])], ids=["uniform", "local"])
+def test_vertex_prolongation_is_exact_for_quadratics(marked_cells):
+    coarse = Mesh.interval(5, -1.0, 2.0, degree=2)
+    fine = coarse.refine(marked_cells)
+    x_coarse = coarse.coordinates()[:, 0]
+    x_fine = fine.coordinates()[:, 0]
+    assert np.allclose(fine.vertex_prolongation().dot(_quadratic(x_coarse)), _quadratic(x_fine))
+
+
+def test_grid_transfer_is_exact_for_quadratics():
+    coarse = Mesh.interval(4, 0.0, 1.0, degree=2)
+    fine = coarse.refine()
+    coarse_space = FunctionSpace(ELEMENT, coarse)
+    fine_space = FunctionSpace(ELEMENT, fine)
+    coarse_values = np.empty(coarse_space.number_of_dofs)
+    coarse_values[coarse_space.vertex_dof_array()[:, 0]] = _quadratic(coarse.coordinates()[:, 0])
+    fine_values = np.empty(fine_space.number_of_dofs)
+    fine_values[fine_space.vertex_dof_array()[:, 0]] = _quadratic(fine.coordinates()[:, 0])
+
+    transfer = GridTransfer(coarse_space, fine_space)
+    assert np.allclose(transfer.prolongate(coarse_values), fine_values)
+    assert np.allclose(transfer.inject(fine_values), coarse_values)
+    assert np.allclose(transfer.restriction().toarray(), transfer.prolongation().toarray().T)
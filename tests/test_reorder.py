@@ -0,0 +1,81 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from ppfem import Mesh, FunctionSpace, FEFunction, IsoparametricContinuousLagrange1d
+
+# setting up the Lagrange basis is expensive, the element (and its per-degree cache) is shared by the tests
+ELEMENT = IsoparametricContinuousLagrange1d(1)
+
+
+def _interpolate_x(function_space):
+    mesh = function_space.get_mesh()
+    function = FEFunction(function_space)
+    values = np.empty(function_space.number_of_dofs)
+    values[function_space.vertex_dof_array()[:, 0]] = mesh.coordinates()[:, 0]
+    function.set_dof_values(values)
+    return function
+
+
+def test_function_values_survive_reorder():
+    mesh = Mesh.interval(20, 0., 1., degree=2)
+    space = FunctionSpace(ELEMENT, mesh)
+    function = _interpolate_x(space)
+    storage = function.dof_values()
+    points = np.array([[0.05], [0.3], [0.5125], [0.97]])
+    before = function.evaluate_at(points)[:, 0]
+
+    for strategy in ("rcm", "morton", "hilbert"):
+        mesh.reorder(strategy)
+        assert function.dof_values() is storage
+        assert np.allclose(function.dof_values()[space.vertex_dof_array()[:, 0]], mesh.coordinates()[:, 0])
+        assert np.allclose(function.evaluate_at(points)[:, 0], before)
+        assert np.allclose(before, points[:, 0])
+
+
+def test_dofs_follow_reorder():
+    mesh = Mesh.interval(10, 0., 1., degree=2)
+    space = FunctionSpace(ELEMENT, mesh)
+    cell_dofs = space.cell_dof_array()
+    vertex_dofs = space.vertex_dof_array()
+    cell_order, vertex_order = mesh.reorder("rcm")
+
+    # the dofs are numbered as if they were generated on the reordered mesh ...
+    regenerated = FunctionSpace(ELEMENT, mesh)
+    assert np.array_equal(space.cell_dof_array(), regenerated.cell_dof_array())
+    assert np.array_equal(space.vertex_dof_array(), regenerated.vertex_dof_array())
+    assert space.number_of_dofs == regenerated.number_of_dofs
+    # ... and are a permutation of the old dofs following the cells and vertices
+    new_dofs = np.full(space.number_of_dofs, -1)
+    new_dofs[cell_dofs[cell_order]] = space.cell_dof_array()
+    assert np.array_equal(np.sort(new_dofs), np.arange(space.number_of_dofs))
+    assert np.array_equal(new_dofs[cell_dofs[cell_order]], space.cell_dof_array())
+    assert np.array_equal(new_dofs[vertex_dofs[vertex_order]], space.vertex_dof_array())
+
+
+def test_reorder_of_parent_updates_refined_mesh():
+    coarse = Mesh.rectangle(4, 3, cell_type="triangle")
+    fine = coarse.refine()
+    coarse_values = coarse.coordinates()[:, 0] ** 2 + coarse.coordinates()[:, 1]
+    fine_values = fine.vertex_prolongation().dot(coarse_values)
+    centroids = coarse.coordinates()[coarse.connectivity()].mean(axis=1)
+    children_of_0 = fine.child_cells(0)
+
+    cell_order, vertex_order = coarse.reorder("hilbert")
+    new_cell = np.flatnonzero(cell_order == 0)[0]
+    assert np.array_equal(fine.child_cells(new_cell), children_of_0)
+    assert np.allclose(fine.vertex_prolongation().dot(coarse_values[vertex_order]), fine_values)
+    assert np.allclose(coarse.coordinates()[coarse.connectivity()].mean(axis=1), centroids[cell_order])
@@ -0,0 +1,43 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from ppfem import Mesh
+from ppfem.io.shared_memory import share_mesh, attach_mesh
+
+
+def test_read_only_attached_mesh_copies_on_write():
+    mesh = Mesh.rectangle(3, 3, cell_type="triangle")
+    shared = share_mesh(mesh)
+    try:
+        attached, attachment = attach_mesh(shared.handle())
+        boundary_before = attached.entity_table(1).boundary_indicators(writeable=False).copy()
+        facets = attached.mark_boundary([(5, lambda x: x[:, 0] < 1e-12)], default=6)
+        attached.entity_table().domain_indicators()[0] = 3
+        attached.vertex(0).boundary_indicator = 9
+        attached.move(np.full(attached.coordinates().shape, 0.5))
+
+        assert set(attached.entity_table(1).boundary_indicators()[facets].tolist()) == {5, 6}
+        assert attached.entity_table().domain_indicator(0) == 3
+        assert attached.entity_table(0).boundary_indicator(0) == 9
+        # the shared arrays are unchanged
+        assert np.array_equal(shared["boundary_indicators_1"], boundary_before)
+        assert shared["domain_indicators_2"][0] == mesh.entity_table().domain_indicator(0)
+        assert np.array_equal(shared["coordinates"], mesh.coordinates())
+        attachment.close()
+    finally:
+        shared.close()
+        shared.unlink()
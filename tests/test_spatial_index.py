@@ -0,0 +1,116 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+from ppfem import Mesh, FunctionSpace, FEFunction, IsoparametricContinuousLagrange1d
+from ppfem.geometry.vertex import Vertex
+from ppfem.mesh.spatial_index import SpatialIndex
+
+# setting up the Lagrange basis is expensive, the element (and its per-degree cache) is shared by the tests
+ELEMENT = IsoparametricContinuousLagrange1d(1)
+
+
+def _mesh(space_dim, coordinates, cells):
+    mesh = Mesh(space_dim)
+    for x in coordinates:
+        mesh.add_vertex(Vertex(tuple(x)))
+    for cell in cells:
+        mesh.add_entity(mesh.topological_dim(), cell)
+    return mesh
+
+
+def _triangle_points(mesh, cells, reference):
+    """:return: the physical points of the reference points of the given (first order) triangles"""
+    v = mesh.coordinates()[mesh.entity_table().connectivity()[cells]]
+    return v[:, 0] + reference[:, :1] * (v[:, 1] - v[:, 0]) + reference[:, 1:] * (v[:, 2] - v[:, 0])
+
+
+def test_locate_in_triangles():
+    mesh = Mesh.rectangle(7, 5, p1=(2.0, 1.0), cell_type="triangle")
+    index = SpatialIndex(mesh)
+    rng = np.random.default_rng(1)
+    points = rng.uniform((0., 0.), (2., 1.), size=(200, 2))
+    cells, reference = index.locate(points)
+    assert np.all(cells >= 0)
+    assert np.all(reference >= -1e-10) and np.all(reference.sum(axis=1) <= 1. + 1e-10)
+    assert np.allclose(_triangle_points(mesh, cells, reference), points)
+
+
+def test_points_outside():
+    mesh = Mesh.rectangle(4, 4, cell_type="quad")
+    index = SpatialIndex(mesh)
+    points = np.array([[-0.1, 0.5], [0.5, 1.2], [1.5, 1.5], [0.5, 0.5], [1.0, 1.0]])
+    cells, reference = index.locate(points)
+    assert np.array_equal(cells[:3], [-1, -1, -1]) and np.all(np.isnan(reference[:3]))
+    # points inside and on the boundary are found
+    assert np.all(cells[3:] >= 0) and not np.any(np.isnan(reference[3:]))
+
+
+def test_locate_after_move():
+    mesh = Mesh.rectangle(6, 6, cell_type="triangle")
+    index = SpatialIndex(mesh)
+    points = np.array([[0.1, 0.1], [0.55, 0.3], [0.9, 0.95]])
+    cells, reference = index.locate(points)
+    # shear the mesh; the index is rebuilt on the next query
+    displacement = np.column_stack([0.5 * mesh.coordinates()[:, 1], np.zeros(mesh.number_of_entities(0))])
+    mesh.move(displacement)
+    moved = points + np.column_stack([0.5 * points[:, 1], np.zeros(len(points))])
+    moved_cells, moved_reference = index.locate(moved)
+    assert np.array_equal(moved_cells, cells)
+    assert np.allclose(moved_reference, reference)
+    assert index.locate(np.array([[0.1, 0.9]]))[0][0] == -1
+
+
+def test_locate_in_mixed_cells():
+    # a unit square (quad) next to a triangle
+    mesh = _mesh(2, [[0., 0.], [1., 0.], [1., 1.], [0., 1.], [2., 0.5]], [[0, 1, 2, 3], [1, 4, 2]])
+    index = SpatialIndex(mesh)
+    points = np.array([[0.25, 0.75], [1.5, 0.5], [1.9, 0.5], [1.9, 0.9]])
+    cells, reference = index.locate(points)
+    assert np.array_equal(cells, [0, 1, 1, -1])
+    # reference coordinates of the quad are in [-1, 1]^2, those of the triangle refer to the unit simplex
+    assert np.allclose(reference[0], [-0.5, 0.5])
+    assert np.allclose(_triangle_points(mesh, cells[1:3], reference[1:3]), points[1:3])
+
+
+def _interpolate(mesh, f):
+    space = FunctionSpace(ELEMENT, mesh)
+    function = FEFunction(space)
+    values = np.empty(space.number_of_dofs)
+    values[space.vertex_dof_array()[:, 0]] = f(mesh.coordinates()[:, 0])
+    function.set_dof_values(values)
+    return function
+
+
+def test_evaluate_at_after_move():
+    mesh = Mesh.interval(8, 0., 1., degree=2)
+    u = _interpolate(mesh, lambda x: x ** 2)
+    points = np.array([[0.1], [0.47], [0.93]])
+    assert np.allclose(u.evaluate_at(points)[:, 0], points[:, 0] ** 2)
+    assert np.allclose(u.evaluate_at(points, der=1).reshape(-1), 2. * points[:, 0])
+    mesh.move(np.ones_like(mesh.coordinates()))
+    # the dof values move along with the mesh
+    assert np.allclose(u.evaluate_at(points + 1.)[:, 0], points[:, 0] ** 2)
+    assert np.all(np.isnan(u.evaluate_at(np.array([[0.5], [2.5]]))))
+
+
+def test_evaluate_at_on_lines_of_mixed_degree():
+    # a linear line [0, 1] followed by a quadratic one [1, 2]
+    mesh = _mesh(1, [[0.], [1.], [2.], [1.5]], [[0, 1], [1, 2, 3]])
+    u = _interpolate(mesh, lambda x: x ** 2)
+    values = u.evaluate_at(np.array([[0.5], [1.25], [1.8], [2.5]]))
+    assert np.allclose(values[:3, 0], [0.5, 1.5625, 3.24])
+    assert np.isnan(values[3]).all()
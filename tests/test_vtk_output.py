@@ -0,0 +1,113 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.io.time_series import TimeSeriesWriter
+from ppfem.io.vtk_output import write_vtu, write_vtu_piece, write_pvtu
+from ppfem.mesh.partitioning import partition_mesh
+
+vtk = pytest.importorskip("vtk")
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+def _read(filename, reader_class):
+    reader = reader_class()
+    reader.SetFileName(filename)
+    reader.Update()
+    return reader.GetOutput()
+
+
+def _connectivity(grid):
+    cells = grid.GetCells()
+    return vtk_to_numpy(cells.GetConnectivityArray()), vtk_to_numpy(cells.GetOffsetsArray())
+
+
+@pytest.mark.parametrize("compress", [False, True], ids=["raw", "zlib"])
+def test_vtu_read_back(tmp_path, compress):
+    mesh = Mesh.rectangle(4, 3, cell_type="triangle")
+    coordinates = mesh.coordinates()
+    n_cells = mesh.number_of_entities(2)
+    temperature = coordinates[:, 0] ** 2 + coordinates[:, 1]
+    velocity = np.ascontiguousarray(coordinates[:, ::-1])
+    filename = str(tmp_path / "mesh.vtu")
+    write_vtu(filename, mesh, point_data=dict(temperature=temperature, velocity=velocity),
+              cell_data=dict(level=np.arange(n_cells, dtype=np.int32)), compress=compress, indicators=True)
+
+    grid = _read(filename, vtk.vtkXMLUnstructuredGridReader)
+    assert grid.GetNumberOfPoints() == coordinates.shape[0]
+    assert grid.GetNumberOfCells() == n_cells
+    assert np.array_equal(vtk_to_numpy(grid.GetPoints().GetData())[:, :2], coordinates)
+    connectivity, offsets = _connectivity(grid)
+    assert np.array_equal(connectivity, mesh.entity_table().connectivity().reshape(-1))
+    assert np.array_equal(offsets, np.arange(n_cells + 1) * 3)
+    assert all(grid.GetCellType(i) == vtk.VTK_TRIANGLE for i in range(n_cells))
+    assert np.array_equal(vtk_to_numpy(grid.GetPointData().GetArray("temperature")), temperature)
+    assert np.array_equal(vtk_to_numpy(grid.GetPointData().GetArray("velocity")), velocity)
+    assert np.array_equal(vtk_to_numpy(grid.GetCellData().GetArray("level")), np.arange(n_cells))
+    assert np.array_equal(vtk_to_numpy(grid.GetCellData().GetArray("domain_indicator")),
+                          mesh.entity_table().domain_indicators())
+
+
+def test_vtu_read_back_of_curved_lines(tmp_path):
+    mesh = Mesh.interval(4, 0.0, 1.0, degree=2)
+    filename = str(tmp_path / "lines.vtu")
+    write_vtu(filename, mesh)
+
+    grid = _read(filename, vtk.vtkXMLUnstructuredGridReader)
+    assert all(grid.GetCellType(i) == vtk.VTK_LAGRANGE_CURVE for i in range(grid.GetNumberOfCells()))
+    connectivity, offsets = _connectivity(grid)
+    assert np.array_equal(connectivity.reshape(-1, 3), mesh.entity_table().connectivity())
+    assert np.array_equal(vtk_to_numpy(grid.GetPoints().GetData())[:, 0], mesh.coordinates()[:, 0])
+
+
+def test_pvtu_read_back(tmp_path):
+    mesh = Mesh.rectangle(5, 4)
+    temperature = mesh.coordinates()[:, 0] * 2.0
+    pieces = [write_vtu_piece(str(tmp_path / "piece_{0:d}.vtu".format(p.index)), mesh, p.cells,
+                              point_data=dict(temperature=temperature), compress=True)
+              for p in partition_mesh(mesh, 3)]
+    filename = str(tmp_path / "mesh.pvtu")
+    write_pvtu(filename, pieces)
+
+    grid = _read(filename, vtk.vtkXMLPUnstructuredGridReader)
+    assert grid.GetNumberOfCells() == mesh.number_of_entities(2)
+    points = vtk_to_numpy(grid.GetPoints().GetData())
+    values = vtk_to_numpy(grid.GetPointData().GetArray("temperature"))
+    assert np.allclose(values, points[:, 0] * 2.0)
+
+
+def test_time_series_data_named_like_geometry_arrays(tmp_path):
+    mesh = Mesh.rectangle(3, 2, cell_type="triangle")
+    n_cells = mesh.number_of_entities(2)
+    n_points = mesh.coordinates().shape[0]
+    with TimeSeriesWriter(str(tmp_path / "series.pvd"), mesh, compress=True) as writer:
+        for step in range(2):
+            writer.write(float(step), point_data=dict(Points=np.full(n_points, step + 0.5)),
+                         cell_data=dict(offsets=np.linspace(0.0, 1.0, n_cells) + step, types=np.full(n_cells, 7.0),
+                                        connectivity=np.arange(n_cells) * 0.5))
+
+    for step in range(2):
+        grid = _read(str(tmp_path / "series_{0:06d}.vtu".format(step)), vtk.vtkXMLUnstructuredGridReader)
+        connectivity, offsets = _connectivity(grid)
+        assert np.array_equal(connectivity, mesh.entity_table().connectivity().reshape(-1))
+        assert np.array_equal(offsets, np.arange(n_cells + 1) * 3)
+        cell_data = grid.GetCellData()
+        assert np.array_equal(vtk_to_numpy(cell_data.GetArray("offsets")), np.linspace(0.0, 1.0, n_cells) + step)
+        assert np.array_equal(vtk_to_numpy(cell_data.GetArray("types")), np.full(n_cells, 7.0))
+        assert np.array_equal(vtk_to_numpy(cell_data.GetArray("connectivity")), np.arange(n_cells) * 0.5)
+        assert np.array_equal(vtk_to_numpy(grid.GetPointData().GetArray("Points")), np.full(n_points, step + 0.5))
@@ -0,0 +1,109 @@
+# PPFem: An educational finite element code
+# Copyright (C) 2015  Matthias Rambausek
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+from ppfem import Mesh
+from ppfem.geometry.vertex import Vertex
+from ppfem.io.xdmf_output import XdmfWriter
+
+vtk = pytest.importorskip("vtk")
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+def _read(filename, time=None):
+    reader = vtk.vtkXdmfReader()
+    reader.SetFileName(filename)
+    if time is None:
+        reader.Update()
+    else:
+        reader.UpdateTimeStep(time)
+    return reader.GetOutputDataObject(0)
+
+
+def _cells(grid):
+    """:return: list of (vtk cell type, point ids) of all cells"""
+    cells = []
+    for i in range(grid.GetNumberOfCells()):
+        cell = grid.GetCell(i)
+        cells.append((cell.GetCellType(), [cell.GetPointId(k) for k in range(cell.GetNumberOfPoints())]))
+    return cells
+
+
+def _mesh(space_dim, coordinates, cells):
+    mesh = Mesh(space_dim)
+    for x in coordinates:
+        mesh.add_vertex(Vertex(tuple(x)))
+    for cell in cells:
+        mesh.add_entity(mesh.topological_dim(), cell)
+    return mesh
+
+
+def test_time_steps_and_planar_vectors(tmp_path):
+    mesh = Mesh.rectangle(3, 2, cell_type="triangle")
+    coordinates = mesh.coordinates()
+    n_cells = mesh.number_of_entities(2)
+    filename = str(tmp_path / "series.xdmf")
+    with XdmfWriter(filename, mesh, indicators=True) as writer:
+        for time in (0., 0.5):
+            velocity = np.ascontiguousarray(coordinates[:, ::-1]) * (1. + time)
+            writer.write(time, point_data=dict(velocity=velocity),
+                         cell_data=dict(level=np.arange(n_cells, dtype=np.int32)))
+    for time in (0., 0.5):
+        grid = _read(filename, time)
+        assert grid.GetNumberOfPoints() == len(coordinates) and grid.GetNumberOfCells() == n_cells
+        assert np.allclose(vtk_to_numpy(grid.GetPoints().GetData())[:, :2], coordinates)
+        velocity = vtk_to_numpy(grid.GetPointData().GetArray("velocity"))
+        assert velocity.shape == (len(coordinates), 3)
+        assert np.allclose(velocity[:, :2], coordinates[:, ::-1] * (1. + time)) and np.all(velocity[:, 2] == 0.)
+        assert np.array_equal(vtk_to_numpy(grid.GetCellData().GetArray("level")), np.arange(n_cells))
+        assert np.array_equal(vtk_to_numpy(grid.GetCellData().GetArray("domain_indicator")),
+                              mesh.entity_table().domain_indicators())
+    assert _cells(grid) == [(vtk.VTK_TRIANGLE, list(cell)) for cell in mesh.entity_table().connectivity()]
+
+
+def test_polylines_of_higher_order_lines(tmp_path):
+    mesh = Mesh.interval(3, 0., 1., degree=3)
+    filename = str(tmp_path / "interval.xdmf")
+    with XdmfWriter(filename, mesh) as writer:
+        writer.write(0., point_data=dict(x=mesh.coordinates()[:, 0]))
+    grid = _read(filename)
+    assert np.allclose(vtk_to_numpy(grid.GetPoints().GetData())[:, 0], mesh.coordinates()[:, 0])
+    assert np.allclose(vtk_to_numpy(grid.GetPointData().GetArray("x")), mesh.coordinates()[:, 0])
+    # the nodes of every polyline are in geometric order
+    for cell_type, points in _cells(grid):
+        assert cell_type == vtk.VTK_POLY_LINE and len(points) == 4
+        assert np.all(np.diff(mesh.coordinates()[points, 0]) > 0.)
+
+
+def test_mixed_lines(tmp_path):
+    mesh = _mesh(1, [[0.], [1.], [2.], [1.5]], [[0, 1], [1, 2, 3]])
+    filename = str(tmp_path / "lines.xdmf")
+    with XdmfWriter(filename, mesh) as writer:
+        writer.write(0., cell_data=dict(degree=np.array([1., 2.])))
+    grid = _read(filename)
+    assert _cells(grid) == [(vtk.VTK_POLY_LINE, [0, 1]), (vtk.VTK_POLY_LINE, [1, 3, 2])]
+    assert np.array_equal(vtk_to_numpy(grid.GetCellData().GetArray("degree")), [1., 2.])
+
+
+def test_mixed_triangles_and_quadrilaterals(tmp_path):
+    mesh = _mesh(2, [[0., 0.], [1., 0.], [1., 1.], [0., 1.], [2., 0.5]], [[0, 1, 2, 3], [1, 4, 2]])
+    filename = str(tmp_path / "mixed.xdmf")
+    with XdmfWriter(filename, mesh) as writer:
+        writer.write(0., point_data=dict(u=mesh.coordinates().copy()))
+    grid = _read(filename)
+    assert _cells(grid) == [(vtk.VTK_QUAD, [0, 1, 2, 3]), (vtk.VTK_TRIANGLE, [1, 4, 2])]
+    assert np.allclose(vtk_to_numpy(grid.GetPointData().GetArray("u"))[:, :2], mesh.coordinates())